@@ -0,0 +1,64 @@
+"""Микробенчмарки горячих функций security: JWT и хеширование паролей.
+
+Запуск: python -m benchmarks.auth [--rounds 12] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks import local_db
+
+TOKEN_RUNS = 20000
+
+
+def measure(name: str, runs: int, func):
+    started = time.perf_counter()
+    for _ in range(runs):
+        func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {runs:>7} {runs / elapsed:>10.0f} ops/s {elapsed / runs * 1e6:>10.1f} us/op")
+
+
+async def measure_async(name: str, runs: int, concurrency: int, func):
+    remaining = iter(range(runs))
+
+    async def worker():
+        for _ in remaining:
+            await func()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {runs:>7} {runs / elapsed:>10.0f} ops/s {elapsed / runs * 1e6:>10.1f} us/op")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=None)
+    parser.add_argument("--hash-runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    local_db.configure(args.rounds)
+
+    import config
+    from security import create_access_token, get_password_hash, verify_password, verify_token
+    from services.hashing import hasher
+
+    token = create_access_token({"user_id": 1, "username": "Player000001"})
+    hashed = get_password_hash("Passwod123")
+
+    print(f"bcrypt rounds {config.BCRYPT_ROUNDS}, hash pool {config.HASH_POOL_KIND} x {hasher.workers}")
+    measure("create_access_token", TOKEN_RUNS, lambda: create_access_token({"user_id": 1, "username": "Player000001"}))
+    measure("verify_token", TOKEN_RUNS, lambda: verify_token(token))
+    measure("get_password_hash (sync)", args.hash_runs, lambda: get_password_hash("Passwod123"))
+    measure("verify_password (sync)", args.hash_runs, lambda: verify_password("Passwod123", hashed))
+    await measure_async(
+        f"hasher.verify (c={args.concurrency})", args.hash_runs * 4, args.concurrency,
+        lambda: hasher.verify("Passwod123", hashed)
+    )
+    await hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Пропускная способность тика боя.
+
+Запуск: python -m benchmarks.battle_engine [--ticks 200]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import config
+from services.battle_engine import BattleEngine
+
+PLAYERS_PER_BATTLE = 8
+
+
+def build_engine(participants: int, seed: int = 0) -> BattleEngine:
+    rng = np.random.default_rng(seed)
+    engine = BattleEngine(tick_rate=config.BATTLE_TICK_RATE)
+    participant_id = 0
+    for battle_id in range(1, participants // PLAYERS_PER_BATTLE + 1):
+        # Все участники боя стоят рядом, чтобы удары действительно проходили
+        center = rng.uniform(10, config.ARENA_SIZE - 10, size=2)
+        rows = []
+        for _ in range(PLAYERS_PER_BATTLE):
+            participant_id += 1
+            x, y = center + rng.uniform(-1, 1, size=2)
+            rows.append({
+                "participant_id": participant_id,
+                "user_id": participant_id,
+                "health": 10_000,
+                "damage": float(rng.integers(10, 50)),
+                "speed": float(rng.uniform(1, 5)),
+                "x": x,
+                "y": y,
+            })
+        engine.add_battle(battle_id, rows)
+        engine.start_battle(battle_id)
+
+    first = 1
+    for battle_id in range(1, participants // PLAYERS_PER_BATTLE + 1):
+        ids = list(range(first, first + PLAYERS_PER_BATTLE))
+        for offset, pid in enumerate(ids):
+            engine.set_target(pid, ids[(offset + 1) % PLAYERS_PER_BATTLE])
+            engine.set_direction(pid, *rng.uniform(-1, 1, size=2))
+        first += PLAYERS_PER_BATTLE
+    return engine
+
+
+def run(participants: int, ticks: int) -> float:
+    engine = build_engine(participants)
+    dt = 1 / config.BATTLE_TICK_RATE
+    engine.tick(dt)
+    started = time.perf_counter()
+    for _ in range(ticks):
+        engine.tick(dt)
+    return ticks / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ticks", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'participants':>12} {'ticks/s':>10} {'ms/tick':>8}")
+    for participants in (1_000, 10_000, 100_000):
+        rate = run(participants, args.ticks)
+        print(f"{participants:>12} {rate:>10.0f} {1000 / rate:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Журнал событий боя: цена записи на тик и открытие реплея длинного боя.
+
+Запуск: python -m benchmarks.battle_log
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+BATTLES = 200
+PLAYERS_PER_BATTLE = 8
+TICKS = 6000
+SEEKS = 1000
+
+
+async def main():
+    from services.battle_engine import BattleEngine
+    from services.battle_log import BattleEventLog, BattleReplay
+
+    rng = random.Random(0)
+    engine = BattleEngine(tick_rate=20)
+    participant_id = 0
+    for battle_id in range(1, BATTLES + 1):
+        participants = []
+        for _ in range(PLAYERS_PER_BATTLE):
+            participant_id += 1
+            participants.append({
+                "participant_id": participant_id, "user_id": participant_id,
+                # Здоровья с запасом: бои не должны закончиться раньше времени
+                "health": 1e9, "damage": rng.uniform(1, 5), "speed": 1.0,
+                "x": rng.uniform(0, 10), "y": rng.uniform(0, 10),
+            })
+        engine.add_battle(battle_id, participants)
+        engine.start_battle(battle_id)
+        ids = [p["participant_id"] for p in participants]
+        for current in ids:
+            engine.set_direction(current, rng.uniform(-1, 1), rng.uniform(-1, 1))
+            engine.set_target(current, rng.choice([other for other in ids if other != current]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = BattleEventLog(
+            engine, directory, keyframe=100, buffer_size=64 * 1024, flush_ticks=20, queue_size=200
+        )
+        # Только поток записи: тики движка вызываются здесь, а не в engine.run
+        log.start()
+        engine_time = log_time = 0.0
+        for _ in range(TICKS):
+            started = time.perf_counter()
+            result = engine.tick(0.05)
+            engine_time += time.perf_counter() - started
+            started = time.perf_counter()
+            await log.on_tick(result)
+            log_time += time.perf_counter() - started
+        await log.stop()
+
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{BATTLES} battles x {TICKS} ticks: engine {engine_time / TICKS * 1e3:.2f} ms/tick, "
+              f"log {log_time / TICKS * 1e3:.2f} ms/tick, {log.records_written / log_time:,.0f} records/s, "
+              f"{size / 2 ** 20:.1f} MiB on disk")
+
+        started = time.perf_counter()
+        replay = BattleReplay(directory, 1)
+        print(f"open replay: {(time.perf_counter() - started) * 1e6:.0f} us "
+              f"({len(replay.records):,} records, ticks {replay.first_tick}..{replay.last_tick})")
+
+        ticks = [rng.randint(replay.first_tick, replay.last_tick) for _ in range(SEEKS)]
+        started = time.perf_counter()
+        for tick in ticks:
+            replay.events(tick, tick + 20)
+        print(f"seek + 20 ticks of events: {(time.perf_counter() - started) / SEEKS * 1e6:.1f} us")
+
+        started = time.perf_counter()
+        for tick in ticks:
+            replay.state_at(tick)
+        print(f"state at tick: {(time.perf_counter() - started) / SEEKS * 1e6:.1f} us")
+        replay.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Скорость массового импорта на локальной SQLite (aiosqlite).
+
+Запуск: python -m benchmarks.bulk_import [--rows 50000]
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import CharacterDB, EquipmentDB, UserDB, UserEquipmentDB, user_characters
+from schemas.characters import CreateCharacter, CharacterGrant
+from schemas.equipment import CreateEquipment, EquipmentGrant
+from services.bulk_import import import_rows
+
+
+async def rows_of(items):
+    for item in items:
+        yield item
+
+
+async def run(session_factory, name, schema, table, items):
+    async with session_factory() as db:
+        started = time.perf_counter()
+        report = await import_rows(rows_of(items), schema, table, db)
+        elapsed = time.perf_counter() - started
+    print(f"{name:<18} {report.inserted:>8} {report.failed:>7} {report.inserted / elapsed:>10.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+    n = args.rows
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(UserDB.__table__.insert(), [
+            {"username": f"Player{i:06d}", "email": f"player{i}@example.com", "hashed_password": "x"}
+            for i in range(1, n // 10 + 1)
+        ])
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"{'table':<18} {'inserted':>8} {'failed':>7} {'rows/s':>10}")
+    await run(session_factory, "characters", CreateCharacter, CharacterDB.__table__, [
+        {"name": f"Hero{i:06d}", "base_health": 100, "base_damage": 50, "base_speed": 20}
+        for i in range(n)
+    ])
+    await run(session_factory, "equipment", CreateEquipment, EquipmentDB.__table__, [
+        {"name": f"Item{i:06d}", "equipment_category": "weapon", "damage_bonus": 5}
+        for i in range(n)
+    ])
+    await run(session_factory, "character grants", CharacterGrant, user_characters, [
+        {"user_id": i % (n // 10) + 1, "character_id": i + 1} for i in range(n)
+    ])
+    await run(session_factory, "equipment grants", EquipmentGrant, UserEquipmentDB.__table__, [
+        {"user_id": i % (n // 10) + 1, "equipment_id": i + 1} for i in range(n)
+    ])
+    # 1% дубликатов: чанки с ошибкой уходят в построчный режим
+    await run(session_factory, "grants, 1% dupes", CharacterGrant, user_characters, [
+        {"user_id": i % (n // 10) + 1, "character_id": (i + 1) if i % 100 else 1} for i in range(n, 2 * n)
+    ])
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
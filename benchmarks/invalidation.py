@@ -0,0 +1,91 @@
+"""Задержка шины инвалидации между процессами на Unix-сокетах.
+
+Мастер публикует сообщение, каждый воркер отвечает своим; замеряется
+время, пока ответят все — от публикации до применения во всех воркерах
+и обратно.
+
+Запуск: python -m benchmarks.invalidation [--workers 8] [--messages 2000]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import statistics
+import tempfile
+import time
+
+from benchmarks import local_db
+
+
+async def worker(directory: str):
+    from services.invalidation import InvalidationBus, UnixSocketTransport
+
+    bus = InvalidationBus(UnixSocketTransport(directory))
+    bus.subscribe("ping", lambda seq: bus.publish("pong", seq, local=False))
+    bus.start()
+    await asyncio.Event().wait()
+
+
+async def measure(directory: str, workers: int, messages: int, children: list[int]):
+    from services.invalidation import InvalidationBus, UnixSocketTransport
+
+    bus = InvalidationBus(UnixSocketTransport(directory))
+    replies: dict[int, int] = {}
+    done: dict[int, asyncio.Future] = {}
+
+    def on_pong(seq: int):
+        replies[seq] = replies.get(seq, 0) + 1
+        if replies[seq] == workers:
+            done[seq].set_result(time.perf_counter())
+
+    bus.subscribe("pong", on_pong)
+    bus.start()
+    while len([name for name in os.listdir(directory) if name.endswith(".sock")]) < workers + 1:
+        await asyncio.sleep(0.01)
+
+    loop = asyncio.get_running_loop()
+    latencies = []
+    for seq in range(messages):
+        done[seq] = loop.create_future()
+        started = time.perf_counter()
+        bus.publish("ping", seq, local=False)
+        latencies.append(await done[seq] - started)
+        del done[seq]
+
+    for pid in children:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+    bus.stop()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    latencies.sort()
+    print(f"{workers} workers, {messages} messages: round trip to all workers "
+          f"p50 {statistics.median(latencies) * 1e6:.0f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us, "
+          f"max {latencies[-1] * 1e3:.2f} ms, dropped {bus.transport.dropped}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    local_db.configure()
+    # fork до запуска event loop: дочерний процесс начинает со своего
+    directory = tempfile.mkdtemp(prefix="bench-invalidation-")
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                asyncio.run(worker(directory))
+            finally:
+                os._exit(0)
+        children.append(pid)
+    asyncio.run(measure(directory, args.workers, args.messages, children))
+
+
+if __name__ == "__main__":
+    main()
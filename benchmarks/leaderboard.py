@@ -0,0 +1,75 @@
+"""Инкрементальный рейтинг против GROUP BY по участникам боёв.
+
+Запуск: python -m benchmarks.leaderboard
+"""
+import asyncio
+import random
+import time
+
+from benchmarks import local_db
+
+USERS = 100_000
+BATTLES = 20_000
+PLAYERS_PER_BATTLE = 8
+QUERIES = 10_000
+
+
+async def main():
+    local_db.configure()
+
+    from sqlalchemy import func, insert, select
+
+    from database import Base, engine
+    from models import BattleParticipantDB
+    from services.leaderboard import Ranking
+
+    rng = random.Random(0)
+    battles = [
+        {user_id: rng.randint(0, 3) for user_id in rng.sample(range(1, USERS + 1), PLAYERS_PER_BATTLE)}
+        for _ in range(BATTLES)
+    ]
+
+    ranking = Ranking()
+    started = time.perf_counter()
+    for kills in battles:
+        for user_id, count in kills.items():
+            ranking.add(user_id, count)
+    elapsed = time.perf_counter() - started
+    print(f"incremental: {BATTLES / elapsed:,.0f} battles/s ({len(ranking):,} ranked users)")
+
+    users = rng.choices(range(1, USERS + 1), k=QUERIES)
+    started = time.perf_counter()
+    for user_id in users:
+        ranking.rank(user_id)
+        ranking.around(user_id, 5)
+    elapsed = time.perf_counter() - started
+    print(f"rank + around(5): {elapsed / QUERIES * 1e6:.1f} us/query")
+
+    started = time.perf_counter()
+    for _ in range(QUERIES):
+        ranking.top(100)
+    print(f"top 100: {(time.perf_counter() - started) / QUERIES * 1e6:.1f} us/query")
+
+    # Та же история в таблице участников; внешние ключи SQLite не проверяет
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(BattleParticipantDB), [
+            {"battle_id": battle_id, "user_id": user_id, "kills": count}
+            for battle_id, kills in enumerate(battles, 1)
+            for user_id, count in kills.items()
+        ])
+    async with engine.connect() as conn:
+        started = time.perf_counter()
+        await conn.execute(
+            select(BattleParticipantDB.user_id, func.sum(BattleParticipantDB.kills).label("kills"))
+            .group_by(BattleParticipantDB.user_id)
+            .order_by(func.sum(BattleParticipantDB.kills).desc())
+            .limit(100)
+        )
+        print(f"GROUP BY top 100 over {BATTLES * PLAYERS_PER_BATTLE:,} rows: "
+              f"{(time.perf_counter() - started) * 1e3:.1f} ms/query")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""Поток наград: ORM load-modify-commit против журнала с групповой записью.
+
+Много конкурентных наград на небольшой набор «горячих» пользователей;
+часть наград повторяется с тем же ключом идемпотентности (ретраи).
+Проверяется, что итоговые балансы сходятся с ожидаемыми.
+
+Запуск: python -m benchmarks.ledger [--workers 200] [--rewards 20000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import local_db
+
+USERS = 1000
+HOT_USERS = 50
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--rewards", type=int, default=20000)
+    parser.add_argument("--retry-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    local_db.configure()
+
+    from sqlalchemy import event, func, select, update
+
+    from database import SessionLocal, engine
+    from models import UserDB
+    from services.ledger import ledger
+
+    await local_db.seed(
+        users=USERS, characters=10, equipment=10,
+        characters_per_user=1, equipped_per_user=1, password="Passwod123"
+    )
+    statements = {"count": 0}
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *_: statements.__setitem__(
+        "count", statements["count"] + 1
+    ))
+
+    rng = random.Random(0)
+    rewards = [(rng.randint(1, HOT_USERS), f"battle-reward-{i}") for i in range(args.rewards)]
+    # Ретраи: та же награда с тем же ключом ещё раз
+    retries = [reward for reward in rewards if rng.random() < args.retry_rate]
+    stream = rewards + retries
+    rng.shuffle(stream)
+
+    async def total_coins() -> int:
+        async with SessionLocal() as db:
+            return (await db.execute(select(func.coalesce(func.sum(UserDB.coins), 0)))).scalar_one()
+
+    async def drain(work):
+        queue = iter(stream)
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for reward in queue:
+                try:
+                    await work(*reward)
+                except Exception:
+                    errors += 1
+
+        statements["count"] = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.workers)))
+        return time.perf_counter() - started, errors
+
+    async def orm_reward(user_id: int, key: str):
+        async with SessionLocal() as db:
+            user = await db.get(UserDB, user_id)
+            user.coins = (user.coins or 0) + 1
+            await db.commit()
+
+    elapsed, errors = await drain(orm_reward)
+    coins = await total_coins()
+    print(f"ORM load-modify-commit: {len(stream) / elapsed:>8,.0f} rewards/s, "
+          f"{statements['count'] / len(stream):.2f} statements/reward, errors {errors}, "
+          f"coins {coins} of {len(stream)} (lost {len(stream) - errors - coins}, retries paid twice)")
+
+    async with SessionLocal() as db:
+        await db.execute(update(UserDB).values(coins=0))
+        await db.commit()
+
+    ledger.start()
+    elapsed, errors = await drain(lambda user_id, key: ledger.credit(
+        user_id, "battle_reward", coins=1, idempotency_key=key
+    ))
+    await ledger.stop()
+    coins = await total_coins()
+    metrics = ledger.metrics.snapshot()
+    print(f"ledger:                 {len(stream) / elapsed:>8,.0f} rewards/s, "
+          f"{statements['count'] / len(stream):.2f} statements/reward, errors {errors}, "
+          f"coins {coins} of {len(rewards)} expected, "
+          f"{metrics['entries_per_batch']:.0f} entries/batch, {metrics['duplicates']} duplicates skipped")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Нагрузочный тест основных эндпоинтов на локальной SQLite.
+
+Поднимает main.app (с lifespan) в процессе, наполняет базу и гоняет
+запросы с фиксированной конкурентностью через ASGI-транспорт httpx.
+Для каждого сценария: RPS, p50/p95/p99 и число SQL-запросов на запрос.
+
+Запуск: python -m benchmarks.load_test [--concurrency 32] [--requests 2000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import local_db
+
+PASSWORD = "Passwod123"
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(client, counter, name, make_request, total, concurrency):
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    counter["statements"] = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{name:<20} {total:>7} {total / elapsed:>9.0f} "
+        f"{percentile(latencies, 0.50) * 1e3:>8.2f} {percentile(latencies, 0.95) * 1e3:>8.2f} "
+        f"{percentile(latencies, 0.99) * 1e3:>8.2f} {counter['statements'] / total:>9.2f} {errors:>6}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--login-requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bcrypt-rounds", type=int, default=None)
+    args = parser.parse_args()
+
+    path = local_db.configure(args.bcrypt_rounds)
+
+    import httpx
+    from sqlalchemy import event
+
+    from database import engine
+    from main import app
+    from security import create_access_token
+
+    await local_db.seed(
+        users=args.users, characters=200, equipment=100,
+        characters_per_user=5, equipped_per_user=3, password=PASSWORD
+    )
+
+    counter = {"statements": 0}
+
+    def count_statement(*_):
+        counter["statements"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+
+    rng = random.Random(1)
+    user_ids = [rng.randint(1, args.users) for _ in range(args.requests)]
+    tokens = {
+        user_id: create_access_token({"user_id": user_id, "username": f"Player{user_id:06d}"})
+        for user_id in set(user_ids)
+    }
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            etag = (await client.get("/characters/")).headers["etag"]
+
+            print(f"database: {path}, concurrency {args.concurrency}")
+            print(f"{'scenario':<20} {'reqs':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+                  f"{'p99 ms':>8} {'queries':>9} {'errors':>6}")
+
+            scenarios = [
+                ("POST /users/login", args.login_requests, lambda c, i: c.post(
+                    "/users/login", json={"email": f"player{user_ids[i]}@example.com", "password": PASSWORD})),
+                ("GET /users/me", args.requests, lambda c, i: c.get(
+                    "/users/me", headers={"Authorization": f"Bearer {tokens[user_ids[i]]}"})),
+                ("GET /characters/", args.requests, lambda c, i: c.get("/characters/")),
+                ("GET /characters/ 304", args.requests, lambda c, i: c.get(
+                    "/characters/", headers={"If-None-Match": etag})),
+                ("GET roster", args.requests, lambda c, i: c.get(f"/characters/user/{user_ids[i]}")),
+                ("GET stats", args.requests, lambda c, i: c.get(f"/users/{user_ids[i]}/stats")),
+            ]
+            for name, total, make_request in scenarios:
+                await run_scenario(client, counter, name, make_request, total, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+"""Локальная SQLite (aiosqlite) вместо PostgreSQL для бенчмарков.
+
+configure() нужно вызвать до импорта модулей приложения: config читает
+переменные окружения при импорте.
+"""
+import os
+import random
+import tempfile
+
+
+def configure(bcrypt_rounds: int | None = None) -> str:
+    path = os.path.join(tempfile.mkdtemp(prefix="magico-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.pop("READ_DATABASE_URL", None)
+    if bcrypt_rounds is not None:
+        os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    return path
+
+
+async def seed(
+        users: int,
+        characters: int,
+        equipment: int,
+        characters_per_user: int,
+        equipped_per_user: int,
+        password: str,
+        seed: int = 0
+):
+    from sqlalchemy import insert
+
+    from database import Base, engine
+    from enums import EquipmentCategory
+    from models import CharacterDB, EquipmentDB, UserDB, UserEquipmentDB, user_characters
+    from security import pwd_context
+
+    rng = random.Random(seed)
+    # Один хеш на всех: bcrypt при наполнении занял бы минуты
+    hashed_password = pwd_context.hash(password)
+    categories = list(EquipmentCategory)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(UserDB), [
+            {"username": f"Player{i:06d}", "email": f"player{i}@example.com", "hashed_password": hashed_password}
+            for i in range(1, users + 1)
+        ])
+        await conn.execute(insert(CharacterDB), [
+            {"name": f"Hero{i:05d}", "base_health": rng.randint(80, 300),
+             "base_damage": rng.randint(10, 80), "base_speed": rng.uniform(10, 40)}
+            for i in range(1, characters + 1)
+        ])
+        await conn.execute(insert(EquipmentDB), [
+            {"name": f"Item{i:05d}", "equipment_category": rng.choice(categories),
+             "health_bonus": rng.randint(0, 50), "damage_bonus": rng.randint(0, 20),
+             "speed_bonus": rng.uniform(0, 3)}
+            for i in range(1, equipment + 1)
+        ])
+
+        grants, items = [], []
+        for user_id in range(1, users + 1):
+            owned = rng.sample(range(1, characters + 1), characters_per_user)
+            grants += [
+                {"user_id": user_id, "character_id": character_id, "is_active": index == 0}
+                for index, character_id in enumerate(owned)
+            ]
+            items += [
+                {"user_id": user_id, "equipment_id": rng.randint(1, equipment), "is_equipped": index < equipped_per_user}
+                for index in range(equipped_per_user * 2)
+            ]
+        # Пустой список executemany превратился бы в INSERT одной строки по умолчанию
+        if grants:
+            await conn.execute(insert(user_characters), grants)
+        if items:
+            await conn.execute(insert(UserEquipmentDB), items)
@@ -0,0 +1,105 @@
+"""CPU на запрос для списка персонажей игрока: сущности ORM через Pydantic
+и json против строк и orjson.
+
+Запуск: python -m benchmarks.serialization [--characters 500]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import local_db
+
+RUNS = 200
+
+
+async def measure(name: str, func, baseline: float | None = None) -> float:
+    await func()
+    started = time.process_time()
+    for _ in range(RUNS):
+        await func()
+    cpu = (time.process_time() - started) / RUNS
+    saved = f", {100 * (1 - cpu / baseline):.0f}% less CPU" if baseline else ""
+    print(f"{name:<44} {cpu * 1e3:>8.3f} ms CPU/request{saved}")
+    return cpu
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--characters", type=int, default=500)
+    args = parser.parse_args()
+
+    local_db.configure()
+
+    import httpx
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+
+    import crud.characters
+    from crud import loading
+    from database import ReadSessionLocal
+    from main import app
+    from models import CharacterDB, user_characters
+    from responses import dumps
+    from schemas.characters import Character
+
+    await local_db.seed(
+        users=1, characters=args.characters, equipment=1,
+        characters_per_user=args.characters, equipped_per_user=0, password="Passwod123"
+    )
+    adapter = TypeAdapter(list[Character])
+    limit = args.characters
+
+    async def orm_json():
+        # Прежний путь: гидрация сущностей, валидация response_model, json.dumps
+        async with ReadSessionLocal() as db:
+            result = await db.execute(
+                select(CharacterDB)
+                .options(*loading.CHARACTER_CATALOG)
+                .join(user_characters, user_characters.c.character_id == CharacterDB.character_id)
+                .where(user_characters.c.user_id == 1)
+                .order_by(CharacterDB.character_id)
+                .limit(limit)
+            )
+            characters = result.scalars().all()
+        json.dumps(adapter.dump_python(adapter.validate_python(characters, from_attributes=True), mode="json"))
+
+    async def orm_pydantic_json():
+        # Сущности ORM, но сериализация в Rust-ядре Pydantic (новые FastAPI)
+        async with ReadSessionLocal() as db:
+            result = await db.execute(
+                select(CharacterDB)
+                .options(*loading.CHARACTER_CATALOG)
+                .join(user_characters, user_characters.c.character_id == CharacterDB.character_id)
+                .where(user_characters.c.user_id == 1)
+                .order_by(CharacterDB.character_id)
+                .limit(limit)
+            )
+            characters = result.scalars().all()
+        adapter.dump_json(adapter.validate_python(characters, from_attributes=True))
+
+    async def rows_orjson():
+        async with ReadSessionLocal() as db:
+            rows = await crud.characters.get_user_characters(1, db, None, limit)
+        dumps([
+            {"name": row.name, "base_health": row.base_health,
+             "base_damage": row.base_damage, "base_speed": row.base_speed}
+            for row in rows
+        ])
+
+    print(f"{args.characters} characters per response, {RUNS} runs")
+    baseline = await measure("ORM + response_model + json.dumps", orm_json)
+    await measure("ORM + response_model + Pydantic dump_json", orm_pydantic_json, baseline)
+    await measure("rows + orjson", rows_orjson, baseline)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def endpoint():
+                response = await client.get(f"/characters/user/1?limit={limit}")
+                assert response.status_code == 200
+            await measure("GET /characters/user/{id} end to end", endpoint)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+"""Закрытие боёв: ORM по участнику против пачек боёв.
+
+Все бои завершаются в одном тике движка (волна одновременных концов матчей).
+После пачечного закрытия те же бои закрываются повторно — балансы не должны
+измениться.
+
+Запуск: python -m benchmarks.settlement [--battles 1000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks import local_db
+
+PLAYERS_PER_BATTLE = 8
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--battles", type=int, default=1000)
+    args = parser.parse_args()
+
+    local_db.configure()
+
+    from sqlalchemy import event, func, select
+
+    import config
+    import crud.battles
+    from database import SessionLocal, engine
+    from enums import BattleStatus
+    from models import BattleDB, BattleParticipantDB, UserDB, UserEquipmentDB
+    from services.battle_engine import BattleEngine
+    from services.settlement import BattleSettlement, battle_rewards
+
+    users = args.battles * PLAYERS_PER_BATTLE
+    await local_db.seed(
+        users=users, characters=10, equipment=10,
+        characters_per_user=1, equipped_per_user=2, password="Passwod123"
+    )
+    statements = {"count": 0}
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *_: statements.__setitem__(
+        "count", statements["count"] + 1
+    ))
+
+    rng = random.Random(0)
+
+    async def create_battles() -> list[dict]:
+        user_ids = list(range(1, users + 1))
+        rng.shuffle(user_ids)
+        battles = [
+            {
+                "arena_id": None,
+                "max_players": PLAYERS_PER_BATTLE,
+                "participants": [
+                    {"user_id": user_id, "current_health": 100}
+                    for user_id in user_ids[i:i + PLAYERS_PER_BATTLE]
+                ]
+            }
+            for i in range(0, users, PLAYERS_PER_BATTLE)
+        ]
+        async with SessionLocal() as db:
+            return await crud.battles.create_started_battles(battles, db)
+
+    def finish_in_engine(battle_engine: BattleEngine, battles: list[dict]):
+        # Выживает один участник на бой, у остальных случайные убийства
+        for battle in battles:
+            battle_engine.add_battle(battle["battle_id"], [
+                {
+                    "participant_id": participant["battle_participant_id"],
+                    "user_id": participant["user_id"],
+                    "health": 100 if index == 0 else 0,
+                    "damage": 10, "speed": 1.0,
+                    "kills": rng.randint(0, 3)
+                }
+                for index, participant in enumerate(battle["participants"])
+            ])
+            battle_engine.start_battle(battle["battle_id"])
+        return battle_engine.tick(0.05)
+
+    async def totals() -> tuple[int, int]:
+        async with SessionLocal() as db:
+            coins = (await db.execute(select(func.coalesce(func.sum(UserDB.coins), 0)))).scalar_one()
+            durability = (await db.execute(select(func.sum(UserEquipmentDB.durability)))).scalar_one()
+        return coins, durability
+
+    # ORM: бой, каждый участник, его пользователь и снаряжение по отдельности
+    battle_engine = BattleEngine(tick_rate=20)
+    orm_settlement = BattleSettlement(battle_engine, config.SETTLEMENT_BATCH_SIZE, 0)
+    result = finish_in_engine(battle_engine, await create_battles())
+    battles = orm_settlement.collect(result.finished)
+
+    statements["count"] = 0
+    started = time.perf_counter()
+    for battle in battles:
+        async with SessionLocal() as db:
+            battle_row = await db.get(BattleDB, battle["battle_id"])
+            if battle_row.status == BattleStatus.FINISHED:
+                continue
+            battle_row.status = BattleStatus.FINISHED
+            battle_row.ended_at = battle["ended_at"]
+            rewards = {reward["user_id"]: reward for reward in battle_rewards(battle["battle_id"], battle["participants"])}
+            for participant in battle["participants"]:
+                row = await db.get(BattleParticipantDB, participant["battle_participant_id"])
+                row.current_health = participant["current_health"]
+                row.kills = participant["kills"]
+                row.is_alive = participant["is_alive"]
+                reward = rewards.get(participant["user_id"])
+                if reward is not None:
+                    user = await db.get(UserDB, participant["user_id"])
+                    user.coins = (user.coins or 0) + reward["coins_delta"]
+                    user.crystals = (user.crystals or 0) + reward["crystals_delta"]
+                items = (await db.execute(select(UserEquipmentDB).where(
+                    UserEquipmentDB.user_id == participant["user_id"], UserEquipmentDB.is_equipped.is_(True)
+                ))).scalars()
+                for item in items:
+                    item.durability = max(item.durability - config.DURABILITY_LOSS_PER_BATTLE, 0)
+            await db.commit()
+    elapsed = time.perf_counter() - started
+    print(f"ORM per participant: {len(battles) / elapsed:>8,.0f} battles/s, "
+          f"{statements['count'] / len(battles):.1f} statements/battle")
+
+    # Пачки: тот же объём через BattleSettlement
+    battle_engine = BattleEngine(tick_rate=20)
+    settlement = BattleSettlement(battle_engine, config.SETTLEMENT_BATCH_SIZE, 0)
+    result = finish_in_engine(battle_engine, await create_battles())
+    retry = settlement.collect(result.finished)
+    before = await totals()
+    expected_coins = sum(reward["coins_delta"] for battle in retry for reward in battle["rewards"])
+
+    statements["count"] = 0
+    started = time.perf_counter()
+    await settlement.on_tick(result)
+    await settlement.flush()
+    elapsed = time.perf_counter() - started
+    after = await totals()
+    print(f"batched settlement:  {len(retry) / elapsed:>8,.0f} battles/s, "
+          f"{statements['count'] / len(retry):.2f} statements/battle, "
+          f"{settlement.metrics.batches} batches, engine rows left {battle_engine.size}, "
+          f"coins +{after[0] - before[0]} of {expected_coins}, durability -{before[1] - after[1]}")
+
+    settled_again = await settlement.settle(retry)
+    print(f"retry of the same {len(retry)} battles: settled {len(settled_again)}, "
+          f"totals unchanged: {await totals() == after}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
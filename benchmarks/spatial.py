@@ -0,0 +1,73 @@
+"""Сетка против полного перебора для запросов близости.
+
+Запуск: python -m benchmarks.spatial
+"""
+import time
+
+import numpy as np
+
+import config
+from services.spatial import SpatialGrid
+
+TOTAL_PARTICIPANTS = 20_000
+QUERIES = 2_000
+
+
+def build(battle_size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    slot = np.repeat(np.arange(TOTAL_PARTICIPANTS // battle_size), battle_size)
+    x = rng.uniform(0, config.ARENA_SIZE, len(slot)).astype(np.float32)
+    y = rng.uniform(0, config.ARENA_SIZE, len(slot)).astype(np.float32)
+    alive = np.ones(len(slot), dtype=bool)
+    return slot, x, y, alive
+
+
+def brute_pairs(slot, x, y, radius):
+    # O(n²) на бой, но векторно — честная база для сравнения
+    total = 0
+    for s in np.unique(slot):
+        rows = np.nonzero(slot == s)[0]
+        dx = x[rows][:, None] - x[rows][None, :]
+        dy = y[rows][:, None] - y[rows][None, :]
+        total += int(((dx * dx + dy * dy) <= radius * radius).sum()) - len(rows)
+    return total
+
+
+def brute_range(slot, x, y, i, radius):
+    rows = np.nonzero(slot == slot[i])[0]
+    rows = rows[rows != i]
+    dx = x[rows] - x[i]
+    dy = y[rows] - y[i]
+    return rows[dx * dx + dy * dy <= radius * radius]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    radius = config.ATTACK_RANGE
+    print(f"{TOTAL_PARTICIPANTS} participants, radius {radius}, cell {config.SPATIAL_CELL_SIZE}")
+    print(f"{'battle size':>11} {'rebuild ms':>10} {'pairs grid ms':>13} {'pairs brute ms':>14} "
+          f"{'range grid us':>13} {'range brute us':>14}")
+    for battle_size in (8, 100, 1_000, 5_000):
+        slot, x, y, alive = build(battle_size)
+        grid = SpatialGrid(config.SPATIAL_CELL_SIZE, config.ARENA_SIZE)
+        _, rebuild = timed(grid.rebuild, slot, x, y, alive)
+
+        (i, _), pairs_grid = timed(grid.pairs_within, radius)
+        brute_count, pairs_brute = timed(brute_pairs, slot, x, y, radius)
+        assert len(i) == brute_count
+
+        queries = np.random.default_rng(1).integers(0, len(slot), QUERIES)
+        _, range_grid = timed(lambda: [grid.query_range(q, radius) for q in queries])
+        _, range_brute = timed(lambda: [brute_range(slot, x, y, q, radius) for q in queries])
+
+        print(f"{battle_size:>11} {rebuild * 1e3:>10.2f} {pairs_grid * 1e3:>13.2f} {pairs_brute * 1e3:>14.2f} "
+              f"{range_grid / QUERIES * 1e6:>13.1f} {range_brute / QUERIES * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Число обращений к БД на путях записи.
+
+Считает SQL-выражения и коммиты, которые отправляет в БД каждая
+операция crud, на локальной SQLite (aiosqlite).
+
+Запуск: python -m benchmarks.write_paths
+"""
+import asyncio
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import crud.characters
+import crud.users
+from database import Base
+from fastapi import HTTPException
+from schemas.characters import CreateCharacter
+from schemas.users import UserCreateRequest
+
+RUNS = 200
+
+
+class RoundTrips:
+    def __init__(self, engine):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+
+async def measure(counter, session_factory, name, operation):
+    counter.reset()
+    started = time.perf_counter()
+    for i in range(RUNS):
+        async with session_factory() as db:
+            try:
+                await operation(i, db)
+            except HTTPException:
+                pass
+    elapsed = time.perf_counter() - started
+    print(f"{name:<34} {counter.statements / RUNS:>10.1f} {counter.commits / RUNS:>8.1f} "
+          f"{elapsed / RUNS * 1e3:>8.2f}")
+
+
+async def main():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    counter = RoundTrips(engine)
+
+    def user(i):
+        return UserCreateRequest(username=f"Player{i:06d}", email=f"player{i}@example.com", password="Passwod123")
+
+    def character(i):
+        return CreateCharacter(name=f"Hero{i:06d}", base_health=100, base_damage=50, base_speed=20)
+
+    print(f"{'operation':<34} {'stmts/op':>10} {'commits':>8} {'ms/op':>8}")
+    await measure(counter, session_factory, "create_user",
+                  lambda i, db: crud.users.create_user(user(i), db))
+    await measure(counter, session_factory, "create_user (duplicate)",
+                  lambda i, db: crud.users.create_user(user(i), db))
+    await measure(counter, session_factory, "create_character",
+                  lambda i, db: crud.characters.create_character(character(i), db))
+    await measure(counter, session_factory, "create_character (duplicate)",
+                  lambda i, db: crud.characters.create_character(character(i), db))
+    await measure(counter, session_factory, "add_character_to_user",
+                  lambda i, db: crud.characters.add_character_to_user(i + 1, 1, db))
+    await measure(counter, session_factory, "add_character_to_user (duplicate)",
+                  lambda i, db: crud.characters.add_character_to_user(i + 1, 1, db))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+from datetime import datetime
+
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud.currency
+from enums import BattleStatus
+from models import ArenaDB, BattleDB, BattleParticipantDB, UserEquipmentDB
+
+_user_equipment = UserEquipmentDB.__table__
+
+
+def _wear_equipment(user_ids: list[int], loss: int):
+    return (
+        update(_user_equipment)
+        .where(
+            _user_equipment.c.user_id.in_(user_ids),
+            _user_equipment.c.is_equipped.is_(True),
+            _user_equipment.c.durability > 0
+        )
+        .values(durability=case(
+            (_user_equipment.c.durability > loss, _user_equipment.c.durability - loss),
+            else_=0
+        ))
+    )
+
+
+async def arena_exists(arena_id: int, db: AsyncSession) -> bool:
+    result = await db.execute(
+        select(ArenaDB.arena_id).where(ArenaDB.arena_id == arena_id)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def create_started_battles(battles: list[dict], db: AsyncSession) -> list[dict]:
+    # Бой сразу пишется заполненным и в статусе IN_PROCESS вместе со всеми
+    # участниками в одной транзакции: наполовину набранный WAITING-бой
+    # никто не увидит, а счётчик current_players не читается и не гонится
+    started_at = datetime.utcnow()
+    result = await db.execute(
+        insert(BattleDB).returning(BattleDB.battle_id, sort_by_parameter_order=True),
+        [
+            {
+                "arena_id": battle["arena_id"],
+                "status": BattleStatus.IN_PROCESS,
+                "max_players": battle["max_players"],
+                "current_players": len(battle["participants"]),
+                "started_at": started_at
+            }
+            for battle in battles
+        ]
+    )
+    for battle, battle_id in zip(battles, result.scalars()):
+        battle["battle_id"] = battle_id
+
+    participants = [
+        dict(participant, battle_id=battle["battle_id"])
+        for battle in battles
+        for participant in battle["participants"]
+    ]
+    result = await db.execute(
+        insert(BattleParticipantDB).returning(
+            BattleParticipantDB.battle_participant_id, sort_by_parameter_order=True
+        ),
+        participants
+    )
+    for participant, participant_id in zip(participants, result.scalars()):
+        participant["battle_participant_id"] = participant_id
+
+    await db.commit()
+
+    by_battle: dict[int, list[dict]] = {}
+    for participant in participants:
+        by_battle.setdefault(participant["battle_id"], []).append(participant)
+    for battle in battles:
+        battle["participants"] = by_battle[battle["battle_id"]]
+    return battles
+
+
+async def settle_battles(battles: list[dict], durability_loss: int, db: AsyncSession) -> list[int]:
+    # Бой: battle_id, ended_at, participants (итоговое состояние строк
+    # BattleParticipantDB), rewards (записи журнала валюты). Всё в транзакции
+    # вызывающего, commit за ним. Закрываются только бои, ещё не FINISHED:
+    # повтор после сбоя ничего не начислит второй раз. Возвращает закрытые бои
+    if not battles:
+        return []
+    ended_at = {battle["battle_id"]: battle["ended_at"] for battle in battles}
+    result = await db.execute(
+        update(BattleDB)
+        .where(BattleDB.battle_id.in_(list(ended_at)), BattleDB.status != BattleStatus.FINISHED)
+        .values(status=BattleStatus.FINISHED, ended_at=case(ended_at, value=BattleDB.battle_id))
+        .returning(BattleDB.battle_id)
+        .execution_options(synchronize_session=False)
+    )
+    settled = set(result.scalars())
+    battles = [battle for battle in battles if battle["battle_id"] in settled]
+    if not battles:
+        return []
+
+    participants = [participant for battle in battles for participant in battle["participants"]]
+    await db.execute(update(BattleParticipantDB), [
+        {key: value for key, value in participant.items() if key != "user_id"}
+        for participant in participants
+    ])
+    await crud.currency.post_entries([entry for battle in battles for entry in battle["rewards"]], db)
+
+    if durability_loss:
+        # Игрок мог успеть сыграть в пачке не один бой: одно выражение на
+        # каждое число сыгранных боёв, обычно одно на всю пачку
+        battles_played: dict[int, int] = {}
+        for participant in participants:
+            battles_played[participant["user_id"]] = battles_played.get(participant["user_id"], 0) + 1
+        by_count: dict[int, list[int]] = {}
+        for user_id, count in battles_played.items():
+            by_count.setdefault(count, []).append(user_id)
+        for count, user_ids in sorted(by_count.items()):
+            await db.execute(_wear_equipment(sorted(user_ids), count * durability_loss))
+    return [battle["battle_id"] for battle in battles]
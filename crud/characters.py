@@ -1,33 +1,47 @@
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.testing.suite.test_reflection import users
 
-from models import CharacterDB, UserDB
+import config
+from database import ReadSessionLocal
+from models import CharacterDB, UserDB, user_characters
+from responses import dumps
 from schemas.characters import CreateCharacter
+from services.catalog import character_catalog
+from services.invalidation import bus
 
 
 async def create_character(character: CreateCharacter, db: AsyncSession):
-    result = await db.execute(
-        select(CharacterDB).where(CharacterDB.name == character.name)
-    )
-    existing_character = result.scalar_one_or_none()
-    if existing_character is not None:
+    try:
+        result = await db.execute(
+            insert(CharacterDB)
+            .values(
+                name=character.name,
+                base_damage=character.base_damage,
+                base_health=character.base_health,
+                base_speed=character.base_speed
+            )
+            .returning(
+                CharacterDB.character_id,
+                CharacterDB.name,
+                CharacterDB.base_health,
+                CharacterDB.base_damage,
+                CharacterDB.base_speed
+            )
+        )
+        new_character = result.one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail="Персонаж с таким именем уже существует"
         )
 
-    new_character = CharacterDB(
-        name=character.name,
-        base_damage=character.base_damage,
-        base_health=character.base_health,
-        base_speed=character.base_speed
-    )
-
-    db.add(new_character)
-    await db.commit()
-    await db.refresh(new_character)
+    character_catalog.add(new_character)
+    # Остальные воркеры перечитают справочник из базы
+    bus.publish("catalog", "characters", local=False)
     return new_character
 
 
@@ -36,49 +50,87 @@ async def add_character_to_user(
         character_id: int,
         db: AsyncSession
 ):
+    # Имена нужны для ответа, а наличие персонажа у игрока проверяет
+    # первичный ключ user_characters — без загрузки всего ростера
     result = await db.execute(
-        select(UserDB).where(UserDB.user_id == user_id)
+        select(UserDB.username, CharacterDB.name)
+        .join(CharacterDB, CharacterDB.character_id == character_id)
+        .where(UserDB.user_id == user_id)
     )
-    user = result.scalar_one_or_none()
+    names = result.one_or_none()
 
-    result = await db.execute(
-        select(CharacterDB).where(CharacterDB.character_id == character_id)
-    )
-    character = result.scalar_one_or_none()
-
-    if not user or not character:
+    if names is None:
         raise HTTPException(404, "Пользователь или персонаж не найден")
 
-    if character in user.characters:
+    try:
+        await db.execute(
+            insert(user_characters).values(user_id=user_id, character_id=character_id)
+        )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(400, "Пользователь уже имеет этого персонажа")
 
-    user.characters.append(character)
-    await db.commit()
-
-    return {"message": f"Персонаж {character.name} добавлен пользователю {user.username}"}
-
+    return {"message": f"Персонаж {names.name} добавлен пользователю {names.username}"}
 
-async def get_characters(db: AsyncSession):
-    result = await db.execute(select(CharacterDB))
-    return result.scalars().all()
 
-
-async def get_character_by_id(character_id: int, db: AsyncSession):
-    result = await db.execute(
-        select(CharacterDB).where(CharacterDB.character_id == character_id)
+async def get_user_characters(
+        user_id: int,
+        db: AsyncSession,
+        after: int | None = None,
+        limit: int = config.PAGE_SIZE_DEFAULT
+):
+    # Keyset-пагинация по character_id: страница не зависит от глубины.
+    # Строки, а не сущности ORM: список только читается и сразу сериализуется
+    query = (
+        select(
+            CharacterDB.character_id,
+            CharacterDB.name,
+            CharacterDB.base_health,
+            CharacterDB.base_damage,
+            CharacterDB.base_speed
+        )
+        .join(user_characters, user_characters.c.character_id == CharacterDB.character_id)
+        .where(user_characters.c.user_id == user_id)
+        .order_by(CharacterDB.character_id)
+        .limit(limit)
     )
-    return result.scalar_one_or_none()
+    if after is not None:
+        query = query.where(CharacterDB.character_id > after)
 
+    result = await db.execute(query)
+    characters = result.all()
 
-async def get_user_characters(user_id: int, db: AsyncSession):
-    result = await db.execute(
-        select(UserDB).where(UserDB.user_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-
-    if not user:
-        raise HTTPException(404, "Пользователь не найден")
+    # Существование пользователя проверяем только для пустой страницы
+    if not characters:
+        result = await db.execute(
+            select(UserDB.user_id).where(UserDB.user_id == user_id)
+        )
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(404, "Пользователь не найден")
 
-    return user.characters
+    return characters
 
 
+async def stream_characters(user_id: int | None = None):
+    # Своя сессия: генератор живёт дольше зависимости get_db
+    query = (
+        select(
+            CharacterDB.character_id,
+            CharacterDB.name,
+            CharacterDB.base_health,
+            CharacterDB.base_damage,
+            CharacterDB.base_speed
+        )
+        .order_by(CharacterDB.character_id)
+        .execution_options(yield_per=config.STREAM_BATCH_SIZE)
+    )
+    if user_id is not None:
+        query = query.join(
+            user_characters, user_characters.c.character_id == CharacterDB.character_id
+        ).where(user_characters.c.user_id == user_id)
+
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield b"".join(dumps(dict(row._mapping)) + b"\n" for row in partition)
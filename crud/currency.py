@@ -0,0 +1,65 @@
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import CurrencyLedgerDB, UserDB
+
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Core-таблица, а не сущность: обычный executemany без ORM bulk-режима
+_users = UserDB.__table__
+_apply_deltas = (
+    update(_users)
+    .where(_users.c.user_id == bindparam("target_user_id"))
+    .values(
+        coins=func.coalesce(_users.c.coins, 0) + bindparam("coins_delta"),
+        crystals=func.coalesce(_users.c.crystals, 0) + bindparam("crystals_delta")
+    )
+)
+
+
+async def post_entries(entries: list[dict], db: AsyncSession) -> set[str]:
+    # Записи журнала и балансы — в транзакции вызывающего, commit за ним.
+    # Строки с уже виданным idempotency_key пропускаются ON CONFLICT DO NOTHING,
+    # балансы меняются одним UPDATE ... SET coins = coins + :delta на
+    # пользователя. Возвращает ключи записей, которые действительно прошли
+    if not entries:
+        return set()
+    dialect_insert = _DIALECT_INSERTS[db.bind.dialect.name]
+    result = await db.execute(
+        dialect_insert(CurrencyLedgerDB)
+        .on_conflict_do_nothing(index_elements=[CurrencyLedgerDB.idempotency_key])
+        .returning(
+            CurrencyLedgerDB.user_id,
+            CurrencyLedgerDB.coins_delta,
+            CurrencyLedgerDB.crystals_delta,
+            CurrencyLedgerDB.idempotency_key
+        ),
+        [
+            {
+                "user_id": entry["user_id"],
+                "coins_delta": entry.get("coins_delta", 0),
+                "crystals_delta": entry.get("crystals_delta", 0),
+                "reason": entry["reason"],
+                "idempotency_key": entry.get("idempotency_key")
+            }
+            for entry in entries
+        ]
+    )
+
+    deltas: dict[int, list[int]] = {}
+    applied: set[str] = set()
+    for user_id, coins, crystals, key in result:
+        total = deltas.setdefault(user_id, [0, 0])
+        total[0] += coins
+        total[1] += crystals
+        if key is not None:
+            applied.add(key)
+
+    if deltas:
+        # Одинаковый порядок строк во всех пачках — без взаимных блокировок
+        await db.execute(_apply_deltas, [
+            {"target_user_id": user_id, "coins_delta": coins, "crystals_delta": crystals}
+            for user_id, (coins, crystals) in sorted(deltas.items())
+        ])
+    return applied
@@ -0,0 +1,11 @@
+from sqlalchemy.orm import raiseload
+
+# Профили загрузки связей. Связи в models.py объявлены как raise_on_sql,
+# поэтому любая незапланированная загрузка падает с ошибкой, а не уходит
+# каскадом selectin по всем владельцам персонажей.
+
+# Справочник персонажей: только колонки, без владельцев
+CHARACTER_CATALOG = (raiseload("*"),)
+
+# Пользователь без связей: авторизация, вход, проверки существования
+USER_ONLY = (raiseload("*"),)
@@ -0,0 +1,64 @@
+from sqlalchemy import select, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import UserDB, CharacterDB, EquipmentDB, UserEquipmentDB, user_characters
+
+# Базовые статы игрока без активного персонажа; бонусы экипировки к ним
+# прибавляются так же, как к статам персонажа
+DEFAULT_STATS = {"health": 100, "damage": 10, "speed": 1.0}
+
+
+def _effective_stats_query(user_ids: list[int]):
+    # Бонусы надетой экипировки агрегируются отдельно, чтобы join с
+    # персонажем не размножал строки суммы
+    bonuses = (
+        select(
+            UserEquipmentDB.user_id,
+            func.sum(EquipmentDB.health_bonus).label("health_bonus"),
+            func.sum(EquipmentDB.damage_bonus).label("damage_bonus"),
+            func.sum(EquipmentDB.speed_bonus).label("speed_bonus")
+        )
+        .join(EquipmentDB, EquipmentDB.equipment_id == UserEquipmentDB.equipment_id)
+        .where(UserEquipmentDB.is_equipped.is_(True), UserEquipmentDB.user_id.in_(user_ids))
+        .group_by(UserEquipmentDB.user_id)
+        .subquery()
+    )
+
+    return (
+        select(
+            UserDB.user_id,
+            CharacterDB.character_id,
+            (func.coalesce(CharacterDB.base_health, DEFAULT_STATS["health"])
+             + func.coalesce(bonuses.c.health_bonus, 0)).label("health"),
+            (func.coalesce(CharacterDB.base_damage, DEFAULT_STATS["damage"])
+             + func.coalesce(bonuses.c.damage_bonus, 0)).label("damage"),
+            (func.coalesce(CharacterDB.base_speed, DEFAULT_STATS["speed"])
+             + func.coalesce(bonuses.c.speed_bonus, 0)).label("speed")
+        )
+        # Строка на пользователя: активный персонаж один (ix_user_characters_active)
+        .outerjoin(
+            user_characters,
+            and_(
+                user_characters.c.user_id == UserDB.user_id,
+                user_characters.c.is_active.is_(True)
+            )
+        )
+        .outerjoin(CharacterDB, CharacterDB.character_id == user_characters.c.character_id)
+        .outerjoin(bonuses, bonuses.c.user_id == UserDB.user_id)
+        .where(UserDB.user_id.in_(user_ids))
+    )
+
+
+async def get_effective_stats(user_ids: list[int], db: AsyncSession) -> dict[int, dict]:
+    # Базовые статы активного персонажа плюс бонусы надетой экипировки,
+    # для любого числа пользователей за один запрос
+    if not user_ids:
+        return {}
+
+    result = await db.execute(_effective_stats_query(list(set(user_ids))))
+    return {row.user_id: dict(row._mapping) for row in result}
+
+
+async def get_user_effective_stats(user_id: int, db: AsyncSession) -> dict | None:
+    stats = await get_effective_stats([user_id], db)
+    return stats.get(user_id)
@@ -1,49 +1,125 @@
 from fastapi import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
-from sqlalchemy import select, func
+from sqlalchemy import or_, select, update, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from crud import loading
+from enums import UserRole
 from models import UserDB
 from schemas import users
 import security
+from services.hashing import hasher
+from services.invalidation import bus
+from services.principals import Principal
 
-async def create_user(user: users.UserCreateRequest, db: AsyncSession):
-    result = await db.execute(select(func.count())
-                              .where(UserDB.username == user.username))
-    if result.scalar() > 0:
-        raise HTTPException(status_code=400, detail="Пользователь с таким ником уже существует")
-    result = await db.execute(select(func.count())
-                              .where(UserDB.email == user.email))
-    if result.scalar() > 0:
+# Роли по возрастанию прав
+_ROLE_ORDER = [UserRole.USER, UserRole.MODERATOR, UserRole.ADMIN, UserRole.SUPER_ADMIN]
+
+def _constraint_name(error: IntegrityError) -> str | None:
+    # psycopg отдаёт имя в diag, asyncpg — в исключении драйвера под адаптером
+    for source in (error.orig, getattr(error.orig, "__cause__", None)):
+        diag = getattr(source, "diag", None)
+        name = getattr(diag, "constraint_name", None) or getattr(source, "constraint_name", None)
+        if name:
+            return name
+    return None
+
+def is_unique_violation(error: IntegrityError, table: str, column: str) -> bool:
+    name = _constraint_name(error)
+    if name is not None:
+        # Имя по умолчанию для unique=True в PostgreSQL
+        return name == f"{table}_{column}_key"
+    # SQLite имён ограничений не сообщает: "UNIQUE constraint failed: users.email"
+    return f"{table}.{column}" in str(error.orig)
+
+def _raise_taken(email: bool):
+    if email:
         raise HTTPException(status_code=400, detail="Пользователь с таким электронным адресом уже существует")
+    raise HTTPException(status_code=400, detail="Пользователь с таким ником уже существует")
 
-    new_user = UserDB(
-        username=user.username,
-        email=user.email,
-        hashed_password=security.get_password_hash(user.password)
+async def create_user(user: users.UserCreateRequest, db: AsyncSession):
+    # Занятые ник и почту отсекаем до bcrypt: повторные регистрации не
+    # должны занимать пул хеширования. Гонку между проверкой и INSERT
+    # ловит уникальность в БД
+    result = await db.execute(
+        select(UserDB.email)
+        .where(or_(UserDB.email == user.email, UserDB.username == user.username))
+        .limit(1)
     )
+    taken = result.one_or_none()
+    # Соединение возвращается в пул, пока считается bcrypt
+    await db.rollback()
+    if taken is not None:
+        _raise_taken(taken.email == user.email)
+
+    hashed_password = await hasher.hash(user.password)
+    try:
+        result = await db.execute(
+            insert(UserDB)
+            .values(
+                username=user.username,
+                email=user.email,
+                hashed_password=hashed_password
+            )
+            .returning(UserDB.user_id, UserDB.username, UserDB.email)
+        )
+        new_user = result.one()
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        _raise_taken(is_unique_violation(error, "users", "email"))
 
-    db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
     return new_user
 
 async def login_user(login_data: users.UserLoginRequest, db: AsyncSession):
     result = await db.execute(
-        select(UserDB).where(UserDB.email == login_data.email)
+        select(UserDB)
+        .options(*loading.USER_ONLY)
+        .where(UserDB.email == login_data.email)
     )
     user = result.scalar_one_or_none()
 
-    if not user or not security.verify_password(login_data.password, user.hashed_password):
+    if not user or not await hasher.verify(login_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Неверный логин или пароль")
 
+    hasher.schedule_rehash(user.user_id, login_data.password, user.hashed_password)
+
     return user
 
 async def get_me(credentials: HTTPAuthorizationCredentials, db: AsyncSession):
-    token = credentials.credentials
-    payload = security.verify_token(token)
+    principal = await security.get_current_user(credentials, db)
 
     result = await db.execute(
-        select(UserDB).where(UserDB.user_id == payload["user_id"])
+        select(UserDB.user_id, UserDB.username, UserDB.email)
+        .where(UserDB.user_id == principal.user_id)
     )
-    return result.scalar_one_or_none()
+    return result.one_or_none()
+
+async def change_role(user_id: int, role: UserRole, db: AsyncSession):
+    result = await db.execute(
+        update(UserDB).where(UserDB.user_id == user_id).values(role=role)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    await db.commit()
+    # Кэш принципалов сбрасывается во всех воркерах
+    bus.publish("principal", user_id)
+
+async def set_active(user_id: int, is_active: bool, actor: Principal, db: AsyncSession):
+    # Блокировать и разблокировать можно только пользователей с ролью строго
+    # ниже своей; проверка в том же UPDATE, без гонки со сменой роли
+    lower_roles = _ROLE_ORDER[:_ROLE_ORDER.index(actor.role)]
+    result = await db.execute(
+        update(UserDB)
+        .where(UserDB.user_id == user_id, UserDB.role.in_(lower_roles))
+        .values(is_active=is_active)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        exists = await db.scalar(select(UserDB.user_id).where(UserDB.user_id == user_id))
+        if exists is None:
+            raise HTTPException(status_code=404, detail="Пользователь не найден")
+        raise HTTPException(status_code=403, detail="Недостаточно прав для изменения этого пользователя")
+    await db.commit()
+    bus.publish("principal", user_id)
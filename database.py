@@ -0,0 +1,110 @@
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+import config
+
+
+@dataclass
+class PoolStats:
+    name: str
+    connects: int = 0
+    checkouts: int = 0
+    checkins: int = 0
+    wait_count: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def observe_wait(self, wait: float):
+        self.wait_count += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+# Подписчики на время ожидания соединения (services.metrics)
+wait_observers: list[Callable[[float], None]] = []
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Время ожидания свободного соединения: событий "до checkout" у пула нет,
+    # поэтому замеряем сам захват соединения из очереди
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - started
+            self.stats.observe_wait(wait)
+            for observer in wait_observers:
+                observer(wait)
+
+    def recreate(self):
+        # engine.dispose() пересоздаёт пул — статистика должна пережить это
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _create_engine(url: str, name: str) -> AsyncEngine:
+    new_engine = create_async_engine(
+        url,
+        echo=config.DB_ECHO,
+        poolclass=TimedQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING
+    )
+
+    stats = PoolStats(name)
+    new_engine.sync_engine.pool.stats = stats
+    event.listen(new_engine.sync_engine, "connect", lambda *args: _count(stats, "connects"))
+    event.listen(new_engine.sync_engine, "checkout", lambda *args: _count(stats, "checkouts"))
+    event.listen(new_engine.sync_engine, "checkin", lambda *args: _count(stats, "checkins"))
+    return new_engine
+
+
+def _count(stats: PoolStats, field: str):
+    setattr(stats, field, getattr(stats, field) + 1)
+
+
+engine = _create_engine(config.DATABASE_URL, "primary")
+read_engine = (
+    _create_engine(config.READ_DATABASE_URL, "replica")
+    if config.READ_DATABASE_URL else engine
+)
+
+# Сессия берёт соединение из пула только при первом запросе к БД:
+# обработчики, ответившие из кэша, пул не трогают
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+
+Base = declarative_base()
+
+
+def pool_status() -> list[dict]:
+    engines = [engine] if read_engine is engine else [engine, read_engine]
+    result = []
+    for item in engines:
+        pool = item.sync_engine.pool
+        stats: PoolStats = pool.stats
+        result.append({
+            "name": stats.name,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "connects": stats.connects,
+            "checkouts": stats.checkouts,
+            "checkins": stats.checkins,
+            "wait_avg": stats.wait_total / (stats.wait_count or 1),
+            "wait_max": stats.wait_max,
+        })
+    return result
@@ -1,9 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import SessionLocal
+from database import SessionLocal, ReadSessionLocal
 
 async def get_db() -> AsyncSession:
     async with SessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
+
+async def get_read_db() -> AsyncSession:
+    # Только для чтения: может отставать от основной базы на лаг репликации
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
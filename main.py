@@ -1,23 +1,98 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
-from database import engine, Base
+
+import config
+from database import engine, read_engine, Base, SessionLocal
+from responses import FastJSONResponse
 from routers.users import router as user_router
 from routers.characters import router as character_router
+from routers.battles import router as battle_router
+from routers.equipment import router as equipment_router
+from routers.leaderboard import router as leaderboard_router
+from routers.system import router as system_router, metrics_router
+from services.battle_engine import battle_engine
+from services.battle_log import event_log
+from services.battle_state import state_writer
+from services.broadcast import broadcaster
+from services.catalog import arena_catalog, character_catalog, equipment_catalog
+from services.hashing import hasher
+from services.invalidation import bus
+from services.leaderboard import leaderboard
+from services.ledger import ledger
+from services.matchmaking import matchmaker
+from services.settlement import settlement
+from services import metrics
+from services.startup import ensure_schema, startup_timer, warm_pool
+
+
+async def _load_catalog(catalog):
+    # У каждого справочника своя сессия, чтобы грузить их параллельно
+    async with SessionLocal() as db:
+        await catalog.load(db)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    startup_timer.start()
+    with startup_timer.phase("schema"):
+        startup_timer.details["schema_synced"] = await ensure_schema(engine, Base.metadata)
+    with startup_timer.phase("pool"):
+        warmed = [await warm_pool(engine, config.DB_POOL_WARM)]
+        if read_engine is not engine:
+            warmed.append(await warm_pool(read_engine, config.DB_POOL_WARM))
+        startup_timer.details["pool_warmed"] = warmed
+    with startup_timer.phase("catalogs"):
+        await asyncio.gather(*(
+            _load_catalog(catalog)
+            for catalog in (character_catalog, equipment_catalog, arena_catalog, leaderboard)
+        ))
+    with startup_timer.phase("services"):
+        bus.start()
+        if config.BATTLES_ENABLED:
+            battle_engine.add_listener(broadcaster.on_tick)
+            if config.BATTLE_LOG_ENABLED:
+                event_log.start()
+            battle_engine.start()
+            state_writer.start()
+        # Снимки пишет экземпляр с боями: курсор снимка идёт за их закрытием
+        leaderboard.start(snapshots=config.BATTLES_ENABLED and config.WORKER_INDEX == 0)
+        ledger.start()
+        if config.BATTLES_ENABLED:
+            # Последний слушатель тика: убирает завершённые бои из движка
+            settlement.start()
+            matchmaker.start()
+    startup_timer.finish()
     yield
+    await matchmaker.stop()
+    await battle_engine.stop()
+    await event_log.stop()
+    await state_writer.stop()
+    await settlement.stop()
+    await leaderboard.stop()
+    await ledger.stop()
+    bus.stop()
+    await hasher.shutdown()
     await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
 
 
-app = FastAPI(title="API for Game",lifespan=lifespan)
+app = FastAPI(title="API for Game", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.include_router(user_router)
 app.include_router(character_router)
+if config.BATTLES_ENABLED:
+    app.include_router(battle_router)
+app.include_router(equipment_router)
+app.include_router(leaderboard_router)
+app.include_router(system_router)
+app.include_router(metrics_router)
+
+if config.METRICS_ENABLED:
+    metrics.install(app)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", port=8080, reload=True)
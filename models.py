@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Float, Enum, DateTime, Boolean, func, ForeignKey, UniqueConstraint, \
-    Table
+    Table, JSON, Index
 from sqlalchemy.orm import relationship
 
 from enums import EquipmentCategory, BattleStatus, UserRole
@@ -16,9 +16,18 @@ user_characters = Table(
     Column('is_active', Boolean, default=False)
 )
 
+# Активный персонаж у игрока один: из него берутся характеристики в бою
+Index(
+    "ix_user_characters_active",
+    user_characters.c.user_id,
+    unique=True,
+    postgresql_where=user_characters.c.is_active.is_(True),
+    sqlite_where=user_characters.c.is_active.is_(True)
+)
+
 class UserDB(Base):
     __tablename__="users"
-    user_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String(20), nullable=False, unique=True)
     email = Column(String(30), nullable=False, unique=True)
     hashed_password = Column(String, nullable=False)
@@ -31,7 +40,7 @@ class UserDB(Base):
         "CharacterDB",
         secondary=user_characters,
         back_populates="users",
-        lazy="selectin"
+        lazy="raise_on_sql"
     )
 
     equipment_instances = relationship(
@@ -46,33 +55,9 @@ class UserDB(Base):
         cascade="all, delete-orphan"
     )
 
-    @property
-    def total_health_bonus(self):
-        return sum(
-            eq.template.health_bonus
-            for eq in self.equipment_instances
-            if eq.is_equipped
-        )
-
-    @property
-    def total_damage_bonus(self):
-        return sum(
-            eq.template.damage_bonus
-            for eq in self.equipment_instances
-            if eq.is_equipped
-        )
-
-    @property
-    def total_speed_bonus(self):
-        return sum(
-            eq.template.speed_bonus
-            for eq in self.equipment_instances
-            if eq.is_equipped
-        )
-
 class CharacterDB(Base):
     __tablename__="characters"
-    character_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    character_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, nullable = False, unique=True)
     base_health = Column(Integer)
     base_damage = Column(Integer)
@@ -82,12 +67,12 @@ class CharacterDB(Base):
         "UserDB",
         secondary=user_characters,
         back_populates="characters",
-        lazy="selectin"
+        lazy="raise_on_sql"
     )
 
 class EquipmentDB(Base):
     __tablename__="equipments"
-    equipment_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    equipment_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(50), unique=True)
     description = Column(String(255))
     equipment_category = Column(Enum(EquipmentCategory))
@@ -106,7 +91,7 @@ class EquipmentDB(Base):
 class UserEquipmentDB(Base):
     __tablename__ = "user_equipment"
 
-    user_equipment_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    user_equipment_id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     equipment_id = Column(Integer, ForeignKey('equipments.equipment_id', ondelete='CASCADE'), nullable=False)
 
@@ -117,6 +102,18 @@ class UserEquipmentDB(Base):
     user = relationship("UserDB", back_populates="equipment_instances")
     template = relationship("EquipmentDB", back_populates="user_instances")
 
+    __table_args__ = (
+        # Надетая экипировка игрока (характеристики, износ после боя). Частичный
+        # индекс там, где он есть: надето меньшинство предметов. Запросы должны
+        # писать is_equipped.is_(True) — с ним совпадает условие индекса
+        Index(
+            "ix_user_equipment_equipped",
+            "user_id", "equipment_id",
+            postgresql_where=is_equipped.is_(True),
+            sqlite_where=is_equipped.is_(True)
+        ),
+    )
+
 
 # class AbilityDB(Base):
 #     __tablename__="abilities"
@@ -126,14 +123,14 @@ class UserEquipmentDB(Base):
 
 class ArenaDB(Base):
     __tablename__ = "arenas"
-    arena_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    arena_id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(20), nullable=False, unique=True)
 
     battles = relationship("BattleDB", back_populates="arena", cascade="all, delete-orphan")
 
 class BattleDB(Base):
     __tablename__ = "battles"
-    battle_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    battle_id = Column(Integer, primary_key=True, autoincrement=True)
     arena_id = Column(Integer, ForeignKey("arenas.arena_id", ondelete="CASCADE"))
     status = Column(Enum(BattleStatus), default=BattleStatus.WAITING)
     max_players = Column(Integer, default=8)
@@ -145,9 +142,28 @@ class BattleDB(Base):
     arena = relationship("ArenaDB", back_populates="battles")
     battle_participants = relationship("BattleParticipantDB", back_populates="battle", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Поиск открытого боя на арене: WAITING-боёв единицы, индекс по ним
+        # крошечный. Статус в запросе — литерал, а не параметр, иначе
+        # планировщик не докажет условие частичного индекса
+        Index(
+            "ix_battles_open",
+            "arena_id", "status",
+            postgresql_where=status == BattleStatus.WAITING,
+            sqlite_where=status == BattleStatus.WAITING
+        ),
+        # Курсор рейтинга: наименьший незавершённый бой
+        Index(
+            "ix_battles_unfinished",
+            "battle_id",
+            postgresql_where=status != BattleStatus.FINISHED,
+            sqlite_where=status != BattleStatus.FINISHED
+        ),
+    )
+
 class BattleParticipantDB(Base):
     __tablename__ = "battle_participants"
-    battle_participant_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    battle_participant_id = Column(Integer, primary_key=True, autoincrement=True)
     battle_id = Column(Integer, ForeignKey("battles.battle_id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"))
     current_health = Column(Integer, default=100)
@@ -163,5 +179,37 @@ class BattleParticipantDB(Base):
     __table_args__ = (
         # Участник не может быть дважды в одной битве
         UniqueConstraint('battle_id', 'user_id', name='uq_battle_user'),
+        # История боёв игрока; по battle_id ищет уникальный индекс выше
+        Index("ix_battle_participants_user", "user_id", "battle_id"),
     )
 
+
+class LeaderboardEntryDB(Base):
+    # Снимок рейтинга по убийствам (services.leaderboard); arena_id = 0 — общий рейтинг
+    __tablename__ = "leaderboard_entries"
+    arena_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    kills = Column(Integer, nullable=False, default=0)
+
+
+class LeaderboardSnapshotDB(Base):
+    __tablename__ = "leaderboard_snapshots"
+    snapshot_id = Column(Integer, primary_key=True)
+    taken_at = Column(DateTime, nullable=False)
+    # Курсор: все завершённые бои с battle_id <= last_battle_id в снимке учтены
+    last_battle_id = Column(Integer, nullable=False, default=0)
+    # Бои выше курсора, уже учтённые в снимке: при догонке их пропускаем
+    recent_battles = Column(JSON, nullable=False, default=list)
+
+
+class CurrencyLedgerDB(Base):
+    # Журнал изменений coins/crystals, только дописывается (services.ledger).
+    # Ключ идемпотентности уникален: повтор той же награды не оплачивается
+    __tablename__ = "currency_ledger"
+    entry_id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False, index=True)
+    coins_delta = Column(Integer, nullable=False, default=0)
+    crystals_delta = Column(Integer, nullable=False, default=0)
+    reason = Column(String(50), nullable=False)
+    idempotency_key = Column(String(100), nullable=True, unique=True)
+    created_at = Column(DateTime, server_default=func.now())
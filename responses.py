@@ -0,0 +1,29 @@
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any):
+    # Типы, которых orjson не знает (модели Pydantic, Decimal и т.п.)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class FastJSONResponse(JSONResponse):
+    # Ответ по умолчанию для всего приложения: orjson вместо json.dumps.
+    # Списочные эндпоинты возвращают его напрямую из словарей строк —
+    # тогда FastAPI не гоняет ответ через валидацию response_model
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
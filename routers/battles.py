@@ -0,0 +1,130 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.params import Depends, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import crud.battles
+from deps import get_db
+from schemas.battles import BattleJoinResponse
+from responses import FastJSONResponse
+from security import authenticate, get_current_active_user, require_moderator
+from services.battle_engine import battle_engine
+from services.battle_log import BattleReplay, event_log, to_dicts
+from services.broadcast import broadcaster
+from services.catalog import arena_catalog
+from services.matchmaking import matchmaker
+from services.principals import Principal
+from services.settlement import settlement
+
+router = APIRouter(
+    prefix="/battles",
+    tags=["Battle"]
+)
+
+
+@router.post("/join/{arena_id}", response_model=BattleJoinResponse)
+async def join_battle(
+    arena_id: int = Path(..., gt=0),
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Арены загружены при старте; в БД идём только за добавленными позже
+    if arena_id not in arena_catalog and not await crud.battles.arena_exists(arena_id, db):
+        raise HTTPException(status_code=404, detail="Арена не найдена")
+    # Соединение не нужно на время ожидания в очереди
+    await db.close()
+
+    battle_id = await matchmaker.join(current_user.user_id, arena_id)
+    return BattleJoinResponse(battle_id=battle_id, arena_id=arena_id)
+
+
+@router.delete("/join")
+async def leave_queue(current_user: Principal = Depends(get_current_active_user)):
+    if not matchmaker.leave(current_user.user_id):
+        raise HTTPException(status_code=404, detail="Вы не в очереди")
+    return {"message": "Вы покинули очередь"}
+
+
+@router.get("/matchmaking")
+async def get_matchmaking_stats():
+    return matchmaker.metrics.snapshot(matchmaker.queued())
+
+
+@router.get("/settlement")
+async def get_settlement_stats():
+    return settlement.metrics.snapshot(settlement.queued())
+
+
+@router.get("/{battle_id}/replay")
+async def get_battle_replay(
+    battle_id: int = Path(..., gt=0),
+    from_tick: int | None = Query(None, ge=0),
+    to_tick: int | None = Query(None, ge=0),
+    current_user: Principal = Depends(require_moderator)
+):
+    # Состояние участников после from_tick и события следующих тиков до to_tick
+    await event_log.flush(battle_id)
+    try:
+        replay = BattleReplay(config.BATTLE_LOG_DIR, battle_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Журнал боя не найден")
+
+    with replay:
+        start = replay.first_tick if from_tick is None else max(from_tick, replay.first_tick)
+        end = start + config.BATTLE_REPLAY_MAX_TICKS if to_tick is None else to_tick
+        if end < start:
+            raise HTTPException(status_code=400, detail="to_tick меньше from_tick")
+        if end - start > config.BATTLE_REPLAY_MAX_TICKS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Не больше {config.BATTLE_REPLAY_MAX_TICKS} тиков за запрос"
+            )
+        end = min(end, replay.last_tick)
+        return FastJSONResponse({
+            "battle_id": battle_id,
+            "first_tick": replay.first_tick,
+            "last_tick": replay.last_tick,
+            "from_tick": start,
+            "to_tick": end,
+            "state": list(replay.state_at(start).values()),
+            "events": to_dicts(replay.events(start + 1, end)),
+        })
+
+
+@router.websocket("/{battle_id}/ws")
+async def battle_stream(
+    websocket: WebSocket,
+    battle_id: int,
+    token: str | None = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    # Браузерный WebSocket не передаёт заголовки — токен в query
+    if token is None:
+        await websocket.close(code=4401, reason="Требуется токен")
+        return
+    try:
+        principal = await authenticate(token, db)
+    except HTTPException:
+        await websocket.close(code=4401, reason="Неверный токен")
+        return
+    finally:
+        # Соединение не нужно на время трансляции
+        await db.close()
+    if not principal.is_active:
+        await websocket.close(code=4403, reason="Пользователь заблокирован")
+        return
+
+    if not battle_engine.has_battle(battle_id):
+        await websocket.close(code=4404, reason="Бой не найден")
+        return
+
+    await websocket.accept()
+    subscriber = broadcaster.subscribe(battle_id)
+    try:
+        while (frame := await subscriber.next()) is not None:
+            await websocket.send_bytes(frame)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(battle_id, subscriber)
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.params import Depends, Path
+from fastapi import APIRouter, Request
+from fastapi.params import Depends, Path, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import UserDB
 from security import get_current_user, require_admin, require_moderator
+from services.catalog import character_catalog
+from services.invalidation import bus
+from services.principals import Principal
 
+import config
 import crud.characters
-from deps import get_db
-from schemas.characters import CreateCharacter,Character
+from deps import get_db, get_read_db
+from models import CharacterDB, user_characters
+from responses import FastJSONResponse
+from schemas.characters import CreateCharacter, Character, CharacterGrant
+from schemas.imports import ImportReport
+from services.bulk_import import import_rows, read_rows
 
 router = APIRouter(
     prefix="/characters",
@@ -20,11 +28,33 @@ security = HTTPBearer()
 @router.post("/create", response_model=Character)
 async def create_character(
     character: CreateCharacter,
-    current_user: UserDB = Depends(require_admin),
+    current_user: Principal = Depends(require_admin),
     db: AsyncSession = Depends(get_db)
 ):
     return await crud.characters.create_character(character, db)
 
+@router.post("/import", response_model=ImportReport)
+async def import_characters(
+    request: Request,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    report = await import_rows(read_rows(request), CreateCharacter, CharacterDB.__table__, db)
+    if report.inserted:
+        await character_catalog.load(db)
+        bus.publish("catalog", "characters", local=False)
+    return report
+
+
+@router.post("/grants/import", response_model=ImportReport)
+async def import_character_grants(
+    request: Request,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    return await import_rows(read_rows(request), CharacterGrant, user_characters, db)
+
+
 @router.post("/{character_id}/assign/{user_id}")
 async def assign_character_to_user(
     character_id: int = Path(..., gt=0),
@@ -35,20 +65,61 @@ async def assign_character_to_user(
 
 
 @router.get("/", response_model=list[Character])
-async def get_all_characters(db: AsyncSession = Depends(get_db)):
-    return await crud.characters.get_characters(db)
+async def get_all_characters(
+    request: Request,
+    after: int | None = Query(None, gt=0),
+    limit: int | None = Query(None, gt=0, le=config.PAGE_SIZE_MAX)
+):
+    if after is None and limit is None:
+        return await character_catalog.list_response(request.headers.get("if-none-match"))
+    return await character_catalog.page_response(after, limit or config.PAGE_SIZE_DEFAULT)
+
+
+@router.get("/export")
+async def export_characters():
+    return StreamingResponse(
+        crud.characters.stream_characters(),
+        media_type="application/x-ndjson"
+    )
 
 
 @router.get("/{character_id}", response_model=Character)
-async def get_character_by_id(character_id: int = Path(..., gt=0),db: AsyncSession = Depends(get_db)):
-    result = await crud.characters.get_character_by_id(character_id, db)
-    if result is None:
-        raise HTTPException(status_code=404, detail="Персонаж не найден")
-    return result
+async def get_character_by_id(request: Request, character_id: int = Path(..., gt=0)):
+    return await character_catalog.item_response(
+        character_id, request.headers.get("if-none-match")
+    )
 
 
 @router.get("/user/{user_id}", response_model=list[Character])
-async def get_characters_by_user(user_id: int = Path(..., gt=0),db: AsyncSession = Depends(get_db)):
-    return await crud.characters.get_user_characters(user_id, db)
+async def get_characters_by_user(
+    user_id: int = Path(..., gt=0),
+    after: int | None = Query(None, gt=0),
+    limit: int = Query(config.PAGE_SIZE_DEFAULT, gt=0, le=config.PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_read_db)
+):
+    characters = await crud.characters.get_user_characters(user_id, db, after, limit)
+    headers = {}
+    if len(characters) == limit:
+        headers["X-Next-Cursor"] = str(characters[-1].character_id)
+    return FastJSONResponse(
+        [
+            {
+                "name": row.name,
+                "base_health": row.base_health,
+                "base_damage": row.base_damage,
+                "base_speed": row.base_speed
+            }
+            for row in characters
+        ],
+        headers=headers
+    )
+
+
+@router.get("/user/{user_id}/export")
+async def export_characters_by_user(user_id: int = Path(..., gt=0)):
+    return StreamingResponse(
+        crud.characters.stream_characters(user_id),
+        media_type="application/x-ndjson"
+    )
 
 
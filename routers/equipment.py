@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Request
+from fastapi.params import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from deps import get_db
+from models import EquipmentDB, UserEquipmentDB
+from schemas.equipment import CreateEquipment, Equipment, EquipmentGrant
+from schemas.imports import ImportReport
+from security import require_admin
+from services.bulk_import import import_rows, read_rows
+from services.catalog import equipment_catalog
+from services.invalidation import bus
+from services.principals import Principal
+
+router = APIRouter(
+    prefix="/equipment",
+    tags=["Equipment"]
+)
+
+
+@router.get("/", response_model=list[Equipment])
+async def get_all_equipment(request: Request):
+    return equipment_catalog.list_response(request.headers.get("if-none-match"))
+
+
+@router.post("/import", response_model=ImportReport)
+async def import_equipment(
+    request: Request,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    report = await import_rows(read_rows(request), CreateEquipment, EquipmentDB.__table__, db)
+    if report.inserted:
+        await equipment_catalog.load(db)
+        bus.publish("catalog", "equipment", local=False)
+    return report
+
+
+@router.post("/grants/import", response_model=ImportReport)
+async def import_equipment_grants(
+    request: Request,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    return await import_rows(read_rows(request), EquipmentGrant, UserEquipmentDB.__table__, db)
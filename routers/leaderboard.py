@@ -0,0 +1,55 @@
+from fastapi import APIRouter
+from fastapi.params import Depends, Path, Query
+
+import config
+from responses import FastJSONResponse
+from schemas.leaderboard import LeaderboardPage, LeaderboardPosition
+from security import get_current_user
+from services.leaderboard import GLOBAL, leaderboard
+from services.principals import Principal
+
+router = APIRouter(
+    prefix="/leaderboard",
+    tags=["Leaderboard"]
+)
+
+
+def _position(user_id: int, arena_id: int, radius: int) -> LeaderboardPosition:
+    ranking = leaderboard.ranking(arena_id)
+    return LeaderboardPosition(
+        arena_id=arena_id,
+        user_id=user_id,
+        rank=ranking.rank(user_id),
+        kills=ranking.score(user_id) or 0,
+        total=len(ranking),
+        around=ranking.around(user_id, radius)
+    )
+
+
+@router.get("/", response_model=LeaderboardPage)
+async def get_leaderboard(
+    arena_id: int = Query(GLOBAL, ge=0),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, gt=0, le=config.LEADERBOARD_PAGE_MAX)
+):
+    # Записи — уже готовые словари, валидация response_model не нужна
+    ranking = leaderboard.ranking(arena_id)
+    return FastJSONResponse({"arena_id": arena_id, "total": len(ranking), "entries": ranking.top(limit, offset)})
+
+
+@router.get("/me", response_model=LeaderboardPosition)
+async def get_my_position(
+    arena_id: int = Query(GLOBAL, ge=0),
+    radius: int = Query(5, ge=0, le=config.LEADERBOARD_PAGE_MAX),
+    current_user: Principal = Depends(get_current_user)
+):
+    return _position(current_user.user_id, arena_id, radius)
+
+
+@router.get("/users/{user_id}", response_model=LeaderboardPosition)
+async def get_user_position(
+    user_id: int = Path(..., gt=0),
+    arena_id: int = Query(GLOBAL, ge=0),
+    radius: int = Query(5, ge=0, le=config.LEADERBOARD_PAGE_MAX)
+):
+    return _position(user_id, arena_id, radius)
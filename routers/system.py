@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from database import pool_status
+from services.metrics import registry
+from services.startup import startup_timer
+
+router = APIRouter(
+    prefix="/system",
+    tags=["System"]
+)
+
+# Prometheus ожидает метрики по корневому /metrics
+metrics_router = APIRouter(tags=["System"])
+
+
+@router.get("/db-pool")
+async def get_pool_status():
+    return pool_status()
+
+
+@router.get("/startup")
+async def get_startup_report():
+    return startup_timer.report()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,15 +1,19 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import crud.stats
 import crud.users
 import schemas.users
-from deps import get_db
+from deps import get_db, get_read_db
 from schemas import users
-from schemas.users import UserCreateRequest
-from security import create_access_token
+from schemas.users import UserCreateRequest, UserRoleUpdateRequest, EffectiveStatsBatchRequest, CurrencyGrantRequest
+from security import create_access_token, require_admin, require_moderator, require_super_admin
+from services.ledger import ledger
+from services.principals import Principal
 
 router = APIRouter(
     prefix="/users",
@@ -53,4 +57,71 @@ async def get_me(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return user
\ No newline at end of file
+    return user
+
+
+@router.patch("/{user_id}/role")
+async def change_user_role(
+        data: UserRoleUpdateRequest,
+        user_id: int = Path(..., gt=0),
+        current_user: Principal = Depends(require_super_admin),
+        db: AsyncSession = Depends(get_db)
+):
+    await crud.users.change_role(user_id, data.role, db)
+    return {"message": f"Роль пользователя изменена на {data.role.value}"}
+
+
+@router.post("/{user_id}/ban")
+async def ban_user(
+        user_id: int = Path(..., gt=0),
+        current_user: Principal = Depends(require_moderator),
+        db: AsyncSession = Depends(get_db)
+):
+    await crud.users.set_active(user_id, False, current_user, db)
+    return {"message": "Пользователь заблокирован"}
+
+
+@router.post("/{user_id}/unban")
+async def unban_user(
+        user_id: int = Path(..., gt=0),
+        current_user: Principal = Depends(require_moderator),
+        db: AsyncSession = Depends(get_db)
+):
+    await crud.users.set_active(user_id, True, current_user, db)
+    return {"message": "Пользователь разблокирован"}
+
+
+@router.post("/{user_id}/currency", response_model=users.CurrencyGrantResponse)
+async def grant_currency(
+        data: CurrencyGrantRequest,
+        user_id: int = Path(..., gt=0),
+        idempotency_key: str | None = Header(None, max_length=100),
+        current_user: Principal = Depends(require_admin)
+):
+    try:
+        applied = await ledger.credit(user_id, data.reason, data.coins, data.crystals, idempotency_key)
+    except IntegrityError:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return users.CurrencyGrantResponse(applied=applied)
+
+
+@router.post("/stats/batch", response_model=list[users.EffectiveStats])
+async def get_effective_stats_batch(
+        data: EffectiveStatsBatchRequest,
+        db: AsyncSession = Depends(get_read_db)
+):
+    stats = await crud.stats.get_effective_stats(data.user_ids, db)
+    return list(stats.values())
+
+
+@router.get("/{user_id}/stats", response_model=users.EffectiveStats)
+async def get_effective_stats(
+        user_id: int = Path(..., gt=0),
+        db: AsyncSession = Depends(get_read_db)
+):
+    stats = await crud.stats.get_user_effective_stats(user_id, db)
+
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+    return stats
\ No newline at end of file
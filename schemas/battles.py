@@ -0,0 +1,13 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class BattleJoinResponse(BaseModel):
+    battle_id: int
+    arena_id: int
+
+
+class Arena(BaseModel):
+    arena_id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
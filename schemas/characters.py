@@ -13,4 +13,11 @@ class Character(BaseModel):
     base_damage: int = Field(ge=10, le=500)
     base_speed: float = Field(ge=10.0, le=500.0)
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CharacterGrant(BaseModel):
+    user_id: int = Field(gt=0)
+    character_id: int = Field(gt=0)
+    level: int = Field(1, ge=1)
+    is_active: bool = False
\ No newline at end of file
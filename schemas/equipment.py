@@ -0,0 +1,32 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+from enums import EquipmentCategory
+
+
+class CreateEquipment(BaseModel):
+    name: str = Field(min_length=2, max_length=50)
+    description: str | None = Field(None, max_length=255)
+    equipment_category: EquipmentCategory
+    health_bonus: int = Field(0, ge=0, le=500)
+    damage_bonus: int = Field(0, ge=0, le=500)
+    speed_bonus: float = Field(0, ge=0, le=500)
+
+
+class EquipmentGrant(BaseModel):
+    user_id: int = Field(gt=0)
+    equipment_id: int = Field(gt=0)
+    level: int = Field(1, ge=1)
+    durability: int = Field(100, ge=0, le=100)
+    is_equipped: bool = False
+
+
+class Equipment(BaseModel):
+    equipment_id: int
+    name: str
+    description: str | None = None
+    equipment_category: EquipmentCategory
+    health_bonus: int
+    damage_bonus: int
+    speed_bonus: float
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: list[ImportRowError]
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    kills: int
+
+
+class LeaderboardPage(BaseModel):
+    arena_id: int
+    total: int
+    entries: list[LeaderboardEntry]
+
+
+class LeaderboardPosition(BaseModel):
+    arena_id: int
+    user_id: int
+    rank: int | None
+    kills: int
+    total: int
+    around: list[LeaderboardEntry]
@@ -2,6 +2,8 @@ import re
 
 from pydantic import BaseModel, Field, EmailStr, ConfigDict, validator
 
+from enums import UserRole
+
 
 class UserCreateRequest(BaseModel):
     username: str = Field(min_length=8, max_length=20, example="NewUser123")
@@ -40,4 +42,29 @@ class TokenResponse(BaseModel):
 class UserResponse(BaseModel):
     user_id: int
     username: str
-    email: str
\ No newline at end of file
+    email: str
+
+class UserRoleUpdateRequest(BaseModel):
+    role: UserRole
+
+
+class EffectiveStats(BaseModel):
+    user_id: int
+    character_id: int | None
+    health: int
+    damage: int
+    speed: float
+
+
+class EffectiveStatsBatchRequest(BaseModel):
+    user_ids: list[int] = Field(min_length=1, max_length=1000)
+
+class CurrencyGrantRequest(BaseModel):
+    coins: int = 0
+    crystals: int = 0
+    reason: str = Field(min_length=1, max_length=50)
+
+
+class CurrencyGrantResponse(BaseModel):
+    # False — награда с этим Idempotency-Key уже была проведена
+    applied: bool
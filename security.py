@@ -8,9 +8,11 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+import config
 from deps import get_db
 from enums import UserRole
 from models import UserDB
+from services.principals import Principal, principal_cache
 
 # Конфигурация
 SECRET_KEY = "здесь_мой_ключ_абракадабра"
@@ -20,7 +22,14 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 security = HTTPBearer()
 
 # Хеширование паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Синхронные функции ниже блокируют event loop — в обработчиках запросов
+# используйте services.hashing.hasher
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=config.BCRYPT_ROUNDS
+)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -45,23 +54,35 @@ def verify_token(token: str) -> dict:
 async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         db: AsyncSession = Depends(get_db)
-) -> UserDB:
-    token = credentials.credentials
+) -> Principal:
+    return await authenticate(credentials.credentials, db)
+
+async def authenticate(token: str, db: AsyncSession) -> Principal:
+    # Токен без заголовка Authorization — например, из query WebSocket
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     payload = verify_token(token)
+    generation = principal_cache.generation(payload["user_id"])
 
+    # Только поля для авторизации, без selectin-загрузки персонажей
     result = await db.execute(
-        select(UserDB).where(UserDB.id == payload["user_id"])
+        select(UserDB.user_id, UserDB.role, UserDB.is_active)
+        .where(UserDB.user_id == payload["user_id"])
     )
-    user = result.scalar_one_or_none()
+    row = result.one_or_none()
 
-    if not user:
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return user
+    principal = Principal(user_id=row.user_id, role=row.role, is_active=row.is_active)
+    principal_cache.put(token, principal, payload["exp"], generation)
+    return principal
 
 async def get_current_active_user(
-    current_user: UserDB = Depends(get_current_user)
-) -> UserDB:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -70,8 +91,8 @@ async def get_current_active_user(
     return current_user
 
 async def require_admin(
-    current_user: UserDB = Depends(get_current_active_user)
-) -> UserDB:
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     if current_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -80,8 +101,8 @@ async def require_admin(
     return current_user
 
 async def require_moderator(
-    current_user: UserDB = Depends(get_current_active_user)
-) -> UserDB:
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     if current_user.role not in [UserRole.MODERATOR, UserRole.ADMIN, UserRole.SUPER_ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -90,8 +111,8 @@ async def require_moderator(
     return current_user
 
 async def require_super_admin(
-    current_user: UserDB = Depends(get_current_active_user)
-) -> UserDB:
+    current_user: Principal = Depends(get_current_active_user)
+) -> Principal:
     if current_user.role != UserRole.SUPER_ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,156 @@
+"""Запуск API в несколько процессов.
+
+Мастер один раз импортирует приложение и синхронизирует схему, открывает
+слушающий сокет и делает fork воркеров: код и справочные данные модулей
+у них общие (copy-on-write), сокет тоже — соединения распределяет ядро.
+Упавший воркер перезапускается, SIGTERM/SIGINT останавливают всех
+с корректным завершением lifespan.
+
+Кэши воркеров (принципалы, справочники, рейтинг) согласуются через шину
+services.invalidation на Unix-сокетах в INVALIDATION_SOCKET_DIR.
+
+Матчмейкер и движок боя живут в памяти процесса, а к какому воркеру
+попадёт соединение, решает ядро — привязать клиента к воркеру нельзя.
+Поэтому несколько воркеров запускаются только с BATTLES_ENABLED=0; бои
+обслуживает отдельный экземпляр с одним воркером, к нему балансировщик
+направляет /battles. Общий INVALIDATION_SOCKET_DIR на одной машине
+доставляет пулу убийства из боёв для рейтинга.
+
+Запуск: python serve.py [--workers N] [--host 0.0.0.0] [--port 8080]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("serve")
+
+# Воркер, упавший быстрее, перезапускается с паузой — без горячего цикла
+_MIN_UPTIME = 5.0
+_RESTART_DELAY = 1.0
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def _prepare():
+    # Схема синхронизируется здесь один раз, а не наперегонки в каждом
+    # воркере; соединения мастера закрываются до fork
+    from database import Base, engine, read_engine
+    from services.startup import ensure_schema
+
+    await ensure_schema(engine, Base.metadata)
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
+def _run_worker(index: int, sock: socket.socket):
+    import uvicorn
+
+    import config
+    from main import app
+
+    # config уже импортирован в мастере, переменная окружения не перечитается
+    config.WORKER_INDEX = index
+    server = uvicorn.Server(uvicorn.Config(app, lifespan="on", log_level="info"))
+    server.run(sockets=[sock])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args()
+
+    # До импорта config: он читает окружение один раз
+    os.environ.setdefault("INVALIDATION_BUS", "unix")
+    socket_dir = None
+    if "INVALIDATION_SOCKET_DIR" not in os.environ:
+        socket_dir = tempfile.mkdtemp(prefix="magico-invalidation-")
+        os.environ["INVALIDATION_SOCKET_DIR"] = socket_dir
+
+    import config
+    # Предзагрузка приложения до fork
+    import main as application
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    workers = args.workers or config.WORKERS
+    if workers > 1 and config.BATTLES_ENABLED:
+        parser.error(
+            "бои живут в памяти одного процесса: несколько воркеров только с BATTLES_ENABLED=0, "
+            "бои — отдельным экземпляром с WORKERS=1"
+        )
+    sock = _bind(args.host or config.SERVER_HOST, args.port or config.SERVER_PORT)
+    asyncio.run(_prepare())
+
+    children: dict[int, tuple[int, float]] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                _run_worker(index, sock)
+            except BaseException:
+                logger.exception("Worker %d crashed", index)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (index, time.monotonic())
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(workers):
+        spawn(index)
+    logger.info("Started %d workers on %s", workers, sock.getsockname())
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index, started = children.pop(pid)
+            if stopping:
+                continue
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, status)
+            if time.monotonic() - started < _MIN_UPTIME:
+                time.sleep(_RESTART_DELAY)
+            if not stopping:
+                spawn(index)
+    finally:
+        sock.close()
+        if socket_dir is not None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import numpy as np
+
+import config
+from services.spatial import SpatialGrid
+
+logger = logging.getLogger(__name__)
+
+# Состояние всех участников всех боёв хранится столбцами (structure of arrays):
+# один тик — несколько векторных операций NumPy вместо цикла по объектам
+_COLUMNS = {
+    "participant_id": np.int64,
+    "user_id": np.int64,
+    "battle_id": np.int64,
+    "slot": np.int32,
+    "health": np.float32,
+    "mana": np.float32,
+    "x": np.float32,
+    "y": np.float32,
+    "dir_x": np.float32,
+    "dir_y": np.float32,
+    "speed": np.float32,
+    "damage": np.float32,
+    "cooldown": np.float32,
+    "target": np.int64,
+    "kills": np.int32,
+    "alive": np.bool_,
+    # Изменён с последней выгрузки в БД (services.battle_state)
+    "dirty": np.bool_,
+}
+
+
+def _no_rows() -> np.ndarray:
+    return np.zeros(0, dtype=np.int64)
+
+
+@dataclass
+class TickResult:
+    tick: int
+    duration: float
+    finished: list[int] = field(default_factory=list)
+    # События тика — индексы строк движка. Валидны до следующего изменения
+    # массивов: слушатели вызываются сразу после тика
+    moved: np.ndarray = field(default_factory=_no_rows)
+    hit_attackers: np.ndarray = field(default_factory=_no_rows)
+    hit_targets: np.ndarray = field(default_factory=_no_rows)
+    deaths: np.ndarray = field(default_factory=_no_rows)
+    killers: np.ndarray = field(default_factory=_no_rows)
+
+
+class BattleEngine:
+    def __init__(self, tick_rate: int, capacity: int = 1024):
+        self.tick_rate = tick_rate
+        self.tick_count = 0
+        self.size = 0
+        self.overruns = 0
+        self.last_tick_duration = 0.0
+        self._capacity = capacity
+        self._arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._arrays["target"].fill(-1)
+        self._index: dict[int, int] = {}
+        self._slots: dict[int, int] = {}
+        self._arenas: dict[int, int | None] = {}
+        self._free_slots: list[int] = []
+        # Слот боя -> battle_id и признак идущего боя
+        self._slot_battle = np.zeros(64, dtype=np.int64)
+        self._slot_running = np.zeros(64, dtype=np.bool_)
+        self._grid = SpatialGrid(config.SPATIAL_CELL_SIZE, config.ARENA_SIZE)
+        self._listeners: list[Callable[[TickResult], Awaitable[None]]] = []
+        self._task: asyncio.Task | None = None
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # engine.health, engine.x ... — срезы по занятой части массивов
+        arrays = self.__dict__.get("_arrays")
+        if arrays is not None and name in arrays:
+            return arrays[name][:self.size]
+        raise AttributeError(name)
+
+    def _grow(self, required: int):
+        if required <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < required:
+            capacity *= 2
+        for name, array in self._arrays.items():
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._arrays[name] = grown
+        self._arrays["target"][self.size:] = -1
+        self._capacity = capacity
+
+    def add_battle(self, battle_id: int, participants: list[dict], arena_id: int | None = None):
+        if battle_id in self._slots:
+            raise ValueError(f"Battle {battle_id} already loaded")
+
+        slot = self._free_slots.pop() if self._free_slots else len(self._slots)
+        self._slots[battle_id] = slot
+        self._arenas[battle_id] = arena_id
+        if slot >= len(self._slot_battle):
+            self._slot_battle = np.concatenate([self._slot_battle, np.zeros_like(self._slot_battle)])
+            self._slot_running = np.concatenate([self._slot_running, np.zeros_like(self._slot_running)])
+        self._slot_battle[slot] = battle_id
+        self._slot_running[slot] = False
+
+        count = len(participants)
+        start, end = self.size, self.size + count
+        self._grow(end)
+        a = self._arrays
+        a["battle_id"][start:end] = battle_id
+        a["slot"][start:end] = slot
+        for name in ("participant_id", "user_id", "health", "damage", "speed"):
+            a[name][start:end] = [p[name] for p in participants]
+        for name, default in (("mana", 0), ("x", 0.0), ("y", 0.0), ("kills", 0)):
+            a[name][start:end] = [p.get(name, default) for p in participants]
+        for name in ("dir_x", "dir_y", "cooldown"):
+            a[name][start:end] = 0
+        a["target"][start:end] = -1
+        a["alive"][start:end] = a["health"][start:end] > 0
+        a["dirty"][start:end] = False
+        self.size = end
+
+        for offset, participant in enumerate(participants):
+            self._index[participant["participant_id"]] = start + offset
+
+    def start_battle(self, battle_id: int):
+        self._slot_running[self._slots[battle_id]] = True
+
+    def has_battle(self, battle_id: int) -> bool:
+        return battle_id in self._slots
+
+    def is_running(self, battle_id: int) -> bool:
+        slot = self._slots.get(battle_id)
+        return slot is not None and bool(self._slot_running[slot])
+
+    def remove_battle(self, battle_id: int):
+        self.remove_battles([battle_id])
+
+    def remove_battles(self, battle_ids: list[int]):
+        # Массивы сжимаются один раз на все бои, а не на каждый
+        slots = []
+        for battle_id in battle_ids:
+            slot = self._slots.pop(battle_id)
+            self._arenas.pop(battle_id, None)
+            self._slot_running[slot] = False
+            self._free_slots.append(slot)
+            slots.append(slot)
+        if not slots:
+            return
+
+        keep = ~np.isin(self.slot, slots)
+        # Старый индекс -> новый, чтобы цели атак пережили сжатие массивов
+        new_index = np.cumsum(keep) - 1
+        target = self.target
+        valid = target >= 0
+        valid[valid] = keep[target[valid]]
+        remapped = np.where(valid, new_index[np.where(valid, target, 0)], -1)
+
+        size = int(keep.sum())
+        for name, array in self._arrays.items():
+            array[:size] = (remapped if name == "target" else array[:self.size])[keep]
+        self._arrays["target"][size:self.size] = -1
+        self.size = size
+        self._index = {int(pid): i for i, pid in enumerate(self.participant_id)}
+
+    def arena_of(self, battle_id: int) -> int | None:
+        return self._arenas.get(battle_id)
+
+    def index_of(self, participant_id: int) -> int:
+        return self._index[participant_id]
+
+    def set_direction(self, participant_id: int, dir_x: float, dir_y: float):
+        i = self._index[participant_id]
+        norm = max((dir_x * dir_x + dir_y * dir_y) ** 0.5, 1.0)
+        self._arrays["dir_x"][i] = dir_x / norm
+        self._arrays["dir_y"][i] = dir_y / norm
+
+    def set_target(self, participant_id: int, target_participant_id: int | None):
+        i = self._index[participant_id]
+        self._arrays["target"][i] = (
+            -1 if target_participant_id is None else self._index[target_participant_id]
+        )
+
+    def running_battles(self) -> list[int]:
+        return self._slot_battle[np.nonzero(self._slot_running)[0]].tolist()
+
+    def battle_rows(self, battle_id: int) -> np.ndarray:
+        return np.nonzero(self.slot == self._slots[battle_id])[0]
+
+    def take_dirty(self) -> list[dict]:
+        # Последнее состояние изменённых участников; повторные изменения
+        # между выгрузками уже слиты в массивах
+        rows = np.nonzero(self.dirty)[0]
+        self.dirty[rows] = False
+        return [
+            {
+                "battle_participant_id": participant_id,
+                "current_health": health,
+                "current_mana": mana,
+                "position_x": x,
+                "position_y": y,
+                "kills": kills,
+                "is_alive": alive
+            }
+            for participant_id, health, mana, x, y, kills, alive in zip(
+                self.participant_id[rows].tolist(),
+                np.ceil(self.health[rows]).astype(np.int64).tolist(),
+                self.mana[rows].astype(np.int64).tolist(),
+                self.x[rows].tolist(),
+                self.y[rows].tolist(),
+                self.kills[rows].tolist(),
+                self.alive[rows].tolist()
+            )
+        ]
+
+    def tick(self, dt: float) -> TickResult:
+        started = time.perf_counter()
+        self.tick_count += 1
+        result = TickResult(tick=self.tick_count, duration=0.0)
+        try:
+            n = self.size
+            a = {name: array[:n] for name, array in self._arrays.items()}
+            running = self._slot_running[a["slot"]]
+            live = a["alive"] & running
+            if live.any():
+                self._simulate(a, live, dt, result)
+
+            # Бой окончен, когда в нём меньше двух живых участников (каждый
+            # сам за себя). Проверяется и в тике без живых: иначе бой, где все
+            # погибли или участников не осталось, не завершился бы никогда
+            alive_count = np.bincount(
+                a["slot"][running & a["alive"]], minlength=len(self._slot_running)
+            )
+            finished = np.nonzero(self._slot_running & (alive_count <= 1))[0]
+            if len(finished):
+                self._slot_running[finished] = False
+                result.finished = self._slot_battle[finished].tolist()
+        finally:
+            result.duration = time.perf_counter() - started
+        return result
+
+    def _simulate(self, a: dict[str, np.ndarray], live: np.ndarray, dt: float, result: TickResult):
+        # Движение и ограничение ареной
+        step = np.where(live, a["speed"] * dt, 0).astype(np.float32)
+        a["x"] += a["dir_x"] * step
+        a["y"] += a["dir_y"] * step
+        np.clip(a["x"], 0, config.ARENA_SIZE, out=a["x"])
+        np.clip(a["y"], 0, config.ARENA_SIZE, out=a["y"])
+        result.moved = np.nonzero(step * (np.abs(a["dir_x"]) + np.abs(a["dir_y"])) > 0)[0]
+
+        # Мана
+        a["mana"][live] = np.minimum(a["mana"][live] + config.MANA_REGEN * dt, config.MAX_MANA)
+
+        # Участник без цели выбирает ближайшего живого противника в радиусе удара
+        idle = live & (a["target"] < 0)
+        if idle.any():
+            self._acquire_targets(a, live, idle)
+
+        # Атаки: цель жива, в том же бою и в радиусе удара
+        a["cooldown"][live] -= dt
+        attackers = np.nonzero(live & (a["target"] >= 0) & (a["cooldown"] <= 0))[0]
+        targets = a["target"][attackers]
+        dx = a["x"][targets] - a["x"][attackers]
+        dy = a["y"][targets] - a["y"][attackers]
+        hit = (
+            a["alive"][targets]
+            & (a["slot"][targets] == a["slot"][attackers])
+            & (dx * dx + dy * dy <= config.ATTACK_RANGE ** 2)
+        )
+        attackers, targets = attackers[hit], targets[hit]
+        np.subtract.at(a["health"], targets, a["damage"][attackers])
+        a["cooldown"][attackers] = config.ATTACK_COOLDOWN
+        result.hit_attackers, result.hit_targets = attackers, targets
+
+        # Смерти; убийство засчитывается первому ударившему в этом тике
+        died = live & (a["health"] <= 0)
+        if died.any():
+            a["alive"][died] = False
+            a["health"][died] = 0
+            fatal = died[targets]
+            _, first = np.unique(targets[fatal], return_index=True)
+            np.add.at(a["kills"], attackers[fatal][first], 1)
+            result.deaths, result.killers = targets[fatal][first], attackers[fatal][first]
+            lost_target = a["target"] >= 0
+            lost_target[lost_target] = died[a["target"][lost_target]]
+            a["target"][lost_target] = -1
+        a["dirty"] |= live
+
+    def _acquire_targets(self, a: dict[str, np.ndarray], live: np.ndarray, idle: np.ndarray):
+        # Кандидаты — из сетки по ячейкам вокруг свободных участников,
+        # без перебора всех пар боя
+        self._grid.rebuild(a["slot"], a["x"], a["y"], live)
+        i, j = self._grid.pairs_within(config.ATTACK_RANGE, sources=np.nonzero(idle)[0])
+        if not len(i):
+            return
+        distance = (a["x"][j] - a["x"][i]) ** 2 + (a["y"][j] - a["y"][i]) ** 2
+        order = np.lexsort((distance, i))
+        i, j = i[order], j[order]
+        _, first = np.unique(i, return_index=True)
+        a["target"][i[first]] = j[first]
+
+    def add_listener(self, listener: Callable[[TickResult], Awaitable[None]]):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    async def run(self):
+        interval = 1 / self.tick_rate
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            # Ошибка тика или слушателя теряет только свою работу за этот тик:
+            # остановка цикла заморозила бы все идущие бои
+            try:
+                result = self.tick(interval)
+            except Exception:
+                logger.exception("Battle tick failed")
+                result = None
+            if result is not None:
+                self.last_tick_duration = result.duration
+                for listener in self._listeners:
+                    try:
+                        await listener(result)
+                    except Exception:
+                        logger.exception("Battle tick listener %r failed", listener)
+
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Не успеваем — не копим долг, начинаем отсчёт заново
+                self.overruns += 1
+                next_tick = loop.time()
+                await asyncio.sleep(0)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+battle_engine = BattleEngine(tick_rate=config.BATTLE_TICK_RATE)
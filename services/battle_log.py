@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+from typing import BinaryIO, Callable
+
+import numpy as np
+
+import config
+from services.battle_engine import BattleEngine, TickResult, battle_engine
+
+# Журнал боя — два файла, только дописываются:
+#   {battle_id}.log — записи по 24 байта в порядке тиков;
+#   {battle_id}.idx — заголовок (_HEADER_TICK, период ключевых кадров), затем
+#   на каждый тик боя (tick, номер первой записи тика).
+# Тики боя идут подряд, поэтому запись тика T — index[T - first_tick], O(1).
+# Мана меняется каждый тик у всех живых и пишется только в ключевых кадрах:
+# между ними реплей показывает ману последнего кадра
+EVENT_MOVE = 1   # actor; a, b — координаты после тика
+EVENT_HIT = 2    # actor бьёт target; a — урон, b — здоровье target после тика
+EVENT_DEATH = 3  # actor погиб, target — добивший
+EVENT_STATE = 5  # ключевой кадр: a — здоровье, b — мана, target — жив ли
+
+EVENT_NAMES = {
+    EVENT_MOVE: "move",
+    EVENT_HIT: "hit",
+    EVENT_DEATH: "death",
+    EVENT_STATE: "state",
+}
+
+RECORD = np.dtype([
+    ("tick", "<u4"),
+    ("kind", "u1"),
+    ("pad", "V3"),
+    ("actor", "<u4"),
+    ("target", "<u4"),
+    ("a", "<f4"),
+    ("b", "<f4"),
+])
+INDEX = np.dtype([("tick", "<u4"), ("record", "<u4")])
+_INDEX_ENTRY = struct.Struct("<II")
+# Тик заголовка индекса; журналы без заголовка писались с BATTLE_LOG_KEYFRAME
+_HEADER_TICK = 0xFFFFFFFF
+
+logger = logging.getLogger(__name__)
+
+
+def _records(tick: int, kind: int, actor, target, a, b) -> np.ndarray:
+    records = np.zeros(len(actor), dtype=RECORD)
+    records["tick"] = tick
+    records["kind"] = kind
+    records["actor"] = actor
+    records["target"] = target
+    records["a"] = a
+    records["b"] = b
+    return records
+
+
+class _BattleFile:
+    # Буфер боя в event loop; в файлы его пишет поток журнала
+    def __init__(self, battle_id: int, first_tick: int, keyframe: int):
+        self.battle_id = battle_id
+        self.first_tick = first_tick
+        self.records = 0
+        self._log_buffer: list[bytes] = []
+        self._index_buffer: list[bytes] = [_INDEX_ENTRY.pack(_HEADER_TICK, keyframe)]
+        self.buffered = 0
+
+    def append(self, tick: int, records: np.ndarray):
+        self._index_buffer.append(_INDEX_ENTRY.pack(tick, self.records))
+        if len(records):
+            data = records.tobytes()
+            self._log_buffer.append(data)
+            self.buffered += len(data)
+            self.records += len(records)
+
+    def take(self, close: bool = False) -> tuple[int, bytes, bytes, bool]:
+        chunk = (self.battle_id, b"".join(self._log_buffer), b"".join(self._index_buffer), close)
+        self._log_buffer.clear()
+        self._index_buffer.clear()
+        self.buffered = 0
+        return chunk
+
+
+class _LogWriter(threading.Thread):
+    # Единственный владелец файлов журнала: write и flush не блокируют
+    # event loop. Очередь ограничена — при отставании диска тик ждёт места
+    # в ней, а не копит память
+    def __init__(self, directory: str, queue_size: int):
+        super().__init__(name="battle-log", daemon=True)
+        self.directory = directory
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._files: dict[int, tuple[BinaryIO, BinaryIO]] = {}
+
+    def run(self):
+        while (item := self.queue.get()) is not None:
+            chunks, done = item
+            try:
+                for chunk in chunks:
+                    self._write(*chunk)
+            except Exception:
+                logger.exception("Battle log write failed")
+            finally:
+                if done is not None:
+                    done()
+        for log, index in self._files.values():
+            log.close()
+            index.close()
+        self._files.clear()
+
+    def _write(self, battle_id: int, log_data: bytes, index_data: bytes, close: bool):
+        files = self._files.get(battle_id)
+        if files is None:
+            files = self._files[battle_id] = (
+                open(os.path.join(self.directory, f"{battle_id}.log"), "ab"),
+                open(os.path.join(self.directory, f"{battle_id}.idx"), "ab"),
+            )
+        log, index = files
+        # Сначала записи, потом индекс: индекс не ссылается на то, чего нет в файле
+        if log_data:
+            log.write(log_data)
+            log.flush()
+        if index_data:
+            index.write(index_data)
+            index.flush()
+        if close:
+            del self._files[battle_id]
+            log.close()
+            index.close()
+
+
+class BattleEventLog:
+    # Пишет события всех идущих боёв из результата тика: записи строятся
+    # векторно, копятся в буфере боя и пачкой за тик уходят потоку журнала
+    def __init__(
+        self, engine: BattleEngine, directory: str, keyframe: int, buffer_size: int, flush_ticks: int,
+        queue_size: int
+    ):
+        self.engine = engine
+        self.directory = directory
+        self.keyframe = keyframe
+        self.buffer_size = buffer_size
+        self.flush_ticks = flush_ticks
+        self.queue_size = queue_size
+        self.records_written = 0
+        # Сколько раз тик ждал места в очереди потока журнала
+        self.queue_waits = 0
+        self._files: dict[int, _BattleFile] = {}
+        self._writer: _LogWriter | None = None
+
+    def _keyframe(self, tick: int, rows: np.ndarray) -> list[np.ndarray]:
+        e = self.engine
+        ids = e.participant_id[rows]
+        return [
+            _records(tick, EVENT_STATE, ids, e.alive[rows], e.health[rows], e.mana[rows]),
+            _records(tick, EVENT_MOVE, ids, 0, e.x[rows], e.y[rows]),
+        ]
+
+    async def on_tick(self, result: TickResult):
+        battle_ids = self.engine.running_battles() + result.finished
+        if not battle_ids:
+            return
+        e = self.engine
+        tick = result.tick
+
+        # Все события тика одним массивом, затем разбор по боям
+        events = [
+            (result.moved, _records(
+                tick, EVENT_MOVE, e.participant_id[result.moved], 0, e.x[result.moved], e.y[result.moved]
+            )),
+            (result.hit_targets, _records(
+                tick, EVENT_HIT, e.participant_id[result.hit_attackers], e.participant_id[result.hit_targets],
+                e.damage[result.hit_attackers], e.health[result.hit_targets]
+            )),
+            (result.deaths, _records(
+                tick, EVENT_DEATH, e.participant_id[result.deaths], e.participant_id[result.killers], 0, 0
+            )),
+        ]
+        rows = np.concatenate([rows for rows, _ in events])
+        records = np.concatenate([records for _, records in events])
+        owners = e.battle_id[rows]
+        order = np.argsort(owners, kind="stable")
+        owners, records = owners[order], records[order]
+        starts = np.searchsorted(owners, battle_ids, "left")
+        ends = np.searchsorted(owners, battle_ids, "right")
+
+        finished = set(result.finished)
+        flush_all = tick % self.flush_ticks == 0
+        chunks = []
+        for battle_id, start, end in zip(battle_ids, starts.tolist(), ends.tolist()):
+            battle_file = self._files.get(battle_id)
+            if battle_file is None:
+                battle_file = self._files[battle_id] = _BattleFile(battle_id, tick, self.keyframe)
+            battle_records = records[start:end]
+            if (tick - battle_file.first_tick) % self.keyframe == 0 or battle_id in finished:
+                battle_records = np.concatenate([battle_records, *self._keyframe(tick, e.battle_rows(battle_id))])
+            battle_file.append(tick, battle_records)
+            self.records_written += len(battle_records)
+            if battle_id in finished:
+                chunks.append(self._files.pop(battle_id).take(close=True))
+            elif flush_all or battle_file.buffered >= self.buffer_size:
+                chunks.append(battle_file.take())
+        if chunks:
+            await self._submit(chunks)
+
+    async def _submit(self, chunks: list[tuple], done: Callable[[], None] | None = None):
+        try:
+            self._writer.queue.put_nowait((chunks, done))
+        except queue.Full:
+            self.queue_waits += 1
+            await asyncio.to_thread(self._writer.queue.put, (chunks, done))
+
+    async def flush(self, battle_id: int | None = None):
+        # Дожидается, пока буферы (одного боя или всех) окажутся в файлах
+        if self._writer is None:
+            return
+        if battle_id is None:
+            chunks = [battle_file.take() for battle_file in self._files.values()]
+        else:
+            battle_file = self._files.get(battle_id)
+            chunks = [] if battle_file is None else [battle_file.take()]
+        loop = asyncio.get_running_loop()
+        written = loop.create_future()
+        # Очередь FIFO: к вызову done записано и всё, что стояло перед пачкой
+        await self._submit(chunks, lambda: loop.call_soon_threadsafe(written.set_result, None))
+        await written
+
+    def start(self):
+        if self._writer is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._writer = _LogWriter(self.directory, self.queue_size)
+            self._writer.start()
+            self.engine.add_listener(self.on_tick)
+
+    async def stop(self):
+        if self._writer is None:
+            return
+        await self._submit([battle_file.take(close=True) for battle_file in self._files.values()])
+        self._files.clear()
+        await asyncio.to_thread(self._writer.queue.put, None)
+        await asyncio.to_thread(self._writer.join)
+        self._writer = None
+
+
+class BattleReplay:
+    # Чтение через mmap: записи — массив NumPy поверх отображённого файла,
+    # без чтения и разбора журнала целиком
+    def __init__(self, directory: str, battle_id: int):
+        self.battle_id = battle_id
+        self._maps: list[mmap.mmap] = []
+        self.records = self._map(os.path.join(directory, f"{battle_id}.log"), RECORD)
+        index = self._map(os.path.join(directory, f"{battle_id}.idx"), INDEX)
+        # Период ключевых кадров — тот, с которым журнал писался
+        self.keyframe = config.BATTLE_LOG_KEYFRAME
+        if len(index) and index["tick"][0] == _HEADER_TICK:
+            self.keyframe = int(index["record"][0])
+            index = index[1:]
+        # Индекс мог опередить записи только при обрыве записи — отрезаем хвост
+        self.index = index[index["record"] <= len(self.records)]
+        if not len(self.index):
+            raise FileNotFoundError(battle_id)
+        self.first_tick = int(self.index["tick"][0])
+        self.last_tick = int(self.index["tick"][-1])
+
+    def _map(self, path: str, dtype: np.dtype) -> np.ndarray:
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size // dtype.itemsize * dtype.itemsize
+            if not size:
+                return np.zeros(0, dtype=dtype)
+            mapped = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        return np.frombuffer(mapped, dtype=dtype)
+
+    def close(self):
+        self.records = self.index = None
+        for mapped in self._maps:
+            mapped.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def position(self, tick: int) -> int:
+        # Номер первой записи тика; за последним тиком — конец журнала
+        if tick > self.last_tick:
+            return len(self.records)
+        return int(self.index["record"][max(tick, self.first_tick) - self.first_tick])
+
+    def events(self, from_tick: int, to_tick: int) -> np.ndarray:
+        return self.records[self.position(from_tick):self.position(to_tick + 1)]
+
+    def state_at(self, tick: int) -> dict[int, dict]:
+        # Ближайший ключевой кадр не раньше чем за keyframe тиков до tick
+        # плюс события после него
+        tick = min(max(tick, self.first_tick), self.last_tick)
+        keyframe = self.first_tick + (tick - self.first_tick) // self.keyframe * self.keyframe
+        state: dict[int, dict] = {}
+        for record in self.records[self.position(keyframe):self.position(tick + 1)].tolist():
+            _, kind, _, actor, target, a, b = record
+            participant = state.setdefault(actor, {"participant_id": actor})
+            if kind == EVENT_MOVE:
+                participant["x"], participant["y"] = a, b
+            elif kind == EVENT_STATE:
+                participant["health"], participant["mana"], participant["alive"] = a, b, bool(target)
+            elif kind == EVENT_HIT:
+                state.setdefault(target, {"participant_id": target})["health"] = b
+            elif kind == EVENT_DEATH:
+                participant["health"], participant["alive"] = 0.0, False
+        return state
+
+
+def to_dicts(records: np.ndarray) -> list[dict]:
+    return [
+        {"tick": tick, "kind": EVENT_NAMES[kind], "actor": actor, "target": target, "a": a, "b": b}
+        for tick, kind, _, actor, target, a, b in records.tolist()
+    ]
+
+
+event_log = BattleEventLog(
+    battle_engine,
+    config.BATTLE_LOG_DIR,
+    config.BATTLE_LOG_KEYFRAME,
+    config.BATTLE_LOG_BUFFER,
+    config.BATTLE_LOG_FLUSH_TICKS,
+    config.BATTLE_LOG_QUEUE
+)
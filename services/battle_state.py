@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, exists, update
+
+import config
+from database import SessionLocal
+from enums import BattleStatus
+from models import BattleDB, BattleParticipantDB
+from services.battle_engine import BattleEngine, TickResult, battle_engine
+
+logger = logging.getLogger(__name__)
+
+_participants = BattleParticipantDB.__table__
+_battles = BattleDB.__table__
+
+# Строки только незакрытых боёв: выгрузка, вернувшаяся в буфер после сбоя
+# или записанная после settlement, не затрёт итоговое состояние боя
+_update_unsettled = (
+    update(_participants)
+    .where(
+        _participants.c.battle_participant_id == bindparam("b_participant_id"),
+        exists().where(
+            _battles.c.battle_id == _participants.c.battle_id,
+            _battles.c.status != BattleStatus.FINISHED
+        )
+    )
+)
+
+
+class ParticipantStateWriter:
+    # Write-behind для BattleParticipantDB: живое состояние боя хранится в
+    # движке, в БД оно уходит пачками раз в STATE_FLUSH_INTERVAL
+    def __init__(self, engine: BattleEngine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_duration = 0.0
+        # Строки из движка, ещё не записанные (в том числе после неудачной выгрузки)
+        self._pending: dict[int, dict] = {}
+        # Держится на время выгрузки; settlement ждёт её перед закрытием боёв
+        self.lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def on_tick(self, result: TickResult):
+        # Итог завершённого боя пишет settlement: его строки из буфера убираем
+        if result.finished:
+            finished = np.isin(self.engine.battle_id, result.finished)
+            self.engine.dirty[finished] = False
+            for participant_id in self.engine.participant_id[finished].tolist():
+                self._pending.pop(participant_id, None)
+
+    async def flush(self):
+        async with self.lock:
+            for row in self.engine.take_dirty():
+                self._pending.setdefault(row["battle_participant_id"], {}).update(row)
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            rows = [
+                {key: value for key, value in fields.items() if key != "battle_participant_id"}
+                | {"b_participant_id": participant_id}
+                for participant_id, fields in pending.items()
+            ]
+            started = time.perf_counter()
+            try:
+                async with SessionLocal() as db:
+                    # UPDATE по первичному ключу — один executemany
+                    await db.execute(_update_unsettled, rows)
+                    await db.commit()
+            except Exception:
+                # Вернём строки в буфер, не затирая более свежие изменения
+                for participant_id, fields in pending.items():
+                    self._pending[participant_id] = {**fields, **self._pending.get(participant_id, {})}
+                raise
+
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_duration = time.perf_counter() - started
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Participant state flush failed")
+
+    def start(self):
+        if self._task is None:
+            self.engine.add_listener(self.on_tick)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Всё, что не успело уйти, пишем до engine.dispose()
+        await self.flush()
+
+
+state_writer = ParticipantStateWriter(battle_engine, config.STATE_FLUSH_INTERVAL)
@@ -0,0 +1,185 @@
+import asyncio
+import struct
+from collections import deque
+
+import numpy as np
+
+import config
+from services.battle_engine import BattleEngine, TickResult, battle_engine
+
+# Кадр: заголовок <type:u8 battle_id:u32 tick:u32 count:u16>,
+# затем participant_id u32[count], маски изменённых полей u8[count]
+# и по каждому полю (в порядке FIELDS) значения тех строк, у которых
+# выставлен его бит. Снимок — тот же формат со всеми битами.
+FRAME_SNAPSHOT = 0
+FRAME_DELTA = 1
+FRAME_FINISHED = 2
+
+_HEADER = struct.Struct("<BIIH")
+FIELDS = (
+    ("health", "<i4"),
+    ("mana", "<u2"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("kills", "<u2"),
+    ("alive", "u1"),
+)
+_ALL_FIELDS = (1 << len(FIELDS)) - 1
+
+
+def _battle_state(engine: BattleEngine, rows: np.ndarray) -> dict[str, np.ndarray]:
+    state = {"participant_id": engine.participant_id[rows].astype("<u4")}
+    state["health"] = np.ceil(engine.health[rows]).astype("<i4")
+    state["mana"] = engine.mana[rows].astype("<u2")
+    state["x"] = engine.x[rows].astype("<f4")
+    state["y"] = engine.y[rows].astype("<f4")
+    state["kills"] = engine.kills[rows].astype("<u2")
+    state["alive"] = engine.alive[rows].astype("u1")
+    return state
+
+
+def encode_frame(
+        frame_type: int,
+        battle_id: int,
+        tick: int,
+        state: dict[str, np.ndarray],
+        previous: dict[str, np.ndarray] | None = None
+) -> bytes | None:
+    ids = state["participant_id"]
+    if previous is None or not np.array_equal(previous["participant_id"], ids):
+        masks = np.full(len(ids), _ALL_FIELDS, dtype="u1")
+    else:
+        masks = np.zeros(len(ids), dtype="u1")
+        for bit, (name, _) in enumerate(FIELDS):
+            masks |= (state[name] != previous[name]).astype("u1") << bit
+        if not masks.any():
+            return None
+
+    changed = masks != 0
+    masks = masks[changed]
+    parts = [
+        _HEADER.pack(frame_type, battle_id, tick, len(masks)),
+        ids[changed].tobytes(),
+        masks.tobytes(),
+    ]
+    for bit, (name, _) in enumerate(FIELDS):
+        parts.append(state[name][changed][(masks >> bit) & 1 == 1].tobytes())
+    return b"".join(parts)
+
+
+class Subscriber:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.dropped = 0
+        self.needs_snapshot = True
+        self._frames: deque[bytes | None] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, frame: bytes | None):
+        if len(self._frames) >= self.limit:
+            # Клиент не успевает: дельты без базы бесполезны,
+            # сбрасываем очередь и на следующем тике шлём свежий снимок
+            self._frames.clear()
+            self.needs_snapshot = True
+            self.dropped += 1
+            return
+        self._frames.append(frame)
+        self._ready.set()
+
+    def push_snapshot(self, frame: bytes):
+        self._frames.clear()
+        self._frames.append(frame)
+        self.needs_snapshot = False
+        self._ready.set()
+
+    def close(self, frame: bytes):
+        # Последний кадр и признак конца потока кладём в обход лимита
+        self._frames.append(frame)
+        self._frames.append(None)
+        self._ready.set()
+
+    async def next(self) -> bytes | None:
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+
+class BattleBroadcaster:
+    def __init__(self, engine: BattleEngine, queue_limit: int):
+        self.engine = engine
+        self.queue_limit = queue_limit
+        self.frames_encoded = 0
+        self._subscribers: dict[int, set[Subscriber]] = {}
+        self._last: dict[int, dict[str, np.ndarray]] = {}
+
+    def subscribe(self, battle_id: int) -> Subscriber:
+        subscriber = Subscriber(self.queue_limit)
+        if not self.engine.is_running(battle_id):
+            # Бой закончился, пока клиент подключался: кадр FINISHED уже
+            # разослан, поэтому итоговое состояние (если бой ещё в движке)
+            # и конец потока отдаём сразу
+            if self.engine.has_battle(battle_id):
+                state = _battle_state(self.engine, self.engine.battle_rows(battle_id))
+                subscriber.push_snapshot(
+                    encode_frame(FRAME_SNAPSHOT, battle_id, self.engine.tick_count, state)
+                )
+            subscriber.close(_HEADER.pack(FRAME_FINISHED, battle_id, self.engine.tick_count, 0))
+            return subscriber
+
+        state = _battle_state(self.engine, self.engine.battle_rows(battle_id))
+        self._last.setdefault(battle_id, state)
+        subscriber.push_snapshot(
+            encode_frame(FRAME_SNAPSHOT, battle_id, self.engine.tick_count, state)
+        )
+        self._subscribers.setdefault(battle_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, battle_id: int, subscriber: Subscriber):
+        subscribers = self._subscribers.get(battle_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[battle_id]
+            self._last.pop(battle_id, None)
+
+    async def on_tick(self, result: TickResult):
+        if not self._subscribers:
+            return
+
+        battle_ids = np.fromiter(self._subscribers, dtype=np.int64)
+        rows = np.nonzero(np.isin(self.engine.battle_id, battle_ids))[0]
+        rows = rows[np.argsort(self.engine.battle_id[rows], kind="stable")]
+        owners = self.engine.battle_id[rows]
+        bounds = np.nonzero(np.diff(owners))[0] + 1
+
+        for battle_rows in np.split(rows, bounds):
+            if not len(battle_rows):
+                continue
+            battle_id = int(self.engine.battle_id[battle_rows[0]])
+            self._send(battle_id, result.tick, _battle_state(self.engine, battle_rows))
+
+        for battle_id in result.finished:
+            for subscriber in self._subscribers.pop(battle_id, ()):
+                subscriber.close(_HEADER.pack(FRAME_FINISHED, battle_id, result.tick, 0))
+            self._last.pop(battle_id, None)
+
+    def _send(self, battle_id: int, tick: int, state: dict[str, np.ndarray]):
+        # Кадр кодируется один раз на бой и тик, дальше рассылаются те же байты
+        delta = encode_frame(FRAME_DELTA, battle_id, tick, state, self._last.get(battle_id))
+        snapshot = None
+        if delta is not None:
+            self.frames_encoded += 1
+        for subscriber in self._subscribers[battle_id]:
+            if subscriber.needs_snapshot:
+                if snapshot is None:
+                    snapshot = encode_frame(FRAME_SNAPSHOT, battle_id, tick, state)
+                    self.frames_encoded += 1
+                subscriber.push_snapshot(snapshot)
+            elif delta is not None:
+                subscriber.push(delta)
+        self._last[battle_id] = state
+
+
+broadcaster = BattleBroadcaster(battle_engine, config.WS_SEND_QUEUE)
@@ -0,0 +1,150 @@
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Table, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from schemas.imports import ImportReport, ImportRowError
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+
+class _ParseError:
+    def __init__(self, message: str):
+        self.message = message
+
+
+async def read_rows(request: Request) -> AsyncIterator[Any]:
+    # NDJSON читается потоком построчно, обычный JSON — массивом целиком
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Ожидается массив объектов")
+    for row in rows:
+        yield row
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as error:
+        return _ParseError(f"Некорректный JSON: {error}")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _integrity_message(error: IntegrityError) -> str:
+    return str(error.orig).splitlines()[0]
+
+
+class _Report:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.errors: list[ImportRowError] = []
+        self.failed = 0
+
+    def fail(self, row: int, message: str):
+        self.failed += 1
+        if len(self.errors) < config.IMPORT_MAX_ERRORS:
+            self.errors.append(ImportRowError(row=row, error=message))
+
+    def build(self) -> ImportReport:
+        return ImportReport(
+            received=self.received,
+            inserted=self.inserted,
+            failed=self.failed,
+            errors=sorted(self.errors, key=lambda error: error.row)
+        )
+
+
+async def _insert_bisect(table: Table, rows: list[tuple[int, dict]], db: AsyncSession, report: _Report):
+    # Отклонённую пачку делим пополам в savepoint'ах: на k плохих строк
+    # уходит O(k log n) выражений вместо построчной вставки всего чанка.
+    # Пустой список executemany превратился бы в INSERT строки по умолчанию
+    if not rows:
+        return
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(table), [values for _, values in rows])
+        report.inserted += len(rows)
+    except IntegrityError as error:
+        if len(rows) == 1:
+            report.fail(rows[0][0], _integrity_message(error))
+            return
+        middle = len(rows) // 2
+        await _insert_bisect(table, rows[:middle], db, report)
+        await _insert_bisect(table, rows[middle:], db, report)
+
+
+async def _insert_chunk(table: Table, chunk: list[tuple[int, dict]], db: AsyncSession, report: _Report):
+    # Весь чанк — один executemany в одной транзакции
+    try:
+        await db.execute(insert(table), [values for _, values in chunk])
+        await db.commit()
+        report.inserted += len(chunk)
+        return
+    except IntegrityError as error:
+        await db.rollback()
+        if len(chunk) == 1:
+            report.fail(chunk[0][0], _integrity_message(error))
+            return
+
+    middle = len(chunk) // 2
+    await _insert_bisect(table, chunk[:middle], db, report)
+    await _insert_bisect(table, chunk[middle:], db, report)
+    await db.commit()
+
+
+async def import_rows(
+        rows: AsyncIterator[Any],
+        schema: type[BaseModel],
+        table: Table,
+        db: AsyncSession
+) -> ImportReport:
+    report = _Report()
+    chunk: list[tuple[int, dict]] = []
+
+    async for raw in rows:
+        report.received += 1
+        row = report.received
+        if isinstance(raw, _ParseError):
+            report.fail(row, raw.message)
+            continue
+        try:
+            chunk.append((row, schema.model_validate(raw).model_dump()))
+        except ValidationError as error:
+            report.fail(row, _validation_message(error))
+            continue
+
+        if len(chunk) >= config.IMPORT_CHUNK_SIZE:
+            await _insert_chunk(table, chunk, db, report)
+            chunk = []
+
+    if chunk:
+        await _insert_chunk(table, chunk, db, report)
+    return report.build()
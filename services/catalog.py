@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+from bisect import bisect_right
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud import loading
+from database import ReadSessionLocal
+from models import ArenaDB, CharacterDB, EquipmentDB
+from schemas.battles import Arena
+from schemas.characters import Character
+from schemas.equipment import Equipment
+
+_character_list = TypeAdapter(list[Character])
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def _respond(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class CharacterCatalog:
+    def __init__(self):
+        self.version = 0
+        self.loaded = False
+        self._characters: dict[int, Character] = {}
+        self._list: tuple[bytes, str] = (b"[]", _etag(b"[]"))
+        self._items: dict[int, tuple[bytes, str]] = {}
+        self._ids: list[int] = []
+        self._lock = asyncio.Lock()
+
+    async def load(self, db: AsyncSession):
+        result = await db.execute(
+            select(CharacterDB)
+            .options(*loading.CHARACTER_CATALOG)
+            .order_by(CharacterDB.character_id)
+        )
+        self._characters = {}
+        self._items = {}
+        for character in result.scalars():
+            self._store(character)
+        self.loaded = True
+        self._bump()
+
+    async def ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                async with ReadSessionLocal() as db:
+                    await self.load(db)
+
+    def add(self, character: CharacterDB):
+        self._store(character)
+        self._bump()
+
+    def _store(self, character: CharacterDB):
+        # Каждый персонаж сериализуется один раз, ответы отдают готовые байты
+        model = Character.model_validate(character)
+        body = model.model_dump_json().encode()
+        self._characters[character.character_id] = model
+        self._items[character.character_id] = (body, _etag(body))
+
+    def _bump(self):
+        self.version += 1
+        self._ids = sorted(self._characters)
+        characters = [self._characters[key] for key in self._ids]
+        body = _character_list.dump_json(characters)
+        self._list = (body, _etag(body))
+
+    async def list_response(self, if_none_match: str | None) -> Response:
+        await self.ensure_loaded()
+        body, etag = self._list
+        return _respond(body, etag, if_none_match)
+
+    async def page_response(self, after: int | None, limit: int) -> Response:
+        await self.ensure_loaded()
+        start = bisect_right(self._ids, after) if after is not None else 0
+        ids = self._ids[start:start + limit]
+        body = _character_list.dump_json([self._characters[key] for key in ids])
+
+        headers = {}
+        if ids and start + limit < len(self._ids):
+            headers["X-Next-Cursor"] = str(ids[-1])
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def item_response(self, character_id: int, if_none_match: str | None) -> Response:
+        await self.ensure_loaded()
+        item = self._items.get(character_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Персонаж не найден")
+        body, etag = item
+        return _respond(body, etag, if_none_match)
+
+
+class StaticCatalog:
+    # Небольшой справочник, который меняется только админкой или импортом:
+    # держим целиком в памяти, список отдаём готовыми байтами с ETag
+    def __init__(self, model, schema: type[BaseModel], key: str):
+        self._model = model
+        self._schema = schema
+        self._key = key
+        self._adapter = TypeAdapter(list[schema])
+        self._items: dict[int, BaseModel] = {}
+        self._list: tuple[bytes, str] = (b"[]", _etag(b"[]"))
+        self.loaded = False
+
+    async def load(self, db: AsyncSession):
+        # Только столбцы таблицы, без ORM-сущностей и их связей
+        table = self._model.__table__
+        result = await db.execute(select(*table.columns).order_by(table.c[self._key]))
+        self._items = {
+            row[self._key]: self._schema.model_validate(dict(row))
+            for row in result.mappings()
+        }
+        body = self._adapter.dump_json(list(self._items.values()))
+        self._list = (body, _etag(body))
+        self.loaded = True
+
+    def get(self, key: int) -> BaseModel | None:
+        return self._items.get(key)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def list_response(self, if_none_match: str | None) -> Response:
+        body, etag = self._list
+        return _respond(body, etag, if_none_match)
+
+
+character_catalog = CharacterCatalog()
+equipment_catalog = StaticCatalog(EquipmentDB, Equipment, "equipment_id")
+arena_catalog = StaticCatalog(ArenaDB, Arena, "arena_id")
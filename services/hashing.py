@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from starlette import status
+
+import config
+from database import SessionLocal
+from models import UserDB
+from security import pwd_context
+
+logger = logging.getLogger(__name__)
+
+def _timed_call(operation: str, *args):
+    # Выполняется внутри пула; monotonic общий для всех процессов машины,
+    # поэтому время ожидания в очереди считается и для process-пула
+    started = time.monotonic()
+    if operation == "hash":
+        result = pwd_context.hash(*args)
+    else:
+        result = pwd_context.verify(*args)
+    return result, started, time.monotonic()
+
+
+@dataclass
+class HashingMetrics:
+    completed: int = 0
+    rejected: int = 0
+    rehashed: int = 0
+    rehash_failed: int = 0
+    queue_wait_total: float = 0.0
+    queue_wait_max: float = 0.0
+    hash_time_total: float = 0.0
+    hash_time_max: float = 0.0
+
+    def observe(self, queue_wait: float, hash_time: float):
+        self.completed += 1
+        self.queue_wait_total += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+        self.hash_time_total += hash_time
+        self.hash_time_max = max(self.hash_time_max, hash_time)
+
+    def snapshot(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "rehash_failed": self.rehash_failed,
+            "queue_wait_avg": self.queue_wait_total / completed,
+            "queue_wait_max": self.queue_wait_max,
+            "hash_time_avg": self.hash_time_total / completed,
+            "hash_time_max": self.hash_time_max,
+        }
+
+
+class PasswordHasher:
+    def __init__(self, kind: str, workers: int, queue_limit: int):
+        self.kind = kind
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.metrics = HashingMetrics()
+        self._executor: Executor | None = None
+        self._background: set[asyncio.Task] = set()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    async def _submit(self, operation: str, *args):
+        if self.pending >= self.queue_limit:
+            self.metrics.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите попытку позже"
+            )
+
+        self.pending += 1
+        enqueued = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(
+                self._get_executor(), _timed_call, operation, *args
+            )
+        finally:
+            self.pending -= 1
+
+        self.metrics.observe(started - enqueued, finished - started)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", plain_password, hashed_password)
+
+    def schedule_rehash(self, user_id: int, plain_password: str, old_hash: str):
+        if not pwd_context.needs_update(old_hash):
+            return
+        task = asyncio.create_task(self._rehash(user_id, plain_password, old_hash))
+        # Ссылка держится до конца задачи: иначе её может собрать GC
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _rehash(self, user_id: int, plain_password: str, old_hash: str):
+        try:
+            new_hash = await self.hash(plain_password)
+        except HTTPException:
+            # Пул занят: пересчитаем при следующем входе
+            return
+
+        except Exception:
+            self.metrics.rehash_failed += 1
+            logger.exception("Password rehash failed for user %d", user_id)
+            return
+
+        try:
+            async with SessionLocal() as session:
+                # Условие по старому хешу защищает от гонки со сменой пароля
+                await session.execute(
+                    update(UserDB)
+                    .where(UserDB.user_id == user_id, UserDB.hashed_password == old_hash)
+                    .values(hashed_password=new_hash)
+                )
+                await session.commit()
+        except Exception:
+            # Задача фоновая, ошибку никто не заберёт: считаем и пишем в лог.
+            # Старый хеш остаётся рабочим, пересчёт повторится при следующем входе
+            self.metrics.rehash_failed += 1
+            logger.exception("Password rehash failed for user %d", user_id)
+            return
+        self.metrics.rehashed += 1
+
+    async def shutdown(self):
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    kind=config.HASH_POOL_KIND,
+    workers=config.HASH_POOL_WORKERS,
+    queue_limit=config.HASH_QUEUE_LIMIT,
+)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import os
+import socket
+from collections import deque
+from typing import Any, Callable
+
+import orjson
+
+import config
+from database import SessionLocal
+from services.catalog import arena_catalog, character_catalog, equipment_catalog
+from services.principals import principal_cache
+
+logger = logging.getLogger(__name__)
+
+# Датаграмма Unix-сокета доставляется целиком; сообщения шины — десятки байт
+_MAX_MESSAGE = 64 * 1024
+# Очередь датаграмм получателя короткая (net.unix.max_dgram_qlen, обычно 10):
+# при всплеске сообщение ждёт и отправляется повторно, а не теряется сразу
+_RETRY_DELAY = 0.001
+_MAX_BACKLOG = 10_000
+
+
+class LocalTransport:
+    # Замена брокера внутри одного процесса: шины с общим списком peers
+    # получают сообщения друг друга на следующей итерации event loop.
+    # Без общего списка — одиночный процесс, рассылать некому
+    def __init__(self, peers: list["LocalTransport"] | None = None):
+        self._peers = peers if peers is not None else []
+        self._deliver: Callable[[bytes], None] | None = None
+
+    def start(self, deliver: Callable[[bytes], None]):
+        self._deliver = deliver
+        self._peers.append(self)
+
+    def send(self, payload: bytes):
+        loop = asyncio.get_running_loop()
+        for peer in self._peers:
+            if peer is not self and peer._deliver is not None:
+                loop.call_soon(peer._deliver, payload)
+
+    def stop(self):
+        if self in self._peers:
+            self._peers.remove(self)
+        self._deliver = None
+
+
+class UnixSocketTransport:
+    # Воркеры одной машины: у каждого свой датаграммный сокет {pid}.sock в
+    # общем каталоге, сообщение отправляется в каждый чужой сокет. Приём —
+    # через add_reader event loop, без потоков
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.dropped = 0
+        self.path: str | None = None
+        self._socket: socket.socket | None = None
+        self._deliver: Callable[[bytes], None] | None = None
+        self._backlog: deque[tuple[str, bytes]] = deque()
+        self._retry: asyncio.TimerHandle | None = None
+
+    def start(self, deliver: Callable[[bytes], None]):
+        os.makedirs(self.directory, exist_ok=True)
+        # Путь по pid известен только после fork
+        self.path = os.path.join(self.directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        self._socket.setblocking(False)
+        self._deliver = deliver
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._read)
+
+    def _read(self):
+        while True:
+            try:
+                payload = self._socket.recv(_MAX_MESSAGE)
+            except BlockingIOError:
+                return
+            self._deliver(payload)
+
+    def _sendto(self, path: str, payload: bytes) -> bool:
+        try:
+            self._socket.sendto(payload, path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Сокет упавшего воркера: никто не слушает
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        except BlockingIOError:
+            return False
+        return True
+
+    def send(self, payload: bytes):
+        if self._socket is None:
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith(".sock") or path == self.path:
+                continue
+            if self._backlog or not self._sendto(path, payload):
+                self._defer(path, payload)
+
+    def _defer(self, path: str, payload: bytes):
+        if len(self._backlog) >= _MAX_BACKLOG:
+            # Получатель не читает; запись доживёт до своего TTL
+            self._backlog.popleft()
+            self.dropped += 1
+            logger.warning("Invalidation message to %s dropped", path)
+        self._backlog.append((path, payload))
+        if self._retry is None:
+            self._retry = asyncio.get_running_loop().call_later(_RETRY_DELAY, self._flush)
+
+    def _flush(self):
+        self._retry = None
+        if self._socket is None:
+            return
+        while self._backlog:
+            path, payload = self._backlog[0]
+            if not self._sendto(path, payload):
+                self._retry = asyncio.get_running_loop().call_later(_RETRY_DELAY, self._flush)
+                return
+            self._backlog.popleft()
+
+    def stop(self):
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+class InvalidationBus:
+    # Сообщение (kind, key) применяется в своём процессе сразу, в остальных
+    # воркерах — обработчиком, подписанным на kind. Транспорт сменный:
+    # любой объект с start(deliver), send(payload) и stop()
+    def __init__(self, transport):
+        self.transport = transport
+        self.published = 0
+        self.received = 0
+        self._handlers: dict[str, list[Callable[[Any], None]]] = {}
+
+    def subscribe(self, kind: str, handler: Callable[[Any], None]):
+        handlers = self._handlers.setdefault(kind, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    def publish(self, kind: str, key: Any, local: bool = True):
+        # local=False — своя копия уже обновлена вызывающим
+        if local:
+            self._dispatch(kind, key)
+        self.published += 1
+        self.transport.send(orjson.dumps([kind, key]))
+
+    def _deliver(self, payload: bytes):
+        self.received += 1
+        try:
+            kind, key = orjson.loads(payload)
+        except (orjson.JSONDecodeError, ValueError):
+            logger.warning("Malformed invalidation message %r", payload[:100])
+            return
+        self._dispatch(kind, key)
+
+    def _dispatch(self, kind: str, key: Any):
+        for handler in self._handlers.get(kind, ()):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", kind)
+
+    def start(self):
+        self.transport.start(self._deliver)
+
+    def stop(self):
+        self.transport.stop()
+
+
+_catalogs = {
+    "characters": character_catalog,
+    "equipment": equipment_catalog,
+    "arenas": arena_catalog,
+}
+_reloads: set[asyncio.Task] = set()
+
+
+async def _reload(name: str):
+    # Из основной базы: реплика может ещё не видеть изменение
+    try:
+        async with SessionLocal() as db:
+            await _catalogs[name].load(db)
+    except Exception:
+        logger.exception("Reloading %s catalog failed", name)
+
+
+def reload_catalog(name: str):
+    task = asyncio.create_task(_reload(name))
+    _reloads.add(task)
+    task.add_done_callback(_reloads.discard)
+
+
+def _transport():
+    if config.INVALIDATION_BUS == "unix":
+        return UnixSocketTransport(config.INVALIDATION_SOCKET_DIR)
+    return LocalTransport()
+
+
+bus = InvalidationBus(_transport())
+bus.subscribe("principal", principal_cache.invalidate_user)
+bus.subscribe("catalog", reload_catalog)
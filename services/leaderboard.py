@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sortedcontainers import SortedList
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from database import SessionLocal
+from enums import BattleStatus
+from models import BattleDB, BattleParticipantDB, LeaderboardEntryDB, LeaderboardSnapshotDB
+from services.battle_engine import BattleEngine, TickResult, battle_engine
+from services.invalidation import bus
+
+# arena_id общего рейтинга по всем аренам
+GLOBAL = 0
+
+logger = logging.getLogger(__name__)
+
+
+def _scopes(arena_id: int | None) -> tuple[int, ...]:
+    return (GLOBAL,) if arena_id is None else (GLOBAL, arena_id)
+
+
+def _lowest_unfinished_query(abandoned: datetime):
+    return select(func.min(BattleDB.battle_id)).where(
+        # Литерал, а не параметр: иначе частичный индекс не подходит
+        BattleDB.status != literal(BattleStatus.FINISHED, BattleDB.status.type, literal_execute=True),
+        BattleDB.started_at >= abandoned
+    )
+
+
+class Ranking:
+    # Очки по пользователю и упорядоченный список (-kills, user_id):
+    # обновление, место и срезы — O(log n)
+    def __init__(self, scores: dict[int, int] | None = None):
+        self._scores: dict[int, int] = dict(scores or {})
+        self._order = SortedList((-kills, user_id) for user_id, kills in self._scores.items())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def add(self, user_id: int, kills: int) -> int:
+        old = self._scores.get(user_id)
+        if old is not None:
+            if not kills:
+                return old
+            self._order.remove((-old, user_id))
+        new = (old or 0) + kills
+        self._scores[user_id] = new
+        self._order.add((-new, user_id))
+        return new
+
+    def score(self, user_id: int) -> int | None:
+        return self._scores.get(user_id)
+
+    def _rank_of(self, kills: int) -> int:
+        # Одинаковое число убийств — одинаковое место
+        return self._order.bisect_left((-kills,)) + 1
+
+    def rank(self, user_id: int) -> int | None:
+        kills = self._scores.get(user_id)
+        return None if kills is None else self._rank_of(kills)
+
+    def _entries(self, start: int, stop: int) -> list[dict]:
+        # Место ищем бинарным поиском только для первой строки, дальше
+        # оно меняется на позицию строки при смене числа убийств
+        entries = []
+        rank, previous = 0, None
+        for position, (negative, user_id) in enumerate(self._order[start:stop], start + 1):
+            if negative != previous:
+                rank = self._rank_of(-negative) if previous is None else position
+                previous = negative
+            entries.append({"rank": rank, "user_id": user_id, "kills": -negative})
+        return entries
+
+    def top(self, limit: int, offset: int = 0) -> list[dict]:
+        return self._entries(offset, offset + limit)
+
+    def around(self, user_id: int, radius: int) -> list[dict]:
+        kills = self._scores.get(user_id)
+        if kills is None:
+            return []
+        position = self._order.index((-kills, user_id))
+        return self._entries(max(position - radius, 0), position + radius + 1)
+
+
+class Leaderboard:
+    # Рейтинги обновляются по завершении боя, а не пересчитываются
+    # GROUP BY по всем участникам. Раз в LEADERBOARD_SNAPSHOT_INTERVAL
+    # изменившиеся строки пишутся в leaderboard_entries; после рестарта
+    # рейтинг собирается из снимка и догоняется по боям выше его курсора
+    def __init__(self, engine: BattleEngine, interval: float, abandoned_after: float):
+        self.engine = engine
+        self.interval = interval
+        self.abandoned_after = abandoned_after
+        self.rankings: dict[int, Ranking] = {GLOBAL: Ranking()}
+        self.battles_recorded = 0
+        self.snapshots = 0
+        self.last_snapshot_duration = 0.0
+        self._dirty: set[tuple[int, int]] = set()
+        self._persisted: set[tuple[int, int]] = set()
+        # Все завершённые бои с battle_id <= cursor учтены; выше курсора
+        # учтённые бои перечислены в _counted
+        self.cursor = 0
+        self._counted: set[int] = set()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        # Снимки пишет один воркер; остальные только держат рейтинг в памяти
+        self._snapshots = True
+
+    def ranking(self, arena_id: int = GLOBAL) -> Ranking:
+        return self.rankings.get(arena_id) or Ranking()
+
+    def record_battle(self, battle_id: int, arena_id: int | None, kills: dict[int, int]):
+        # Повторное событие того же боя (ретрай, догонка после рестарта) не считаем
+        if battle_id in self._counted:
+            return
+        if self._snapshots:
+            self._counted.add(battle_id)
+
+        for scope in _scopes(arena_id):
+            ranking = self.rankings.get(scope)
+            if ranking is None:
+                ranking = self.rankings[scope] = Ranking()
+            for user_id, count in kills.items():
+                ranking.add(user_id, count)
+                if self._snapshots:
+                    self._dirty.add((scope, user_id))
+        self.battles_recorded += 1
+
+    def record_remote(self, message: list):
+        # Бой, завершившийся в другом воркере
+        battle_id, arena_id, kills = message
+        self.record_battle(battle_id, arena_id, dict(kills))
+
+    async def on_tick(self, result: TickResult):
+        for battle_id in result.finished:
+            rows = self.engine.battle_rows(battle_id)
+            kills: dict[int, int] = {}
+            for user_id, count in zip(self.engine.user_id[rows].tolist(), self.engine.kills[rows].tolist()):
+                kills[user_id] = kills.get(user_id, 0) + count
+            arena_id = self.engine.arena_of(battle_id)
+            self.record_battle(battle_id, arena_id, kills)
+            bus.publish("battle_kills", [battle_id, arena_id, list(kills.items())], local=False)
+
+    async def load(self, db: AsyncSession):
+        snapshot = (await db.execute(
+            select(LeaderboardSnapshotDB).where(LeaderboardSnapshotDB.snapshot_id == 1)
+        )).scalar_one_or_none()
+
+        if snapshot is None:
+            # Первый запуск: историю до курсора агрегируем одним запросом,
+            # бои выше него догоняем по одному, чтобы они попали в _counted
+            self.cursor = await self._watermark(db)
+            self._counted = set()
+            self.rankings = {GLOBAL: Ranking()}
+            self._persisted = set()
+            self._apply_totals(await self._finished_kills(db, self.cursor))
+            await self._catch_up(db)
+            return
+
+        scores: dict[int, dict[int, int]] = {}
+        result = await db.execute(
+            select(LeaderboardEntryDB.arena_id, LeaderboardEntryDB.user_id, LeaderboardEntryDB.kills)
+        )
+        for arena_id, user_id, kills in result:
+            scores.setdefault(arena_id, {})[user_id] = kills
+        self.rankings = {arena_id: Ranking(values) for arena_id, values in scores.items()}
+        self.rankings.setdefault(GLOBAL, Ranking())
+        self._persisted = {(arena_id, user_id) for arena_id, values in scores.items() for user_id in values}
+
+        self.cursor = snapshot.last_battle_id
+        self._counted = set(snapshot.recent_battles)
+        await self._catch_up(db)
+
+    async def _catch_up(self, db: AsyncSession):
+        for battle_id, arena_id, kills in await self._finished_battles(db, self.cursor):
+            self.record_battle(battle_id, arena_id, kills)
+
+    async def _watermark(self, db: AsyncSession) -> int:
+        # Наибольший battle_id, до которого все бои завершены. Бой, не
+        # закрытый за abandoned_after, потерян вместе с воркером и курсор
+        # не держит: иначе список учтённых боёв выше курсора рос бы без конца
+        abandoned = datetime.utcnow() - timedelta(seconds=self.abandoned_after)
+        unfinished = (await db.execute(_lowest_unfinished_query(abandoned))).scalar()
+        if unfinished is not None:
+            return unfinished - 1
+        return (await db.execute(select(func.max(BattleDB.battle_id)))).scalar() or 0
+
+    async def _finished_kills(self, db: AsyncSession, cursor: int) -> dict[tuple[int, int], int]:
+        result = await db.execute(
+            select(BattleDB.arena_id, BattleParticipantDB.user_id, func.sum(BattleParticipantDB.kills))
+            .join(BattleDB, BattleDB.battle_id == BattleParticipantDB.battle_id)
+            .where(BattleDB.status == BattleStatus.FINISHED, BattleDB.battle_id <= cursor)
+            .group_by(BattleDB.arena_id, BattleParticipantDB.user_id)
+        )
+        return {(arena_id, user_id): int(kills or 0) for arena_id, user_id, kills in result}
+
+    async def _finished_battles(self, db: AsyncSession, cursor: int) -> list[tuple[int, int, dict[int, int]]]:
+        # Завершённые бои выше курсора, кроме уже учтённых в снимке
+        result = await db.execute(
+            select(BattleDB.battle_id, BattleDB.arena_id, BattleParticipantDB.user_id, BattleParticipantDB.kills)
+            .join(BattleDB, BattleDB.battle_id == BattleParticipantDB.battle_id)
+            .where(BattleDB.status == BattleStatus.FINISHED, BattleDB.battle_id > cursor)
+            .order_by(BattleDB.battle_id)
+        )
+        battles: dict[int, tuple[int, int, dict[int, int]]] = {}
+        for battle_id, arena_id, user_id, kills in result:
+            if battle_id in self._counted:
+                continue
+            battle = battles.setdefault(battle_id, (battle_id, arena_id, {}))
+            battle[2][user_id] = battle[2].get(user_id, 0) + (kills or 0)
+        return list(battles.values())
+
+    def _apply_totals(self, totals: dict[tuple[int, int], int]):
+        for (arena_id, user_id), kills in totals.items():
+            for scope in _scopes(arena_id):
+                ranking = self.rankings.get(scope)
+                if ranking is None:
+                    ranking = self.rankings[scope] = Ranking()
+                ranking.add(user_id, kills)
+                self._dirty.add((scope, user_id))
+
+    async def snapshot(self):
+        async with self._lock:
+            async with SessionLocal() as db:
+                # Курсор берётся до фиксации состояния: всё, что ниже него,
+                # уже завершено в БД, а значит, учтено в памяти
+                cursor = max(self.cursor, await self._watermark(db))
+            # Состояние фиксируется синхронно, без await: бой либо целиком
+            # попал в снимок, либо будет догнан по курсору
+            taken_at = datetime.utcnow()
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                {"arena_id": arena_id, "user_id": user_id, "kills": self.rankings[arena_id].score(user_id)}
+                for arena_id, user_id in dirty
+            ]
+            recent = sorted(battle_id for battle_id in self._counted if battle_id > cursor)
+            changed = [row for row in rows if (row["arena_id"], row["user_id"]) in self._persisted]
+            added = [row for row in rows if (row["arena_id"], row["user_id"]) not in self._persisted]
+
+            started = time.perf_counter()
+            try:
+                async with SessionLocal() as db:
+                    if changed:
+                        await db.execute(update(LeaderboardEntryDB), changed)
+                    if added:
+                        await db.execute(insert(LeaderboardEntryDB), added)
+                    await db.execute(delete(LeaderboardSnapshotDB))
+                    await db.execute(insert(LeaderboardSnapshotDB).values(
+                        snapshot_id=1, taken_at=taken_at, last_battle_id=cursor, recent_battles=recent
+                    ))
+                    await db.commit()
+            except Exception:
+                self._dirty |= dirty
+                raise
+
+            self._persisted.update(dirty)
+            # Бои ниже курсора в снимке; записанные во время commit остаются
+            self.cursor = cursor
+            self._counted = {battle_id for battle_id in self._counted if battle_id > cursor}
+            self.snapshots += 1
+            self.last_snapshot_duration = time.perf_counter() - started
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot()
+            except Exception:
+                logger.exception("Leaderboard snapshot failed")
+
+    def start(self, snapshots: bool = True):
+        self.engine.add_listener(self.on_tick)
+        bus.subscribe("battle_kills", self.record_remote)
+        self._snapshots = snapshots
+        if not snapshots:
+            # Догонка уже прошла, а курсор двигают только снимки
+            self._dirty.clear()
+            self._counted.clear()
+        elif self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._snapshots:
+            await self.snapshot()
+
+
+leaderboard = Leaderboard(
+    battle_engine,
+    config.LEADERBOARD_SNAPSHOT_INTERVAL,
+    config.LEADERBOARD_ABANDONED_AFTER
+)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from sqlalchemy.exc import IntegrityError
+
+import config
+import crud.currency
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Posting:
+    entries: list[dict]
+    future: asyncio.Future
+    # Ключи, которые этот вызов первым принёс в пачку
+    claimed: set[str] = field(default_factory=set)
+
+
+@dataclass
+class LedgerMetrics:
+    batches: int = 0
+    entries: int = 0
+    duplicates: int = 0
+    failed_batches: int = 0
+    last_batch_size: int = 0
+    last_batch_duration: float = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "entries": self.entries,
+            "duplicates": self.duplicates,
+            "failed_batches": self.failed_batches,
+            "entries_per_batch": self.entries / (self.batches or 1),
+            "last_batch_size": self.last_batch_size,
+            "last_batch_duration": self.last_batch_duration,
+        }
+
+
+class CurrencyLedger:
+    # Групповая запись наград: пока пишется одна пачка, следующие вызовы
+    # копятся в очереди и уходят одной транзакцией — INSERT в журнал и
+    # UPDATE балансов на пользователя вместо транзакции на каждую награду
+    def __init__(self, batch_size: int, linger: float):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.metrics = LedgerMetrics()
+        self._queue: deque[_Posting] = deque()
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def post(self, entries: list[dict]) -> set[str]:
+        # Записи: user_id, coins_delta, crystals_delta, reason, idempotency_key.
+        # Возвращает ключи, которые были проведены этим вызовом
+        if self._task is None or self._stopping:
+            # Фоновая запись не запущена (скрипты, тесты) или останавливается — пишем сразу
+            async with SessionLocal() as db:
+                applied = await crud.currency.post_entries(entries, db)
+                await db.commit()
+            return applied
+
+        posting = _Posting(entries, asyncio.get_running_loop().create_future())
+        self._queue.append(posting)
+        self._wake.set()
+        return await asyncio.shield(posting.future)
+
+    async def credit(
+            self,
+            user_id: int,
+            reason: str,
+            coins: int = 0,
+            crystals: int = 0,
+            idempotency_key: str | None = None
+    ) -> bool:
+        applied = await self.post([{
+            "user_id": user_id,
+            "coins_delta": coins,
+            "crystals_delta": crystals,
+            "reason": reason,
+            "idempotency_key": idempotency_key
+        }])
+        return idempotency_key is None or idempotency_key in applied
+
+    def _take_batch(self) -> list[_Posting]:
+        batch, size = [], 0
+        while self._queue and (not batch or size + len(self._queue[0].entries) <= self.batch_size):
+            posting = self._queue.popleft()
+            batch.append(posting)
+            size += len(posting.entries)
+        return batch
+
+    async def _write(self, postings: list[_Posting]) -> set[str]:
+        # Один ключ в одной пачке засчитывается только первому вызову
+        seen: set[str] = set()
+        entries = []
+        for posting in postings:
+            posting.claimed.clear()
+            for entry in posting.entries:
+                key = entry.get("idempotency_key")
+                if key is not None:
+                    if key in seen:
+                        self.metrics.duplicates += 1
+                        continue
+                    seen.add(key)
+                    posting.claimed.add(key)
+                entries.append(entry)
+
+        async with SessionLocal() as db:
+            applied = await crud.currency.post_entries(entries, db)
+            await db.commit()
+        self.metrics.entries += len(entries)
+        self.metrics.duplicates += len(seen) - len(applied)
+        return applied
+
+    async def flush(self):
+        while batch := self._take_batch():
+            started = time.perf_counter()
+            try:
+                applied = await self._write(batch)
+                results = [(posting, applied & posting.claimed) for posting in batch]
+            except IntegrityError:
+                # Например, награда несуществующему пользователю: повторяем
+                # по вызовам, чтобы ошибка досталась только виновнику
+                self.metrics.failed_batches += 1
+                results = []
+                for posting in batch:
+                    try:
+                        results.append((posting, await self._write([posting]) & posting.claimed))
+                    except Exception as error:
+                        results.append((posting, error))
+            except Exception as error:
+                self.metrics.failed_batches += 1
+                results = [(posting, error) for posting in batch]
+
+            self.metrics.batches += 1
+            self.metrics.last_batch_size = sum(len(posting.entries) for posting in batch)
+            self.metrics.last_batch_duration = time.perf_counter() - started
+            for posting, result in results:
+                if posting.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    posting.future.set_exception(result)
+                else:
+                    posting.future.set_result(result)
+
+    async def run(self):
+        while not self._stopping:
+            await self._wake.wait()
+            if self.linger and not self._stopping:
+                await asyncio.sleep(self.linger)
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Currency ledger flush failed")
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # Без cancel: отмена посреди commit оставила бы вызовы без ответа,
+        # а записи без ключа — под риском повторного начисления
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+
+ledger = CurrencyLedger(config.LEDGER_BATCH_SIZE, config.LEDGER_LINGER)
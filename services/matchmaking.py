@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException
+from starlette import status
+
+import config
+import crud.battles
+import crud.stats
+from database import SessionLocal
+from services.battle_engine import battle_engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JoinRequest:
+    user_id: int
+    arena_id: int
+    enqueued_at: float
+    future: asyncio.Future
+
+
+@dataclass
+class MatchmakingMetrics:
+    started_at: float = field(default_factory=time.monotonic)
+    matched: int = 0
+    battles_filled: int = 0
+    failed_batches: int = 0
+    queue_wait_total: float = 0.0
+    queue_wait_max: float = 0.0
+
+    def observe_wait(self, wait: float):
+        self.matched += 1
+        self.queue_wait_total += wait
+        self.queue_wait_max = max(self.queue_wait_max, wait)
+
+    def snapshot(self, queued: int) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "queued": queued,
+            "matched": self.matched,
+            "battles_filled": self.battles_filled,
+            "failed_batches": self.failed_batches,
+            "battles_per_second": self.battles_filled / elapsed if elapsed else 0.0,
+            "queue_wait_avg": self.queue_wait_total / (self.matched or 1),
+            "queue_wait_max": self.queue_wait_max,
+        }
+
+
+class Matchmaker:
+    def __init__(self):
+        self.metrics = MatchmakingMetrics()
+        self._queues: dict[int, deque[JoinRequest]] = {}
+        self._queued: dict[int, JoinRequest] = {}
+        self._task: asyncio.Task | None = None
+
+    async def join(self, user_id: int, arena_id: int) -> int:
+        if user_id in self._queued:
+            raise HTTPException(status_code=400, detail="Вы уже в очереди на бой")
+
+        request = JoinRequest(
+            user_id=user_id,
+            arena_id=arena_id,
+            enqueued_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future()
+        )
+        self._queues.setdefault(arena_id, deque()).append(request)
+        self._queued[user_id] = request
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(request.future), config.MATCH_JOIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            if self.leave(user_id):
+                raise HTTPException(
+                    status_code=status.HTTP_408_REQUEST_TIMEOUT,
+                    detail="Не удалось подобрать бой, попробуйте ещё раз"
+                )
+            # Бой успели собрать в последний момент
+            return await request.future
+        except asyncio.CancelledError:
+            if request.future.cancelled():
+                raise HTTPException(status_code=400, detail="Вы покинули очередь")
+            # Клиент отключился, не держим его место в очереди
+            self.leave(user_id)
+            raise
+
+    def leave(self, user_id: int) -> bool:
+        request = self._queued.pop(user_id, None)
+        if request is None or request.future.done():
+            return False
+        self._queues[request.arena_id].remove(request)
+        request.future.cancel()
+        return True
+
+    def _take_groups(self) -> list[list[JoinRequest]]:
+        now = time.monotonic()
+        groups = []
+        for queue in self._queues.values():
+            while len(queue) >= config.MATCH_PLAYERS:
+                groups.append([queue.popleft() for _ in range(config.MATCH_PLAYERS)])
+            # Неполный бой собираем, когда первый в очереди ждёт слишком долго
+            if (
+                len(queue) >= config.MATCH_MIN_PLAYERS
+                and now - queue[0].enqueued_at >= config.MATCH_FILL_TIMEOUT
+            ):
+                groups.append(list(queue))
+                queue.clear()
+        for group in groups:
+            for request in group:
+                self._queued.pop(request.user_id, None)
+        return groups
+
+    async def _create_battles(self, groups: list[list[JoinRequest]]):
+        async with SessionLocal() as db:
+            user_ids = [request.user_id for group in groups for request in group]
+            # Без активного персонажа статы уже базовые по умолчанию плюс экипировка
+            stats = await crud.stats.get_effective_stats(user_ids, db)
+
+            battles = []
+            for group in groups:
+                participants = []
+                for request in group:
+                    participants.append({
+                        "user_id": request.user_id,
+                        "current_health": stats.get(request.user_id, crud.stats.DEFAULT_STATS)["health"],
+                        "position_x": random.uniform(0, config.ARENA_SIZE),
+                        "position_y": random.uniform(0, config.ARENA_SIZE)
+                    })
+                battles.append({
+                    "arena_id": group[0].arena_id,
+                    "max_players": config.MATCH_PLAYERS,
+                    "participants": participants
+                })
+            battles = await crud.battles.create_started_battles(battles, db)
+
+        for battle in battles:
+            battle_engine.add_battle(battle["battle_id"], [
+                {
+                    "participant_id": participant["battle_participant_id"],
+                    "user_id": participant["user_id"],
+                    "health": participant["current_health"],
+                    "damage": stats.get(participant["user_id"], crud.stats.DEFAULT_STATS)["damage"],
+                    "speed": stats.get(participant["user_id"], crud.stats.DEFAULT_STATS)["speed"],
+                    "x": participant["position_x"],
+                    "y": participant["position_y"]
+                }
+                for participant in battle["participants"]
+            ], arena_id=battle["arena_id"])
+            battle_engine.start_battle(battle["battle_id"])
+        return battles
+
+    async def run_once(self):
+        groups = self._take_groups()
+        if not groups:
+            return
+
+        try:
+            battles = await self._create_battles(groups)
+        except Exception:
+            self.metrics.failed_batches += 1
+            for group in groups:
+                for request in group:
+                    if not request.future.done():
+                        request.future.set_exception(HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail="Не удалось создать бой"
+                        ))
+            raise
+
+        now = time.monotonic()
+        self.metrics.battles_filled += len(battles)
+        for group, battle in zip(groups, battles):
+            for request in group:
+                self.metrics.observe_wait(now - request.enqueued_at)
+                if not request.future.done():
+                    request.future.set_result(battle["battle_id"])
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                # Ошибка уже отдана ожидающим игрокам, очередь продолжает работу
+                logger.exception("Matchmaking pass failed")
+            await asyncio.sleep(config.MATCHMAKING_INTERVAL)
+
+    def queued(self) -> int:
+        return len(self._queued)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for user_id in list(self._queued):
+            self.leave(user_id)
+
+
+matchmaker = Matchmaker()
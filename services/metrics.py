@@ -0,0 +1,252 @@
+import cProfile
+import logging
+import os
+import random
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import config
+import database
+from services.hashing import hasher
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # Последняя корзина — +Inf
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_time: float = 0.0
+    pool_wait: float = 0.0
+
+
+# Счётчики текущего запроса; задача asyncio и greenlet SQLAlchemy видят
+# один и тот же объект, поэтому события движка пишут прямо в него
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.responses: dict[int, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.pool_wait = Histogram(LATENCY_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.queries_total = 0
+        self.db_time_total = 0.0
+        self._engines: set[int] = set()
+
+    def instrument_engine(self, engine: AsyncEngine):
+        if id(engine) in self._engines:
+            return
+        self._engines.add(id(engine))
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, *args):
+        # На соединении одновременно выполняется одно выражение
+        conn.info["query_started"] = time.perf_counter()
+
+    def _after_execute(self, conn, *args):
+        elapsed = time.perf_counter() - conn.info.pop("query_started", time.perf_counter())
+        self.queries_total += 1
+        self.db_time_total += elapsed
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+    @staticmethod
+    def observe_pool_wait(wait: float):
+        stats = _current.get()
+        if stats is not None:
+            stats.pool_wait += wait
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.responses[status] = metrics.responses.get(status, 0) + 1
+        metrics.latency.observe(duration)
+        metrics.queries.observe(stats.queries)
+        metrics.db_time.observe(stats.db_time)
+        metrics.pool_wait.observe(stats.pool_wait)
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        _header(lines, "http_requests_total", "counter", "HTTP responses by route and status")
+        for (method, route), metrics in self.routes.items():
+            for status, count in sorted(metrics.responses.items()):
+                lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        for name, attribute, help_text in (
+            ("http_request_duration_seconds", "latency", "Request latency"),
+            ("http_request_db_queries", "queries", "SQL statements per request"),
+            ("http_request_db_seconds", "db_time", "Time spent in SQL statements per request"),
+            ("http_request_pool_wait_seconds", "pool_wait", "Time spent waiting for a pooled connection per request"),
+        ):
+            _header(lines, name, "histogram", help_text)
+            for (method, route), metrics in self.routes.items():
+                _histogram(lines, name, getattr(metrics, attribute), method=method, route=route)
+
+        _header(lines, "db_queries_total", "counter", "SQL statements, including background tasks")
+        lines.append(f"db_queries_total {self.queries_total}")
+        _header(lines, "db_query_seconds_total", "counter", "Time spent in SQL statements")
+        lines.append(f"db_query_seconds_total {_number(self.db_time_total)}")
+
+        pools = database.pool_status()
+        for key, kind in (
+            ("size", "gauge"), ("checked_out", "gauge"), ("overflow", "gauge"),
+            ("connects", "counter"), ("checkouts", "counter"),
+            ("wait_avg", "gauge"), ("wait_max", "gauge"),
+        ):
+            name = f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+            _header(lines, name, kind, f"Connection pool {key.replace('_', ' ')}")
+            for pool in pools:
+                lines.append(f"{name}{_labels(pool=pool['name'])} {_number(pool[key])}")
+
+        for key, value in hasher.metrics.snapshot().items():
+            name = f"password_hash_{key}"
+            _header(lines, name, "gauge", f"Password hashing {key.replace('_', ' ')}")
+            lines.append(f"{name} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _header(lines: list[str], name: str, kind: str, help_text: str):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _histogram(lines: list[str], name: str, histogram: Histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=_number(bound))} {cumulative}")
+    lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}")
+    lines.append(f"{name}_sum{_labels(**labels)} {_number(histogram.sum)}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class SlowRequestProfiler:
+    # cProfile на выборке запросов; профиль сохраняется, только если запрос
+    # оказался медленным. Профилировщик видит весь поток event loop, поэтому
+    # в дамп попадают и соседние корутины — одновременно профилируется
+    # не больше одного запроса
+    def __init__(self, sample_rate: float, slow_seconds: float, directory: str):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.directory = directory
+        self.dumped = 0
+        self._active = False
+
+    def start(self) -> cProfile.Profile | None:
+        if self._active or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Уже работает другой профилировщик (например, внешний)
+            return None
+        self._active = True
+        return profile
+
+    def finish(self, profile: cProfile.Profile, method: str, route: str, duration: float):
+        profile.disable()
+        self._active = False
+        if duration < self.slow_seconds:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.dumped += 1
+        slug = "".join(char if char.isalnum() else "_" for char in route.strip("/")) or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.dumped}-{method}-{slug}-{duration * 1e3:.0f}ms.prof"
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path)
+        logger.warning("Slow request %s %s took %.3fs, profile saved to %s", method, route, duration, path)
+
+
+class MetricsMiddleware:
+    # Чистый ASGI: время считается до отправки последнего байта тела,
+    # включая потоковые ответы
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        profile = profiler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            _current.reset(token)
+            # Шаблон пути, а не сам путь: /users/{user_id}, а не /users/42
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            registry.observe(scope["method"], route_path, status, duration, stats)
+            if profile is not None:
+                profiler.finish(profile, scope["method"], route_path, duration)
+
+
+def install(app):
+    app.add_middleware(MetricsMiddleware)
+    registry.instrument_engine(database.engine)
+    registry.instrument_engine(database.read_engine)
+    database.wait_observers.append(registry.observe_pool_wait)
+
+
+registry = MetricsRegistry()
+profiler = SlowRequestProfiler(config.PROFILE_SAMPLE_RATE, config.PROFILE_SLOW_SECONDS, config.PROFILE_DIR)
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import config
+from enums import UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    user_id: int
+    role: UserRole
+    is_active: bool
+
+
+class PrincipalCache:
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # token -> (principal, expires_at), порядок — от давно использованных к свежим
+        self._entries: OrderedDict[str, tuple[Principal, float]] = OrderedDict()
+        self._tokens_by_user: dict[int, set[str]] = {}
+        # Счётчик инвалидаций пользователя: промах кэша читает его до SELECT,
+        # и если бан или смена роли пришли во время запроса, put пропускается
+        self._generations: dict[int, int] = {}
+
+    def get(self, token: str) -> Principal | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(token)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return principal
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def put(self, token: str, principal: Principal, token_exp: float, generation: int):
+        # Строка прочитана до инвалидации — в кэш её не кладём
+        if self._generations.get(principal.user_id, 0) != generation:
+            return
+        # Запись не переживает сам токен
+        expires_at = min(time.time() + self.ttl, token_exp)
+        if token in self._entries:
+            self._remove(token)
+        self._entries[token] = (principal, expires_at)
+        self._tokens_by_user.setdefault(principal.user_id, set()).add(token)
+
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate_user(self, user_id: int):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        for token in self._tokens_by_user.pop(user_id, ()):
+            self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens_by_user.clear()
+        self._generations.clear()
+
+    def _remove(self, token: str):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.user_id]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache(
+    ttl=config.PRINCIPAL_CACHE_TTL,
+    max_size=config.PRINCIPAL_CACHE_SIZE,
+)
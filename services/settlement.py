@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+import config
+import crud.battles
+from database import SessionLocal
+from services.battle_engine import BattleEngine, TickResult, battle_engine
+from services.battle_state import ParticipantStateWriter, state_writer
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SettlementMetrics:
+    batches: int = 0
+    battles: int = 0
+    already_settled: int = 0
+    failed_batches: int = 0
+    busy_time: float = 0.0
+    last_batch_size: int = 0
+    last_batch_duration: float = 0.0
+
+    def snapshot(self, queued: int) -> dict:
+        return {
+            "queued": queued,
+            "batches": self.batches,
+            "battles": self.battles,
+            "already_settled": self.already_settled,
+            "failed_batches": self.failed_batches,
+            "battles_per_batch": self.battles / (self.batches or 1),
+            "battles_per_second": self.battles / self.busy_time if self.busy_time else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_duration": self.last_batch_duration,
+        }
+
+
+def battle_rewards(battle_id: int, participants: list[dict]) -> list[dict]:
+    # Монеты за убийства и за то, что дожил до конца; кристаллы — выжившим.
+    # Ключ привязан к бою: повтор закрытия не оплачивается
+    rewards = []
+    for participant in participants:
+        survived = participant["is_alive"]
+        coins = participant["kills"] * config.REWARD_COINS_PER_KILL + (config.REWARD_COINS_SURVIVAL if survived else 0)
+        crystals = config.REWARD_CRYSTALS_SURVIVAL if survived else 0
+        if coins or crystals:
+            rewards.append({
+                "user_id": participant["user_id"],
+                "coins_delta": coins,
+                "crystals_delta": crystals,
+                "reason": "battle_reward",
+                "idempotency_key": f"battle:{battle_id}:{participant['user_id']}"
+            })
+    return rewards
+
+
+class BattleSettlement:
+    # Закрытие завершённых боёв: итоговое состояние забирается из движка
+    # в тике завершения, бои убираются из движка, а статус, награды и износ
+    # снаряжения пишутся пачками боёв — несколько выражений на пачку
+    # вместо десятков на каждый бой
+    def __init__(
+        self, engine: BattleEngine, batch_size: int, retry_delay: float,
+        state_writer: ParticipantStateWriter | None = None
+    ):
+        self.engine = engine
+        self.state_writer = state_writer
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.metrics = SettlementMetrics()
+        self._queue: deque[dict] = deque()
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    def collect(self, battle_ids: list[int]) -> list[dict]:
+        e = self.engine
+        ended_at = datetime.utcnow()
+        rows = np.nonzero(np.isin(e.battle_id, battle_ids))[0]
+        participants: dict[int, list[dict]] = {battle_id: [] for battle_id in battle_ids}
+        for battle_id, participant_id, user_id, health, mana, x, y, kills, alive in zip(
+            e.battle_id[rows].tolist(),
+            e.participant_id[rows].tolist(),
+            e.user_id[rows].tolist(),
+            np.ceil(e.health[rows]).astype(np.int64).tolist(),
+            e.mana[rows].astype(np.int64).tolist(),
+            e.x[rows].tolist(),
+            e.y[rows].tolist(),
+            e.kills[rows].tolist(),
+            e.alive[rows].tolist()
+        ):
+            participants[battle_id].append({
+                "battle_participant_id": participant_id,
+                "user_id": user_id,
+                "current_health": health,
+                "current_mana": mana,
+                "position_x": x,
+                "position_y": y,
+                "kills": kills,
+                "is_alive": alive
+            })
+        return [
+            {
+                "battle_id": battle_id,
+                "ended_at": ended_at,
+                "participants": battle_participants,
+                "rewards": battle_rewards(battle_id, battle_participants)
+            }
+            for battle_id, battle_participants in participants.items()
+        ]
+
+    async def on_tick(self, result: TickResult):
+        # Слушатель должен быть последним: после него боёв в движке уже нет
+        if not result.finished:
+            return
+        self._queue.extend(self.collect(result.finished))
+        self.engine.remove_battles(result.finished)
+        self._wake.set()
+
+    def queued(self) -> int:
+        return len(self._queue)
+
+    async def settle(self, battles: list[dict]) -> list[int]:
+        if self.state_writer is None:
+            return await self._settle(battles)
+        # Выгрузка, начатая до завершения боя, несёт его прошлый тик: ждём её
+        async with self.state_writer.lock:
+            return await self._settle(battles)
+
+    async def _settle(self, battles: list[dict]) -> list[int]:
+        async with SessionLocal() as db:
+            settled = await crud.battles.settle_battles(battles, config.DURABILITY_LOSS_PER_BATTLE, db)
+            await db.commit()
+        return settled
+
+    async def flush(self):
+        async with self._lock:
+            while self._queue:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                started = time.perf_counter()
+                try:
+                    settled = await self.settle(batch)
+                except asyncio.CancelledError:
+                    self._queue.extendleft(reversed(batch))
+                    raise
+                except Exception:
+                    # Пачка вернётся в начало очереди; если commit всё же прошёл,
+                    # повтор увидит бои уже закрытыми
+                    self._queue.extendleft(reversed(batch))
+                    self.metrics.failed_batches += 1
+                    raise
+                duration = time.perf_counter() - started
+                self.metrics.batches += 1
+                self.metrics.battles += len(settled)
+                self.metrics.already_settled += len(batch) - len(settled)
+                self.metrics.busy_time += duration
+                self.metrics.last_batch_size = len(batch)
+                self.metrics.last_batch_duration = duration
+
+    async def run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Battle settlement failed")
+                await asyncio.sleep(self.retry_delay)
+                self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self.engine.add_listener(self.on_tick)
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        # Отмена посреди пачки безопасна: незакрытые бои остаются в очереди
+        # и дописываются здесь же, закрытые повторно не оплачиваются
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+settlement = BattleSettlement(
+    battle_engine, config.SETTLEMENT_BATCH_SIZE, config.SETTLEMENT_RETRY_DELAY, state_writer
+)
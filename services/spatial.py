@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+
+
+class SpatialGrid:
+    # Равномерная сетка по всем боям сразу: ключ ячейки включает слот боя,
+    # поэтому участники разных боёв никогда не попадают в одну ячейку.
+    # Перестройка — сортировка ключей за O(n log n), без объектов на ячейку.
+    def __init__(self, cell_size: float, arena_size: float):
+        self.cell_size = cell_size
+        self.cells = max(1, math.ceil(arena_size / cell_size))
+        self._x = np.zeros(0, dtype=np.float32)
+        self._y = np.zeros(0, dtype=np.float32)
+        self._slot = np.zeros(0, dtype=np.int64)
+        self._cx = np.zeros(0, dtype=np.int64)
+        self._cy = np.zeros(0, dtype=np.int64)
+        self._order = np.zeros(0, dtype=np.int64)
+        self._keys = np.zeros(0, dtype=np.int64)
+
+    def _key(self, slot, cx, cy):
+        return (slot * self.cells + cy) * self.cells + cx
+
+    def rebuild(self, slot: np.ndarray, x: np.ndarray, y: np.ndarray, alive: np.ndarray):
+        self._x, self._y = x, y
+        self._slot = slot.astype(np.int64)
+        self._cx = np.clip((x // self.cell_size).astype(np.int64), 0, self.cells - 1)
+        self._cy = np.clip((y // self.cell_size).astype(np.int64), 0, self.cells - 1)
+
+        rows = np.nonzero(alive)[0]
+        keys = self._key(self._slot[rows], self._cx[rows], self._cy[rows])
+        order = np.argsort(keys, kind="stable")
+        self._order = rows[order]
+        self._keys = keys[order]
+
+    def query_range(self, i: int, radius: float) -> np.ndarray:
+        # Живые участники того же боя в радиусе radius от участника i.
+        # Ячейки одной строки сетки идут в ключах подряд, поэтому на строку
+        # хватает одного среза отсортированного массива
+        rings = math.ceil(radius / self.cell_size)
+        cx0 = max(self._cx[i] - rings, 0)
+        cx1 = min(self._cx[i] + rings, self.cells - 1)
+        cy = np.arange(max(self._cy[i] - rings, 0), min(self._cy[i] + rings, self.cells - 1) + 1)
+        start = np.searchsorted(self._keys, self._key(self._slot[i], cx0, cy), "left")
+        end = np.searchsorted(self._keys, self._key(self._slot[i], cx1, cy), "right")
+
+        rows = np.concatenate([self._order[s:e] for s, e in zip(start.tolist(), end.tolist())])
+        rows = rows[rows != i]
+        dx = self._x[rows] - self._x[i]
+        dy = self._y[rows] - self._y[i]
+        return rows[dx * dx + dy * dy <= radius * radius]
+
+    def nearest(self, i: int, max_radius: float | None = None) -> int:
+        # Ближайший живой противник; ищем кольцами ячеек вокруг участника
+        max_rings = self.cells if max_radius is None else math.ceil(max_radius / self.cell_size)
+        best, best_distance = -1, math.inf
+        for ring in range(max_rings + 1):
+            for dy in range(-ring, ring + 1):
+                for dx in range(-ring, ring + 1):
+                    if max(abs(dx), abs(dy)) != ring:
+                        continue
+                    cx, cy = self._cx[i] + dx, self._cy[i] + dy
+                    if not (0 <= cx < self.cells and 0 <= cy < self.cells):
+                        continue
+                    key = self._key(self._slot[i], cx, cy)
+                    start = np.searchsorted(self._keys, key, "left")
+                    end = np.searchsorted(self._keys, key, "right")
+                    rows = self._order[start:end]
+                    rows = rows[rows != i]
+                    if not len(rows):
+                        continue
+                    distance = np.hypot(self._x[rows] - self._x[i], self._y[rows] - self._y[i])
+                    j = int(np.argmin(distance))
+                    if distance[j] < best_distance:
+                        best, best_distance = int(rows[j]), float(distance[j])
+            # Ячейки следующего кольца не ближе ring * cell_size
+            if best_distance <= ring * self.cell_size:
+                break
+        if max_radius is not None and best_distance > max_radius:
+            return -1
+        return best
+
+    def pairs_within(self, radius: float, sources: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        # Все пары (i, j), i != j, одного боя в радиусе radius — векторный
+        # проход по строкам соседних ячеек, без цикла по участникам.
+        # sources ограничивает i, по умолчанию — все участники сетки
+        rings = math.ceil(radius / self.cell_size)
+        if sources is None:
+            sources = self._order
+        slot = self._slot[sources]
+        cx0 = np.maximum(self._cx[sources] - rings, 0)
+        cx1 = np.minimum(self._cx[sources] + rings, self.cells - 1)
+        result_i, result_j = [], []
+        for dy in range(-rings, rings + 1):
+            cy = self._cy[sources] + dy
+            inside = (cy >= 0) & (cy < self.cells)
+            start = np.searchsorted(self._keys, self._key(slot[inside], cx0[inside], cy[inside]), "left")
+            end = np.searchsorted(self._keys, self._key(slot[inside], cx1[inside], cy[inside]), "right")
+            counts = end - start
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Для каждой пары — позиция соседа в отсортированном массиве
+            positions = np.repeat(start - np.cumsum(counts) + counts, counts) + np.arange(total)
+            result_i.append(np.repeat(sources[inside], counts))
+            result_j.append(self._order[positions])
+
+        if not result_i:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        i = np.concatenate(result_i)
+        j = np.concatenate(result_j)
+        dx = self._x[j] - self._x[i]
+        dy = self._y[j] - self._y[i]
+        keep = (i != j) & (dx * dx + dy * dy <= radius * radius)
+        return i[keep], j[keep]
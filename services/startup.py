@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, func, insert, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Отдельные метаданные: служебная таблица не входит в отпечаток схемы
+_state_metadata = MetaData()
+schema_state = Table(
+    "schema_state",
+    _state_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now())
+)
+
+
+def schema_fingerprint(metadata: MetaData, dialect) -> str:
+    # DDL таблиц и индексов в диалекте движка плюс типы столбцов: repr
+    # Enum включает значения, которых нет в CREATE TABLE для PostgreSQL
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type!r}".encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+async def _stored_fingerprint(engine: AsyncEngine) -> str | None:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(select(schema_state.c.fingerprint).where(schema_state.c.id == 1))
+            return result.scalar_one_or_none()
+    except DBAPIError:
+        # Таблицы ещё нет — первая установка
+        return None
+
+
+def _create_indexes(conn, metadata: MetaData):
+    # create_all не трогает уже существующие таблицы — индексы, добавленные
+    # в модели позже, создаём отдельно
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def ensure_schema(engine: AsyncEngine, metadata: MetaData) -> bool:
+    # create_all отражает каждую таблицу; если схема моделей не менялась
+    # с прошлого запуска, обходимся одним SELECT. Возвращает True, если DDL выполнялся
+    if config.DB_SCHEMA_SYNC == "never":
+        return False
+    fingerprint = schema_fingerprint(metadata, engine.dialect)
+    if config.DB_SCHEMA_SYNC == "auto" and await _stored_fingerprint(engine) == fingerprint:
+        return False
+
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.run_sync(_create_indexes, metadata)
+        await conn.run_sync(_state_metadata.create_all)
+        await conn.execute(delete(schema_state))
+        await conn.execute(insert(schema_state).values(id=1, fingerprint=fingerprint))
+    return True
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    # Открываем соединения одновременно, чтобы первые запросы не платили
+    # за подключение; после закрытия они остаются в пуле
+    connections = min(connections, engine.sync_engine.pool.size())
+    if connections <= 0:
+        return 0
+
+    async def open_connection() -> AsyncConnection:
+        conn = await engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    results = await asyncio.gather(*(open_connection() for _ in range(connections)), return_exceptions=True)
+    opened = [conn for conn in results if isinstance(conn, AsyncConnection)]
+    for conn in opened:
+        await conn.close()
+    for error in results:
+        if isinstance(error, BaseException):
+            raise error
+    return len(opened)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.details: dict[str, object] = {}
+        self.total = 0.0
+        self._started = time.perf_counter()
+
+    def start(self):
+        self.phases.clear()
+        self.details.clear()
+        self.total = 0.0
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def finish(self):
+        self.total = time.perf_counter() - self._started
+        logger.info(
+            "Startup finished in %.3fs: %s",
+            self.total,
+            ", ".join(f"{name} {duration:.3f}s" for name, duration in self.phases.items())
+        )
+
+    def report(self) -> dict:
+        return {"total": self.total, "phases": self.phases, **self.details}
+
+
+startup_timer = StartupTimer()
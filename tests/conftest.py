@@ -0,0 +1,80 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+# До импорта модулей приложения: config читает окружение один раз
+_tmp = tempfile.mkdtemp(prefix="magico-test-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.pop("READ_DATABASE_URL", None)
+# Схему пересоздаёт фикстура schema, lifespan её не трогает
+os.environ["DB_SCHEMA_SYNC"] = "never"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["BATTLE_LOG_DIR"] = os.path.join(_tmp, "battle_logs")
+
+
+@pytest.fixture(scope="session")
+def run():
+    # Один event loop на все тесты: пул движка держит соединения между ними
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def schema(run):
+    import models  # noqa: F401 — таблицы в Base.metadata
+    from database import Base, engine
+    from services.principals import principal_cache
+
+    async def recreate():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    run(recreate())
+    principal_cache.clear()
+
+
+@pytest.fixture
+def client(run, schema):
+    import httpx
+
+    from main import app
+
+    lifespan = app.router.lifespan_context(app)
+    run(lifespan.__aenter__())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    yield client
+    run(client.aclose())
+    run(lifespan.__aexit__(None, None, None))
+
+
+@pytest.fixture
+def make_user(run, schema):
+    # Пользователь с ролью и заголовки с его токеном, без bcrypt и /login
+    from sqlalchemy import insert
+
+    from database import SessionLocal
+    from enums import UserRole
+    from models import UserDB
+    from security import create_access_token
+
+    async def create(username: str, role: UserRole) -> int:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                insert(UserDB)
+                .values(username=username, email=f"{username}@example.com", hashed_password="x", role=role)
+                .returning(UserDB.user_id)
+            )
+            user_id = result.scalar_one()
+            await db.commit()
+        return user_id
+
+    def make(username: str, role: UserRole = UserRole.USER) -> tuple[int, dict]:
+        user_id = run(create(username, role))
+        token = create_access_token({"user_id": user_id, "username": username})
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+    return make
@@ -0,0 +1,123 @@
+import asyncio
+
+from services.battle_engine import BattleEngine
+
+
+def _participants(battle_id: int, healths: list[float]) -> list[dict]:
+    return [
+        {"participant_id": battle_id * 100 + i, "user_id": battle_id * 100 + i,
+         "health": health, "damage": 10, "speed": 1.0}
+        for i, health in enumerate(healths)
+    ]
+
+
+def test_battle_with_two_live_participants_keeps_running():
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _participants(1, [100, 100]))
+    engine.start_battle(1)
+
+    result = engine.tick(0.05)
+
+    assert result.finished == []
+    assert engine.is_running(1)
+
+
+def test_battle_without_live_participants_finishes():
+    # Живых нет ни в одном бою: раньше тик выходил до проверки окончания
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _participants(1, [0, 0]))
+    engine.add_battle(2, [])
+    engine.add_battle(3, _participants(3, [100, 0]))
+    engine.start_battle(1)
+    engine.start_battle(2)
+    engine.start_battle(3)
+
+    result = engine.tick(0.05)
+
+    assert sorted(result.finished) == [1, 2, 3]
+    assert engine.running_battles() == []
+
+
+def test_battle_not_started_is_not_finished():
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _participants(1, [100]))
+
+    assert engine.tick(0.05).finished == []
+
+
+def test_duration_is_recorded_for_idle_ticks():
+    engine = BattleEngine(tick_rate=20)
+    assert engine.tick(0.05).duration > 0
+
+    engine.add_battle(1, _participants(1, [100, 100]))
+    assert engine.tick(0.05).duration > 0
+
+
+def _placed(battle_id: int, positions: list[tuple[float, float]]) -> list[dict]:
+    return [
+        {"participant_id": battle_id * 100 + i, "user_id": battle_id * 100 + i,
+         "health": 100, "damage": 10, "speed": 1.0, "x": x, "y": y}
+        for i, (x, y) in enumerate(positions)
+    ]
+
+
+def _targets(engine: BattleEngine) -> dict[int, int | None]:
+    ids = engine.participant_id.tolist()
+    return {pid: None if row < 0 else ids[row] for pid, row in zip(ids, engine.target.tolist())}
+
+
+def test_idle_participants_target_nearest_enemy_in_range():
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _placed(1, [(10, 10), (11, 10), (11.5, 10), (50, 50)]))
+    engine.start_battle(1)
+
+    result = engine.tick(0.05)
+
+    assert _targets(engine) == {100: 101, 101: 102, 102: 101, 103: None}
+    assert sorted(result.hit_targets.tolist()) == [1, 1, 2]
+
+
+def test_targeting_stays_within_battle():
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _placed(1, [(10, 10), (40, 40)]))
+    engine.add_battle(2, _placed(2, [(10.5, 10), (70, 70)]))
+    engine.start_battle(1)
+    engine.start_battle(2)
+
+    engine.tick(0.05)
+
+    assert set(_targets(engine).values()) == {None}
+
+
+def test_assigned_target_is_kept():
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, _placed(1, [(10, 10), (10.5, 10), (11.5, 10)]))
+    engine.start_battle(1)
+    engine.set_target(100, 102)
+
+    engine.tick(0.05)
+
+    assert _targets(engine)[100] == 102
+
+
+def test_failing_listener_does_not_stop_engine(run):
+    engine = BattleEngine(tick_rate=100)
+    calls = []
+
+    async def broken(result):
+        raise RuntimeError("listener")
+
+    async def counting(result):
+        calls.append(result.tick)
+
+    engine.add_listener(broken)
+    engine.add_listener(counting)
+
+    async def run_for_a_while():
+        engine.start()
+        await asyncio.sleep(0.1)
+        await engine.stop()
+
+    run(run_for_a_while())
+
+    assert len(calls) > 1
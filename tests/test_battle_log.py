@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import config
+from services.battle_engine import BattleEngine
+from services.battle_log import EVENT_STATE, BattleEventLog, BattleReplay
+
+
+def _engine() -> BattleEngine:
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, [
+        {"participant_id": 100 + i, "user_id": 100 + i, "health": 1e9, "damage": 1, "speed": 1.0,
+         "x": float(i), "y": 0.0}
+        for i in range(2)
+    ])
+    engine.start_battle(1)
+    engine.set_target(100, 101)
+    return engine
+
+
+def _event_log(engine: BattleEngine, directory, queue_size: int = 8) -> BattleEventLog:
+    # Буфер и период сброса большие: в файл попадает только то, что сбросил flush
+    log = BattleEventLog(
+        engine, str(directory), keyframe=10, buffer_size=1 << 20, flush_ticks=1000, queue_size=queue_size
+    )
+    log.start()
+    return log
+
+
+def test_flush_makes_ticks_readable(run, tmp_path):
+    engine = _engine()
+    log = _event_log(engine, tmp_path)
+
+    async def ticks():
+        for _ in range(5):
+            await log.on_tick(engine.tick(0.05))
+        await log.flush(1)
+
+    run(ticks())
+    with BattleReplay(str(tmp_path), 1) as replay:
+        assert (replay.first_tick, replay.last_tick) == (1, 5)
+        assert replay.state_at(1)[100]["health"] == 1e9
+    run(log.stop())
+
+
+def test_files_are_written_by_log_thread(run, tmp_path, monkeypatch):
+    engine = _engine()
+    log = _event_log(engine, tmp_path)
+    writers = set()
+    write = log._writer._write
+
+    def record_thread(*chunk):
+        writers.add(threading.current_thread().name)
+        write(*chunk)
+
+    monkeypatch.setattr(log._writer, "_write", record_thread)
+
+    async def ticks():
+        for _ in range(3):
+            await log.on_tick(engine.tick(0.05))
+        await log.stop()
+
+    run(ticks())
+
+    assert writers == {"battle-log"}
+    with BattleReplay(str(tmp_path), 1) as replay:
+        assert replay.last_tick == 3
+
+
+def test_full_queue_waits_instead_of_dropping(run, tmp_path):
+    engine = _engine()
+    log = _event_log(engine, tmp_path, queue_size=1)
+    log.flush_ticks = 1
+    # Поток журнала занят: каждая следующая пачка ждёт места в очереди
+    blocked = threading.Event()
+    log._writer.queue.put(([], blocked.wait))
+
+    async def ticks():
+        for _ in range(3):
+            await log.on_tick(engine.tick(0.05))
+
+    async def release():
+        await asyncio.sleep(0.05)
+        blocked.set()
+
+    async def both():
+        await asyncio.gather(ticks(), release())
+        await log.flush()
+
+    run(both())
+
+    assert log.queue_waits > 0
+    with BattleReplay(str(tmp_path), 1) as replay:
+        assert replay.last_tick == 3
+        assert {int(kind) for kind in replay.events(1, 1)["kind"]} >= {EVENT_STATE}
+    run(log.stop())
+
+
+def test_replay_uses_keyframe_period_of_the_log(run, tmp_path, monkeypatch):
+    engine = _engine()
+    log = _event_log(engine, tmp_path)
+
+    async def ticks():
+        for _ in range(25):
+            await log.on_tick(engine.tick(0.05))
+        await log.stop()
+
+    run(ticks())
+    # Настройка поменялась после записи: кадры в журнале всё равно через 10 тиков
+    monkeypatch.setattr(config, "BATTLE_LOG_KEYFRAME", 7)
+    with BattleReplay(str(tmp_path), 1) as replay:
+        assert replay.keyframe == 10
+        assert replay.first_tick == 1
+        assert set(replay.state_at(15)[100]) >= {"health", "mana", "alive", "x", "y"}
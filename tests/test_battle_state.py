@@ -0,0 +1,105 @@
+import asyncio
+
+from sqlalchemy import insert, select
+
+from database import SessionLocal
+from enums import BattleStatus
+from models import BattleDB, BattleParticipantDB
+from services.battle_engine import BattleEngine
+from services.battle_state import ParticipantStateWriter
+from services.settlement import BattleSettlement
+
+
+def _seed(run, status: BattleStatus):
+    async def seed():
+        async with SessionLocal() as db:
+            await db.execute(insert(BattleDB).values(battle_id=1, arena_id=1, status=status))
+            await db.execute(insert(BattleParticipantDB), [
+                {"battle_participant_id": 100 + i, "battle_id": 1, "user_id": 100 + i, "kills": 0}
+                for i in range(2)
+            ])
+            await db.commit()
+
+    run(seed())
+
+
+def _kills(run) -> dict[int, int]:
+    async def query():
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(BattleParticipantDB.battle_participant_id, BattleParticipantDB.kills)
+            )
+            return dict(result.all())
+
+    return run(query())
+
+
+def _engine() -> BattleEngine:
+    engine = BattleEngine(tick_rate=20)
+    engine.add_battle(1, [
+        {"participant_id": 100 + i, "user_id": 100 + i, "health": 100, "damage": 10, "speed": 1.0}
+        for i in range(2)
+    ])
+    engine.start_battle(1)
+    return engine
+
+
+def test_flush_does_not_touch_settled_battle(run, schema):
+    # Строки вернулись в буфер после сбоя и уходят уже после settlement
+    _seed(run, BattleStatus.FINISHED)
+    writer = ParticipantStateWriter(_engine(), interval=1)
+    writer._pending = {100: {"battle_participant_id": 100, "kills": 7}}
+
+    run(writer.flush())
+
+    assert _kills(run) == {100: 0, 101: 0}
+
+
+def test_flush_updates_running_battle(run, schema):
+    _seed(run, BattleStatus.IN_PROCESS)
+    engine = _engine()
+    engine.kills[0] = 2
+    engine.dirty[0] = True
+    writer = ParticipantStateWriter(engine, interval=1)
+
+    run(writer.flush())
+
+    assert _kills(run) == {100: 2, 101: 0}
+
+
+def test_finished_battle_leaves_write_buffer(run, schema):
+    _seed(run, BattleStatus.IN_PROCESS)
+    engine = _engine()
+    writer = ParticipantStateWriter(engine, interval=1)
+    writer._pending = {100: {"battle_participant_id": 100, "kills": 7}}
+    engine.health[1] = 0
+    engine.alive[1] = False
+
+    result = engine.tick(0.05)
+    run(writer.on_tick(result))
+
+    assert result.finished == [1]
+    assert writer._pending == {}
+    assert engine.take_dirty() == []
+
+
+def test_settlement_waits_for_inflight_flush(run, schema):
+    _seed(run, BattleStatus.IN_PROCESS)
+    engine = _engine()
+    writer = ParticipantStateWriter(engine, interval=1)
+    settlement = BattleSettlement(engine, batch_size=10, retry_delay=0, state_writer=writer)
+    engine.health[1] = 0
+    engine.alive[1] = False
+    engine.kills[0] = 3
+    battles = settlement.collect(engine.tick(0.05).finished)
+
+    async def race():
+        # Пока идёт выгрузка, settlement бой не закрывает
+        async with writer.lock:
+            settle = asyncio.create_task(settlement.settle(battles))
+            await asyncio.sleep(0.05)
+            assert not settle.done()
+        return await settle
+
+    assert run(race()) == [1]
+    assert _kills(run)[100] == 3
@@ -0,0 +1,149 @@
+import struct
+
+import pytest
+
+from database import SessionLocal
+from enums import UserRole
+from routers.battles import battle_stream
+from security import create_access_token
+from services.battle_engine import BattleEngine, battle_engine
+from services.broadcast import FRAME_FINISHED, FRAME_SNAPSHOT, BattleBroadcaster
+
+
+class StubWebSocket:
+    def __init__(self):
+        self.accepted = False
+        self.close_code = None
+        self.frames = []
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_bytes(self, frame: bytes):
+        self.frames.append(frame)
+
+    async def close(self, code: int = 1000, reason: str | None = None):
+        self.close_code = code
+
+
+def _participants(battle_id: int, healths: list[float]) -> list[dict]:
+    return [
+        {"participant_id": battle_id * 100 + i, "user_id": battle_id * 100 + i,
+         "health": health, "damage": 10, "speed": 1.0}
+        for i, health in enumerate(healths)
+    ]
+
+
+def _frame_types(frames) -> list:
+    return [None if frame is None else frame[0] for frame in frames]
+
+
+def _drain(run, subscriber) -> list:
+    async def read():
+        frames = []
+        while (frame := await subscriber.next()) is not None:
+            frames.append(frame)
+        return frames + [None]
+
+    return run(read())
+
+
+def test_subscribe_after_finish_gets_closed_stream(run):
+    engine = BattleEngine(tick_rate=20)
+    broadcaster = BattleBroadcaster(engine, queue_limit=8)
+    engine.add_battle(1, _participants(1, [100, 0]))
+    engine.start_battle(1)
+    # Бой закончился до подписки: FINISHED уже никому не придёт
+    run(broadcaster.on_tick(engine.tick(0.05)))
+
+    subscriber = broadcaster.subscribe(1)
+
+    assert _frame_types(_drain(run, subscriber)) == [FRAME_SNAPSHOT, FRAME_FINISHED, None]
+    assert broadcaster._subscribers == {}
+
+
+def test_subscribe_after_removal_gets_closed_stream(run):
+    engine = BattleEngine(tick_rate=20)
+    broadcaster = BattleBroadcaster(engine, queue_limit=8)
+    engine.add_battle(1, _participants(1, [100, 100]))
+    engine.start_battle(1)
+    engine.remove_battle(1)
+
+    subscriber = broadcaster.subscribe(1)
+
+    assert _frame_types(_drain(run, subscriber)) == [FRAME_FINISHED, None]
+
+
+def test_running_battle_stream_ends_with_finished(run):
+    engine = BattleEngine(tick_rate=20)
+    broadcaster = BattleBroadcaster(engine, queue_limit=8)
+    engine.add_battle(1, _participants(1, [100, 100]))
+    engine.start_battle(1)
+    subscriber = broadcaster.subscribe(1)
+
+    engine.health[1] = 0
+    engine.alive[1] = False
+    run(broadcaster.on_tick(engine.tick(0.05)))
+
+    frames = _drain(run, subscriber)
+    assert _frame_types(frames)[0] == FRAME_SNAPSHOT
+    assert _frame_types(frames)[-2:] == [FRAME_FINISHED, None]
+
+
+def _connect(run, battle_id: int, token: str | None) -> StubWebSocket:
+    async def connect():
+        websocket = StubWebSocket()
+        await battle_stream(websocket, battle_id, token=token, db=SessionLocal())
+        return websocket
+
+    return run(connect())
+
+
+@pytest.mark.parametrize("token", [None, "not-a-token"])
+def test_stream_requires_token(run, schema, token):
+    websocket = _connect(run, 1, token)
+
+    assert not websocket.accepted
+    assert websocket.close_code == 4401
+
+
+def test_stream_rejects_banned_user(run, make_user):
+    user_id, _ = make_user("Banned")
+
+    async def ban():
+        from sqlalchemy import update
+
+        from models import UserDB
+
+        async with SessionLocal() as db:
+            await db.execute(update(UserDB).where(UserDB.user_id == user_id).values(is_active=False))
+            await db.commit()
+
+    run(ban())
+    websocket = _connect(run, 1, create_access_token({"user_id": user_id, "username": "Banned"}))
+
+    assert websocket.close_code == 4403
+
+
+def test_stream_unknown_battle(run, make_user):
+    user_id, _ = make_user("Viewer", UserRole.USER)
+
+    websocket = _connect(run, 424242, create_access_token({"user_id": user_id, "username": "Viewer"}))
+
+    assert websocket.close_code == 4404
+
+
+def test_stream_of_finished_battle_does_not_hang(run, make_user):
+    user_id, _ = make_user("Viewer")
+    token = create_access_token({"user_id": user_id, "username": "Viewer"})
+    battle_engine.add_battle(424242, _participants(4242, [100, 0]))
+    try:
+        # В движке, но уже не идёт: так бой выглядит между FINISHED и settlement
+        websocket = _connect(run, 424242, token)
+    finally:
+        battle_engine.remove_battle(424242)
+
+    assert websocket.accepted
+    assert _frame_types(websocket.frames) == [FRAME_SNAPSHOT, FRAME_FINISHED]
+    header = struct.unpack_from("<BIIH", websocket.frames[-1])
+    assert header[1] == 424242
@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import func, select
+
+from database import SessionLocal
+from models import CharacterDB, EquipmentDB
+from schemas.characters import CreateCharacter
+from schemas.equipment import CreateEquipment
+from services.bulk_import import import_rows
+
+CHARACTER = {"name": "Hero", "base_health": 100, "base_damage": 50, "base_speed": 20}
+EQUIPMENT = {"name": "Sword", "equipment_category": "weapon", "damage_bonus": 5}
+
+TABLES = {
+    "characters": (CreateCharacter, CharacterDB, CHARACTER),
+    "equipment": (CreateEquipment, EquipmentDB, EQUIPMENT),
+}
+
+
+async def _rows(items):
+    for item in items:
+        yield item
+
+
+def _import(run, kind: str, items: list[dict]):
+    schema, model, _ = TABLES[kind]
+
+    async def execute():
+        async with SessionLocal() as db:
+            report = await import_rows(_rows(items), schema, model.__table__, db)
+            count = await db.scalar(select(func.count()).select_from(model))
+        return report, count
+
+    return run(execute())
+
+
+def _named(kind: str, name: str) -> dict:
+    return {**TABLES[kind][2], "name": name}
+
+
+@pytest.mark.parametrize("kind", TABLES)
+def test_single_duplicate_row(run, schema, kind):
+    _import(run, kind, [_named(kind, "Original")])
+
+    report, count = _import(run, kind, [_named(kind, "Original")])
+
+    assert (report.received, report.inserted, report.failed) == (1, 0, 1)
+    assert report.errors[0].row == 1
+    # Ни строки по умолчанию от пустого executemany, ни бесконечного деления
+    assert count == 1
+
+
+@pytest.mark.parametrize("kind", TABLES)
+def test_all_rows_duplicate(run, schema, kind):
+    names = [f"Item{i}" for i in range(5)]
+    _import(run, kind, [_named(kind, name) for name in names])
+
+    report, count = _import(run, kind, [_named(kind, name) for name in names])
+
+    assert (report.inserted, report.failed) == (0, 5)
+    assert [error.row for error in report.errors] == [1, 2, 3, 4, 5]
+    assert count == 5
+
+
+def test_duplicates_mixed_with_new_rows(run, schema):
+    _import(run, "equipment", [_named("equipment", "Item1")])
+
+    report, count = _import(run, "equipment", [
+        _named("equipment", name) for name in ("Item0", "Item1", "Item2", "Item1")
+    ])
+
+    assert (report.inserted, report.failed) == (2, 2)
+    assert [error.row for error in report.errors] == [2, 4]
+    assert count == 3
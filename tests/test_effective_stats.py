@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+import crud.stats
+from crud.stats import DEFAULT_STATS
+from database import SessionLocal
+from enums import EquipmentCategory
+from models import CharacterDB, EquipmentDB, UserEquipmentDB, user_characters
+from services.battle_engine import battle_engine
+from services.matchmaking import JoinRequest, matchmaker
+
+
+def _seed(run, *statements):
+    async def execute():
+        async with SessionLocal() as db:
+            for table, rows in statements:
+                await db.execute(insert(table), rows)
+            await db.commit()
+
+    run(execute())
+
+
+def _stats(run, user_ids):
+    async def query():
+        async with SessionLocal() as db:
+            return await crud.stats.get_effective_stats(user_ids, db)
+
+    return run(query())
+
+
+def test_second_active_character_is_rejected(run, make_user):
+    user_id, _ = make_user("Player")
+    _seed(run, (CharacterDB, [
+        {"name": "Hero1", "base_health": 100, "base_damage": 50, "base_speed": 20},
+        {"name": "Hero2", "base_health": 200, "base_damage": 60, "base_speed": 30},
+        {"name": "Hero3", "base_health": 300, "base_damage": 70, "base_speed": 40},
+    ]), (user_characters, [
+        {"user_id": user_id, "character_id": 1, "is_active": True},
+        {"user_id": user_id, "character_id": 2, "is_active": False},
+    ]))
+
+    with pytest.raises(IntegrityError):
+        _seed(run, (user_characters, [{"user_id": user_id, "character_id": 3, "is_active": True}]))
+
+    stats = _stats(run, [user_id])
+    assert stats[user_id]["character_id"] == 1
+    assert stats[user_id]["health"] == 100
+
+
+def _gear(user_id: int, health: int, damage: int, speed: float):
+    return (EquipmentDB, [
+        {"name": f"Item{user_id}", "equipment_category": EquipmentCategory.ARMOR,
+         "health_bonus": health, "damage_bonus": damage, "speed_bonus": speed},
+    ]), (UserEquipmentDB, [
+        {"user_id": user_id, "equipment_id": user_id, "is_equipped": True},
+    ])
+
+
+def test_gear_without_active_character_adds_to_defaults(run, make_user):
+    user_id, _ = make_user("Player")
+    _seed(run, *_gear(user_id, health=20, damage=5, speed=0.5))
+
+    stats = _stats(run, [user_id])[user_id]
+
+    assert stats["character_id"] is None
+    assert (stats["health"], stats["damage"], stats["speed"]) == (
+        DEFAULT_STATS["health"] + 20, DEFAULT_STATS["damage"] + 5, DEFAULT_STATS["speed"] + 0.5
+    )
+
+
+def test_zero_base_stat_is_kept(run, make_user):
+    user_id, _ = make_user("Player")
+    _seed(run, (CharacterDB, [
+        {"name": "Statue", "base_health": 100, "base_damage": 0, "base_speed": 0},
+    ]), (user_characters, [
+        {"user_id": user_id, "character_id": 1, "is_active": True},
+    ]))
+
+    stats = _stats(run, [user_id])[user_id]
+
+    assert (stats["health"], stats["damage"], stats["speed"]) == (100, 0, 0)
+
+
+def test_matchmaking_uses_effective_stats(run, make_user):
+    geared_id, _ = make_user("Geared")
+    plain_id, _ = make_user("Plain")
+    _seed(run, *_gear(geared_id, health=20, damage=5, speed=0.5))
+
+    async def create():
+        loop = asyncio.get_running_loop()
+        group = [
+            JoinRequest(user_id=user_id, arena_id=1, enqueued_at=0.0, future=loop.create_future())
+            for user_id in (geared_id, plain_id)
+        ]
+        return await matchmaker._create_battles([group])
+
+    battle_id = run(create())[0]["battle_id"]
+    try:
+        rows = battle_engine.battle_rows(battle_id)
+        health = dict(zip(battle_engine.user_id[rows].tolist(), battle_engine.health[rows].tolist()))
+        assert health == {geared_id: DEFAULT_STATS["health"] + 20, plain_id: DEFAULT_STATS["health"]}
+    finally:
+        battle_engine.remove_battle(battle_id)
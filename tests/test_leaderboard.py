@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from database import SessionLocal
+from enums import BattleStatus
+from models import BattleDB, BattleParticipantDB
+from services.battle_engine import BattleEngine
+from services.leaderboard import GLOBAL, Leaderboard
+
+# Бой 1 длинный, 2 и 3 короткие; убийства у пользователя battle_id * 10
+KILLS = {1: 1, 2: 2, 3: 4}
+
+
+def _leaderboard() -> Leaderboard:
+    return Leaderboard(BattleEngine(tick_rate=20), interval=60, abandoned_after=3600)
+
+
+def _seed_battles(run, started_at: datetime | None = None):
+    started_at = started_at or datetime.utcnow()
+
+    async def seed():
+        async with SessionLocal() as db:
+            await db.execute(insert(BattleDB), [
+                {"battle_id": battle_id, "arena_id": 1, "status": BattleStatus.IN_PROCESS, "started_at": started_at}
+                for battle_id in KILLS
+            ])
+            await db.execute(insert(BattleParticipantDB), [
+                {"battle_id": battle_id, "user_id": battle_id * 10, "kills": kills}
+                for battle_id, kills in KILLS.items()
+            ])
+            await db.commit()
+
+    run(seed())
+
+
+def _settle(run, *battle_ids: int):
+    async def settle():
+        async with SessionLocal() as db:
+            await db.execute(
+                update(BattleDB).where(BattleDB.battle_id.in_(battle_ids))
+                .values(status=BattleStatus.FINISHED, ended_at=datetime.utcnow())
+            )
+            await db.commit()
+
+    run(settle())
+
+
+def _finish(leaderboard: Leaderboard, *battle_ids: int):
+    # Как слушатель тика: в памяти бой учтён раньше, чем закрыт в БД
+    for battle_id in battle_ids:
+        leaderboard.record_battle(battle_id, 1, {battle_id * 10: KILLS[battle_id]})
+
+
+def _restarted(run) -> Leaderboard:
+    leaderboard = _leaderboard()
+
+    async def load():
+        async with SessionLocal() as db:
+            await leaderboard.load(db)
+
+    run(load())
+    return leaderboard
+
+
+def _scores(leaderboard: Leaderboard) -> dict[int, int]:
+    ranking = leaderboard.ranking(GLOBAL)
+    return {user_id: ranking.score(user_id) for user_id in (10, 20, 30) if ranking.score(user_id) is not None}
+
+
+def test_battle_settled_after_snapshot_is_counted_once(run, schema):
+    # Снимок сделан, пока бой ещё не закрыт в БД; settlement отстал
+    # сколько угодно, догонка по курсору его второй раз не посчитает
+    leaderboard = _leaderboard()
+    _seed_battles(run, started_at=datetime.utcnow() - timedelta(minutes=30))
+    _finish(leaderboard, 2, 3)
+    run(leaderboard.snapshot())
+    _settle(run, 2, 3)
+
+    assert _scores(_restarted(run)) == {20: 2, 30: 4}
+
+
+def test_long_battle_below_counted_ones_is_caught_up(run, schema):
+    leaderboard = _leaderboard()
+    _seed_battles(run)
+    _finish(leaderboard, 2, 3)
+    _settle(run, 2, 3)
+    run(leaderboard.snapshot())
+    # Бой 1 не закрыт: курсор стоит перед ним, 2 и 3 перечислены отдельно
+    assert leaderboard.cursor == 0
+    # Бой 1 закрылся, воркер упал до следующего снимка
+    _finish(leaderboard, 1)
+    _settle(run, 1)
+
+    restarted = _restarted(run)
+
+    assert _scores(restarted) == {10: 1, 20: 2, 30: 4}
+    run(restarted.snapshot())
+    assert restarted.cursor == 3
+    assert _scores(_restarted(run)) == {10: 1, 20: 2, 30: 4}
+
+
+def test_abandoned_battle_does_not_hold_cursor(run, schema):
+    leaderboard = _leaderboard()
+    _seed_battles(run, started_at=datetime.utcnow() - timedelta(hours=2))
+    _finish(leaderboard, 2, 3)
+    _settle(run, 2, 3)
+
+    run(leaderboard.snapshot())
+
+    assert leaderboard.cursor == 3
+    assert _scores(_restarted(run)) == {20: 2, 30: 4}
+
+
+def test_first_start_counts_history_once(run, schema):
+    _seed_battles(run)
+    _settle(run, 2, 3)
+
+    leaderboard = _restarted(run)
+    assert _scores(leaderboard) == {20: 2, 30: 4}
+    run(leaderboard.snapshot())
+    _settle(run, 1)
+
+    assert _scores(_restarted(run)) == {10: 1, 20: 2, 30: 4}
@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import event, insert, select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+from crud import loading
+from database import SessionLocal
+from models import CharacterDB, UserDB, user_characters
+from services.catalog import character_catalog
+
+
+@pytest.fixture
+def lazy_loads():
+    # Ленивая загрузка связи, не предусмотренная профилем. raise_on_sql
+    # падает сам; здесь ловятся и связи с lazy="select" по умолчанию
+    loads = []
+
+    def on_execute(state):
+        if state.is_select and state.lazy_loaded_from is not None:
+            loads.append(state.statement)
+
+    event.listen(Session, "do_orm_execute", on_execute)
+    yield loads
+    event.remove(Session, "do_orm_execute", on_execute)
+
+
+@pytest.fixture
+def roster(run, client, make_user):
+    # Два владельца у одного персонажа: каскад по владельцам был бы виден
+    owner_id, headers = make_user("Owner")
+    other_id, _ = make_user("Other")
+
+    async def seed():
+        async with SessionLocal() as db:
+            await db.execute(insert(CharacterDB), [
+                {"name": f"Hero{i}", "base_health": 100, "base_damage": 50, "base_speed": 20}
+                for i in range(1, 4)
+            ])
+            await db.execute(insert(user_characters), [
+                {"user_id": owner_id, "character_id": 1, "is_active": True},
+                {"user_id": owner_id, "character_id": 2, "is_active": False},
+                {"user_id": other_id, "character_id": 1, "is_active": True},
+            ])
+            await db.commit()
+            await character_catalog.load(db)
+
+    run(seed())
+    return owner_id, headers
+
+
+def test_character_catalog_profile(run, client, roster, lazy_loads):
+    # Справочник грузится с профилем CHARACTER_CATALOG и отдаёт /characters/
+    async def reload():
+        async with SessionLocal() as db:
+            await character_catalog.load(db)
+
+    run(reload())
+
+    response = run(client.get("/characters/"))
+    assert response.status_code == 200
+    assert [item["name"] for item in response.json()] == ["Hero1", "Hero2", "Hero3"]
+    assert run(client.get("/characters/1")).status_code == 200
+    assert lazy_loads == []
+
+
+def test_user_only_profile(run, client, lazy_loads):
+    user = {"username": "Player0001", "email": "player1@example.com", "password": "Passwod123"}
+    assert run(client.post("/users/create", json=user)).status_code == 200
+
+    response = run(client.post("/users/login", json={"email": user["email"], "password": user["password"]}))
+
+    assert response.status_code == 200
+    assert lazy_loads == []
+
+
+def test_unplanned_relationship_raises(run, roster):
+    owner_id, _ = roster
+
+    async def query():
+        async with SessionLocal() as db:
+            user = (await db.execute(
+                select(UserDB).options(*loading.USER_ONLY).where(UserDB.user_id == owner_id)
+            )).scalar_one()
+            user.characters
+
+    with pytest.raises(InvalidRequestError):
+        run(query())
+
+
+@pytest.mark.parametrize("route", ["/characters/user/{user_id}", "/users/{user_id}/stats"])
+def test_roster_endpoints(run, client, roster, lazy_loads, route):
+    owner_id, headers = roster
+
+    response = run(client.get(route.format(user_id=owner_id), headers=headers))
+
+    assert response.status_code == 200
+    assert lazy_loads == []
@@ -0,0 +1,123 @@
+import random
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, insert, literal, select, text
+
+from benchmarks import local_db
+from crud.battles import _wear_equipment
+from crud.stats import _effective_stats_query
+from database import Base, engine
+from enums import BattleStatus
+from models import ArenaDB, BattleDB, BattleParticipantDB, CharacterDB, UserDB, user_characters
+from services.leaderboard import _lowest_unfinished_query
+
+# Горячие запросы не должны читать таблицу целиком: EXPLAIN QUERY PLAN с
+# теми же параметрами, что уходят в драйвер, — литералы и частичные
+# индексы проверяются как есть
+
+PLAYERS_PER_BATTLE = 8
+ARENAS = 10
+
+QUERIES = {
+    "login by username": lambda user_ids: select(UserDB).where(UserDB.username == "Player000042"),
+    "effective stats (equipped gear)": _effective_stats_query,
+    "equipment wear after battle": lambda user_ids: _wear_equipment(user_ids, 1),
+    "user roster": lambda user_ids: (
+        select(CharacterDB.character_id, CharacterDB.name)
+        .join(user_characters, user_characters.c.character_id == CharacterDB.character_id)
+        .where(user_characters.c.user_id == 42)
+        .order_by(CharacterDB.character_id)
+        .limit(100)
+    ),
+    "battle history of a user": lambda user_ids: (
+        select(BattleParticipantDB.battle_id, BattleParticipantDB.kills)
+        .where(BattleParticipantDB.user_id == 42)
+        .order_by(BattleParticipantDB.battle_id.desc())
+        .limit(20)
+    ),
+    "open battle on an arena": lambda user_ids: (
+        select(BattleDB.battle_id)
+        .where(
+            BattleDB.arena_id == 3,
+            # Литерал, а не параметр: иначе частичный индекс не подходит
+            BattleDB.status == literal(BattleStatus.WAITING, BattleDB.status.type, literal_execute=True)
+        )
+        .order_by(BattleDB.battle_id)
+        .limit(1)
+    ),
+    "participants of a battle": lambda user_ids: (
+        select(BattleParticipantDB).where(BattleParticipantDB.battle_id == 7)
+    ),
+    "leaderboard cursor": lambda user_ids: _lowest_unfinished_query(datetime(2000, 1, 1)),
+}
+
+
+@pytest.fixture(scope="module")
+def seed_size() -> dict:
+    # Полный просмотр должен быть заметно дороже поиска по индексу
+    return {"users": 5_000, "battles": 2_000, "open_battles": 20}
+
+
+@pytest.fixture(scope="module")
+def seeded(run, seed_size) -> list[int]:
+    size = seed_size
+    rng = random.Random(0)
+
+    async def seed():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await local_db.seed(
+            users=size["users"], characters=200, equipment=200,
+            characters_per_user=3, equipped_per_user=3, password="Passwod123"
+        )
+        async with engine.begin() as conn:
+            await conn.execute(insert(ArenaDB), [{"name": f"Arena{i}"} for i in range(1, ARENAS + 1)])
+            await conn.execute(insert(BattleDB), [
+                {
+                    "arena_id": rng.randint(1, ARENAS),
+                    "status": BattleStatus.WAITING if i < size["open_battles"] else BattleStatus.FINISHED
+                }
+                for i in range(size["battles"])
+            ])
+            await conn.execute(insert(BattleParticipantDB), [
+                {"battle_id": battle_id, "user_id": user_id, "kills": rng.randint(0, 3)}
+                for battle_id in range(1, size["battles"] + 1)
+                for user_id in rng.sample(range(1, size["users"] + 1), PLAYERS_PER_BATTLE)
+            ])
+            await conn.execute(text("ANALYZE"))
+
+    run(seed())
+    return rng.sample(range(1, size["users"] + 1), PLAYERS_PER_BATTLE)
+
+
+@pytest.fixture
+def explain(run):
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("explain"):
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            conn.info["plan"] = [row[-1] for row in cursor.fetchall()]
+
+    async def plan_of(query) -> list[str]:
+        async with engine.connect() as conn:
+            conn.sync_connection.info["explain"] = True
+            # Запрос выполняется и откатывается: UPDATE данные не меняет
+            transaction = await conn.begin()
+            await conn.execute(query)
+            await transaction.rollback()
+            return conn.sync_connection.info.pop("plan")
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    yield lambda query: run(plan_of(query))
+    event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_hot_query_does_not_scan_table(seeded, explain, name):
+    tables = "|".join(re.escape(table) for table in Base.metadata.tables)
+    full_scan = re.compile(rf"^SCAN ({tables})\b")
+
+    plan = explain(QUERIES[name](seeded))
+
+    assert [line for line in plan if full_scan.match(line)] == [], plan
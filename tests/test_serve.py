@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+SERVE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "serve.py")
+
+
+def test_several_workers_require_battles_disabled():
+    # Бои живут в памяти процесса: пул воркеров с ними не запускается
+    result = subprocess.run(
+        [sys.executable, SERVE, "--workers", "2", "--port", "0"],
+        env=dict(os.environ, BATTLES_ENABLED="1"), capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 2
+    assert "BATTLES_ENABLED=0" in result.stderr
@@ -0,0 +1,62 @@
+import pytest
+
+from database import SessionLocal
+from enums import UserRole
+from security import authenticate, create_access_token
+from services.principals import principal_cache
+
+
+@pytest.mark.parametrize("actor_role, target_role, expected", [
+    (UserRole.MODERATOR, UserRole.USER, 200),
+    (UserRole.MODERATOR, UserRole.MODERATOR, 403),
+    (UserRole.MODERATOR, UserRole.ADMIN, 403),
+    (UserRole.MODERATOR, UserRole.SUPER_ADMIN, 403),
+    (UserRole.ADMIN, UserRole.MODERATOR, 200),
+    (UserRole.ADMIN, UserRole.ADMIN, 403),
+    (UserRole.SUPER_ADMIN, UserRole.ADMIN, 200),
+])
+@pytest.mark.parametrize("action", ["ban", "unban"])
+def test_ban_requires_lower_role(run, client, make_user, actor_role, target_role, expected, action):
+    _, actor = make_user("Actor", actor_role)
+    target_id, _ = make_user("Target", target_role)
+
+    response = run(client.post(f"/users/{target_id}/{action}", headers=actor))
+
+    assert response.status_code == expected
+
+
+def test_ban_unknown_user(run, client, make_user):
+    _, moderator = make_user("Moderator", UserRole.MODERATOR)
+
+    response = run(client.post("/users/999/ban", headers=moderator))
+
+    assert response.status_code == 404
+
+
+def test_refused_ban_keeps_target_active(run, client, make_user):
+    _, moderator = make_user("Moderator", UserRole.MODERATOR)
+    admin_id, admin = make_user("Admin", UserRole.ADMIN)
+
+    assert run(client.post(f"/users/{admin_id}/ban", headers=moderator)).status_code == 403
+    assert run(client.get("/users/me", headers=admin)).status_code == 200
+
+
+def test_ban_during_cache_miss_is_not_cached_stale(run, make_user):
+    user_id, _ = make_user("Target")
+    token = create_access_token({"user_id": user_id, "username": "Target"})
+
+    async def login_racing_ban():
+        async with SessionLocal() as db:
+            execute = db.execute
+
+            async def execute_then_ban(*args, **kwargs):
+                # Строка прочитана до бана, инвалидация приходит до put
+                result = await execute(*args, **kwargs)
+                principal_cache.invalidate_user(user_id)
+                return result
+
+            db.execute = execute_then_ban
+            return await authenticate(token, db)
+
+    assert run(login_racing_ban()).is_active
+    assert principal_cache.get(token) is None
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import services.hashing
+from crud.users import is_unique_violation
+from services.hashing import hasher
+
+USER = {"username": "Player0001", "email": "player1@example.com", "password": "Passwod123"}
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    calls = []
+    original = hasher.hash
+
+    async def counting(password: str) -> str:
+        calls.append(password)
+        return await original(password)
+
+    monkeypatch.setattr(hasher, "hash", counting)
+    return calls
+
+
+@pytest.mark.parametrize("duplicate, detail", [
+    ({**USER, "username": "Player0002"}, "электронным адресом"),
+    ({**USER, "email": "player2@example.com"}, "ником"),
+])
+def test_duplicate_signup_skips_hashing(run, client, hashes, duplicate, detail):
+    assert run(client.post("/users/create", json=USER)).status_code == 200
+    assert len(hashes) == 1
+
+    response = run(client.post("/users/create", json=duplicate))
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+    assert len(hashes) == 1
+
+
+class _Diag:
+    constraint_name = "users_email_key"
+
+
+class _PsycopgError(Exception):
+    diag = _Diag()
+
+
+class _AsyncpgError(Exception):
+    constraint_name = "users_username_key"
+
+
+def _integrity_error(orig: Exception) -> IntegrityError:
+    return IntegrityError("INSERT INTO users ...", {}, orig)
+
+
+def test_unique_violation_by_constraint_name():
+    psycopg = _integrity_error(_PsycopgError("duplicate key value violates unique constraint"))
+    assert is_unique_violation(psycopg, "users", "email")
+    assert not is_unique_violation(psycopg, "users", "username")
+
+    # asyncpg: исключение драйвера — причина адаптированного исключения
+    adapted = Exception("users_email_key mentioned in text only")
+    adapted.__cause__ = _AsyncpgError()
+    asyncpg = _integrity_error(adapted)
+    assert is_unique_violation(asyncpg, "users", "username")
+    assert not is_unique_violation(asyncpg, "users", "email")
+
+
+def test_unique_violation_sqlite_message():
+    sqlite = _integrity_error(Exception("UNIQUE constraint failed: users.email"))
+
+    assert is_unique_violation(sqlite, "users", "email")
+    assert not is_unique_violation(sqlite, "users", "username")
+
+
+def test_failed_rehash_is_logged_and_counted(run, monkeypatch, caplog):
+    class BrokenSession:
+        async def __aenter__(self):
+            raise ConnectionError("database is down")
+
+        async def __aexit__(self, *args):
+            return False
+
+    monkeypatch.setattr(services.hashing, "SessionLocal", BrokenSession)
+    failed = hasher.metrics.rehash_failed
+
+    run(hasher._rehash(1, USER["password"], "old-hash"))
+
+    assert hasher.metrics.rehash_failed == failed + 1
+    assert "Password rehash failed for user 1" in caplog.text